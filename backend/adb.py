@@ -0,0 +1,235 @@
+"""Async access to db.py for request handlers.
+
+Each function here wraps the db.py function of the same name and signature as
+a coroutine: `await adb.get_pantry(user_id)`. Calls run on worker threads
+against the shared pooled client, so a PostgREST round trip no longer blocks
+the event loop. DB_CONCURRENCY bounds how many run at once; keep it at or
+below DB_POOL_SIZE so threads never queue on the HTTP pool.
+
+CPU-bound work (matching, index builds) goes through run_cpu instead, under
+its own CPU_CONCURRENCY limit, so it doesn't hold slots database calls need.
+"""
+import functools
+import os
+
+import anyio
+
+import db
+
+DB_CONCURRENCY = int(os.environ.get('DB_CONCURRENCY', '20'))
+CPU_CONCURRENCY = int(os.environ.get('CPU_CONCURRENCY', str(os.cpu_count() or 1)))
+
+_limiter: anyio.CapacityLimiter | None = None
+_cpu_limiter: anyio.CapacityLimiter | None = None
+
+
+def _get_limiter() -> anyio.CapacityLimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = anyio.CapacityLimiter(DB_CONCURRENCY)
+    return _limiter
+
+
+def _get_cpu_limiter() -> anyio.CapacityLimiter:
+    global _cpu_limiter
+    if _cpu_limiter is None:
+        _cpu_limiter = anyio.CapacityLimiter(CPU_CONCURRENCY)
+    return _cpu_limiter
+
+
+async def run_sync(fn, *args, **kwargs):
+    """Run blocking work that talks to the database off the event loop."""
+    return await anyio.to_thread.run_sync(
+        functools.partial(fn, *args, **kwargs), limiter=_get_limiter())
+
+
+async def run_cpu(fn, *args, **kwargs):
+    """Run CPU-bound work off the event loop."""
+    return await anyio.to_thread.run_sync(
+        functools.partial(fn, *args, **kwargs), limiter=_get_cpu_limiter())
+
+
+# --- Recipes ---
+
+async def get_recipe_by_canonical_url(canonical_url: str) -> dict | None:
+    return await run_sync(db.get_recipe_by_canonical_url, canonical_url)
+
+
+async def upsert_recipe(data: dict) -> dict:
+    return await run_sync(db.upsert_recipe, data)
+
+
+async def search_recipes(search: str = None, channel_id: str = None, limit: int = 50,
+                         offset: int = 0, summary: bool = False) -> tuple[list[dict], int, bool]:
+    return await run_sync(db.search_recipes, search, channel_id, limit, offset, summary)
+
+
+async def get_recipes_page(channel_id: str = None, limit: int = 50, cursor: str = None,
+                           summary: bool = False) -> tuple[list[dict], str | None]:
+    return await run_sync(db.get_recipes_page, channel_id, limit, cursor, summary)
+
+
+async def get_recipes_by_ids(recipe_ids: list[str]) -> list[dict]:
+    return await run_sync(db.get_recipes_by_ids, recipe_ids)
+
+
+async def get_recipe_by_id(recipe_id: str) -> dict | None:
+    return await run_sync(db.get_recipe_by_id, recipe_id)
+
+
+# --- User Library ---
+
+async def get_user_recipes(user_id: str) -> list[dict]:
+    return await run_sync(db.get_user_recipes, user_id)
+
+
+async def get_match_versions(user_id: str) -> dict:
+    return await run_sync(db.get_match_versions, user_id)
+
+
+async def save_user_recipe(user_id: str, recipe_id: str) -> dict:
+    return await run_sync(db.save_user_recipe, user_id, recipe_id)
+
+
+async def remove_user_recipe(user_id: str, recipe_id: str) -> None:
+    return await run_sync(db.remove_user_recipe, user_id, recipe_id)
+
+
+async def update_user_recipe(user_id: str, recipe_id: str, rating: int | None = ...,
+                             notes: str | None = ...) -> dict:
+    return await run_sync(db.update_user_recipe, user_id, recipe_id, rating, notes)
+
+
+# --- Favorite Chefs ---
+
+async def get_favorite_chefs(user_id: str) -> list[dict]:
+    return await run_sync(db.get_favorite_chefs, user_id)
+
+
+async def add_favorite_chef(user_id: str, channel_id: str) -> dict:
+    return await run_sync(db.add_favorite_chef, user_id, channel_id)
+
+
+async def remove_favorite_chef(user_id: str, channel_id: str) -> None:
+    return await run_sync(db.remove_favorite_chef, user_id, channel_id)
+
+
+async def get_user_chefs(user_id: str) -> list[dict]:
+    return await run_sync(db.get_user_chefs, user_id)
+
+
+# --- Collections ---
+
+async def get_collections(user_id: str) -> list[dict]:
+    return await run_sync(db.get_collections, user_id)
+
+
+async def create_collection(user_id: str, name: str) -> dict:
+    return await run_sync(db.create_collection, user_id, name)
+
+
+async def rename_collection(collection_id: str, name: str) -> dict:
+    return await run_sync(db.rename_collection, collection_id, name)
+
+
+async def delete_collection(collection_id: str) -> None:
+    return await run_sync(db.delete_collection, collection_id)
+
+
+async def reorder_collections(user_id: str, ordered_ids: list[str]) -> None:
+    return await run_sync(db.reorder_collections, user_id, ordered_ids)
+
+
+async def add_recipe_to_collection(collection_id: str, user_recipe_id: str) -> dict:
+    return await run_sync(db.add_recipe_to_collection, collection_id, user_recipe_id)
+
+
+async def remove_recipe_from_collection(collection_id: str, user_recipe_id: str) -> None:
+    return await run_sync(db.remove_recipe_from_collection, collection_id, user_recipe_id)
+
+
+async def get_collection_recipes_page(collection_id: str, user_id: str, limit: int = None,
+                                      cursor: str = None,
+                                      summary: bool = False) -> tuple[list[dict], str | None]:
+    return await run_sync(db.get_collection_recipes_page, collection_id, user_id,
+                          limit, cursor, summary)
+
+
+# --- Pantry ---
+
+async def get_pantry(user_id: str) -> dict:
+    return await run_sync(db.get_pantry, user_id)
+
+
+async def add_pantry_item(user_id: str, name: str, category: str = 'staple') -> dict:
+    return await run_sync(db.add_pantry_item, user_id, name, category)
+
+
+async def remove_pantry_item(user_id: str, item_id: str) -> None:
+    return await run_sync(db.remove_pantry_item, user_id, item_id)
+
+
+# --- Import Tracking ---
+
+async def create_import_job(user_id: str, source_type: str, source_id: str,
+                            source_name: str = None) -> dict:
+    return await run_sync(db.create_import_job, user_id, source_type, source_id, source_name)
+
+
+async def update_import_job(job_id: str, **kwargs) -> dict:
+    return await run_sync(db.update_import_job, job_id, **kwargs)
+
+
+async def get_import_job(job_id: str) -> dict | None:
+    return await run_sync(db.get_import_job, job_id)
+
+
+# --- Import Queue ---
+
+async def enqueue_import_job(job_id: str) -> dict:
+    return await run_sync(db.enqueue_import_job, job_id)
+
+
+async def enqueue_import_videos(job_id: str, video_urls: list[str]) -> dict:
+    return await run_sync(db.enqueue_import_videos, job_id, video_urls)
+
+
+async def lease_import_items(worker_id: str, limit: int, lease_seconds: int) -> list[dict]:
+    return await run_sync(db.lease_import_items, worker_id, limit, lease_seconds)
+
+
+async def heartbeat_import_items(worker_id: str, item_ids: list[int], lease_seconds: int) -> int:
+    return await run_sync(db.heartbeat_import_items, worker_id, item_ids, lease_seconds)
+
+
+async def complete_import_item(item_id: int, worker_id: str, status: str, error: dict = None,
+                               retry_in: int = None, count_user: str = None) -> dict | None:
+    return await run_sync(db.complete_import_item, item_id, worker_id, status, error, retry_in,
+                          count_user)
+
+
+async def claim_import(canonical_url: str, owner: str, ttl_seconds: int) -> bool:
+    return await run_sync(db.claim_import, canonical_url, owner, ttl_seconds)
+
+
+async def release_import(canonical_url: str, owner: str) -> None:
+    return await run_sync(db.release_import, canonical_url, owner)
+
+
+# --- Shopping Lists ---
+
+async def get_saved_lists(user_id: str) -> list[dict]:
+    return await run_sync(db.get_saved_lists, user_id)
+
+
+async def save_shopping_list(user_id: str, name: str, recipe_ids: list[str],
+                             items: list[dict]) -> dict:
+    return await run_sync(db.save_shopping_list, user_id, name, recipe_ids, items)
+
+
+async def delete_shopping_list(list_id: str) -> None:
+    return await run_sync(db.delete_shopping_list, list_id)
+
+
+async def count_saved_lists(user_id: str) -> int:
+    return await run_sync(db.count_saved_lists, user_id)
@@ -0,0 +1,155 @@
+import heapq
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import adb
+import db
+from matching import PantryIndex, ingredient_key, coverage_ratio
+from vocab import get_vocabulary, resolve_ids
+
+SUMMARY_FIELDS = ('recipe_name', 'channel_id', 'channel_name', 'image_url',
+                  'servings', 'prep_time', 'cook_time')
+LOAD_COLUMNS = 'id, ingredients, ingredient_ids, updated_at, ' + ', '.join(SUMMARY_FIELDS)
+
+REFRESH_INTERVAL = int(os.environ.get('CATALOG_REFRESH_INTERVAL', '30'))
+# Each refresh re-reads this far behind the newest updated_at seen, so a write
+# that commits after a later one was already read isn't skipped.
+REFRESH_OVERLAP = 60
+
+
+class CatalogIndex:
+    """Vocabulary id -> recipe posting lists over the shared recipes table.
+
+    Postings are keyed by recipes.ingredient_ids, so the ids a pantry resolves
+    to (PantryIndex.matched_ids) select recipes directly. The index follows
+    recipes.updated_at, picking up rows written by any process.
+    """
+
+    def __init__(self):
+        self._postings: dict[int, list[str]] = {}
+        self._recipe_terms: dict[str, list[int]] = {}
+        self._summaries: dict[str, dict] = {}
+        self._updated: dict[str, str] = {}
+        self.max_term_id = 0
+        self._watermark: str | None = None
+        self._refreshed_at = 0.0
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._summaries)
+
+    def add(self, recipe: dict) -> None:
+        rid = recipe['id']
+        ids = recipe.get('ingredient_ids') or []
+        with self._lock:
+            self._remove(rid)
+            if len(ids) != len(recipe.get('ingredients') or []):
+                return
+            for vid in ids:
+                self._postings.setdefault(vid, []).append(rid)
+            self._recipe_terms[rid] = list(ids)
+            self._summaries[rid] = {f: recipe.get(f) for f in SUMMARY_FIELDS}
+            self._updated[rid] = recipe.get('updated_at')
+            self.max_term_id = max(self.max_term_id, *ids, 0)
+
+    def _remove(self, rid: str) -> None:
+        for vid in self._recipe_terms.pop(rid, []):
+            posting = self._postings.get(vid)
+            if posting and rid in posting:
+                posting.remove(rid)
+        self._summaries.pop(rid, None)
+        self._updated.pop(rid, None)
+
+    def _add_rows(self, rows: list[dict]) -> None:
+        # The overlap re-reads rows already indexed; skip the unchanged ones.
+        rows = [r for r in rows if r.get('updated_at') is None
+                or self._updated.get(r['id']) != r['updated_at']]
+        unindexed = [r for r in rows
+                     if len(r.get('ingredient_ids') or []) != len(r.get('ingredients') or [])]
+        if unindexed:
+            # Rows imported before the vocabulary existed; intern them in one go.
+            names = [[ingredient_key(i) for i in r.get('ingredients') or []] for r in unindexed]
+            ids = iter(get_vocabulary().intern([n for row_names in names for n in row_names]))
+            for row, row_names in zip(unindexed, names):
+                row['ingredient_ids'] = [next(ids) for _ in row_names]
+        for row in rows:
+            self.add(row)
+
+    def refresh(self, batch_size: int = 1000, max_age: float = 0) -> None:
+        """Pull recipes inserted or updated since the last refresh."""
+        if max_age and time.monotonic() - self._refreshed_at < max_age:
+            return
+        if not self._refresh_lock.acquire(blocking=False):
+            return  # another thread is already on it
+        try:
+            self._refreshed_at = time.monotonic()
+            since = None
+            if self._watermark:
+                since = (datetime.fromisoformat(self._watermark)
+                         - timedelta(seconds=REFRESH_OVERLAP)).isoformat()
+            after = None
+            while True:
+                rows = db.get_recipes_updated_since(since, after, columns=LOAD_COLUMNS,
+                                                    limit=batch_size)
+                self._add_rows(rows)
+                if rows:
+                    after = (rows[-1]['updated_at'], rows[-1]['id'])
+                    self._watermark = after[0]
+                if len(rows) < batch_size:
+                    return
+        finally:
+            self._refresh_lock.release()
+
+    def search(self, pantry_index: PantryIndex, limit: int = 20,
+               min_coverage: float = 0.0) -> list[dict]:
+        """Top recipes by coverage; pantry_index must be resolved through max_term_id."""
+        counts = Counter()
+        with self._lock:
+            for vid in pantry_index.matched_ids:
+                counts.update(self._postings.get(vid, ()))
+            scored = []
+            for rid, matched in counts.items():
+                total = len(self._recipe_terms.get(rid, ()))
+                coverage = coverage_ratio(matched, total)
+                if coverage >= min_coverage:
+                    scored.append((coverage, matched, rid))
+            top = heapq.nlargest(limit, scored)
+            return [{
+                'recipe_id': rid,
+                **self._summaries[rid],
+                'coverage': coverage,
+                'matched': matched,
+                'total': len(self._recipe_terms[rid]),
+            } for coverage, matched, rid in top]
+
+
+_index: CatalogIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_catalog_index() -> CatalogIndex:
+    """The process-wide index: loaded on first use (main.lifespan warms it),
+    then refreshed from the database at most every REFRESH_INTERVAL seconds."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = CatalogIndex()
+                index.refresh()
+                _index = index
+                return index
+    _index.refresh(max_age=REFRESH_INTERVAL)
+    return _index
+
+
+async def search_catalog(pantry_index: PantryIndex, limit: int = 20,
+                         min_coverage: float = 0.0) -> list[dict]:
+    # Refreshing and resolving wait on the database; only scoring is CPU work.
+    index = await adb.run_sync(get_catalog_index)
+    if index.max_term_id > pantry_index.ids_through:
+        await adb.run_sync(resolve_ids, pantry_index)
+    return await adb.run_cpu(index.search, pantry_index, limit=limit, min_coverage=min_coverage)
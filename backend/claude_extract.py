@@ -4,6 +4,8 @@ import re
 import anthropic
 from bs4 import BeautifulSoup
 
+from quantities import with_parsed_quantity
+
 _client: anthropic.Anthropic | None = None
 
 
@@ -48,13 +50,13 @@ def sanitize_recipe(data: dict) -> dict | None:
     sanitized_ingredients = []
     for ing in ingredients:
         if isinstance(ing, dict):
-            sanitized_ingredients.append({
+            sanitized_ingredients.append(with_parsed_quantity({
                 'name': clean(ing.get('name', ''), 100),
                 'normalized_name': clean(ing.get('normalized_name', ing.get('name', '')), 100).lower(),
                 'quantity': clean(ing.get('quantity', ''), 50),
                 'unit': clean(ing.get('unit', ''), 50),
                 'category': clean(ing.get('category', 'other'), 50),
-            })
+            }))
 
     if not sanitized_ingredients:
         return None
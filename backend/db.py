@@ -1,6 +1,19 @@
+import base64
 import os
+import uuid
 from datetime import datetime
+
+import httpx
 from supabase import create_client, Client
+from supabase.lib.client_options import SyncClientOptions
+
+import recipe_cache
+
+# Connection pool shared by every thread using the client (see adb.py).
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '20'))
+DB_POOL_KEEPALIVE = int(os.environ.get('DB_POOL_KEEPALIVE', '10'))
+DB_KEEPALIVE_EXPIRY = float(os.environ.get('DB_KEEPALIVE_EXPIRY', '30'))
+DB_TIMEOUT = float(os.environ.get('DB_TIMEOUT', '30'))
 
 _client: Client | None = None
 
@@ -12,19 +25,75 @@ def get_client() -> Client:
         key = os.environ.get('SUPABASE_SERVICE_KEY', '')
         if not url or not key:
             raise RuntimeError('SUPABASE_URL and SUPABASE_SERVICE_KEY must be set')
-        _client = create_client(url, key)
+        http_client = httpx.Client(
+            http2=True,
+            timeout=httpx.Timeout(DB_TIMEOUT, connect=5.0),
+            limits=httpx.Limits(max_connections=DB_POOL_SIZE,
+                                max_keepalive_connections=DB_POOL_KEEPALIVE,
+                                keepalive_expiry=DB_KEEPALIVE_EXPIRY),
+        )
+        _client = create_client(url, key, options=SyncClientOptions(httpx_client=http_client))
     return _client
 
 
+# --- Pagination ---
+
+# List screens only need these; full bodies come from the detail route.
+# recipe_summary() in schema.sql builds the same set for the RPCs.
+RECIPE_SUMMARY_COLUMNS = ('id, recipe_name, image_url, channel_id, channel_name, source_type, '
+                          'servings, prep_time, cook_time, created_at')
+USER_RECIPE_SUMMARY_COLUMNS = f'id, recipe_id, rating, notes, added_at, recipes({RECIPE_SUMMARY_COLUMNS})'
+
+
+def encode_keyset(ts: str, row_id: str) -> str:
+    return base64.urlsafe_b64encode(f'k|{ts}|{row_id}'.encode()).decode()
+
+
+def decode_keyset(cursor: str | None) -> tuple[str, str] | None:
+    """(timestamp, id) from a cursor, or ValueError if it isn't one we issued.
+
+    Both parts are parsed and re-serialised before they go into a PostgREST
+    filter string, so a crafted cursor can't add conditions of its own.
+    """
+    if not cursor:
+        return None
+    try:
+        prefix, ts, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        if prefix != 'k':
+            raise ValueError
+        return datetime.fromisoformat(ts).isoformat(), str(uuid.UUID(row_id))
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+
+
+def _keyset_filter(after: tuple[str, str], op: str, column: str = 'added_at') -> str:
+    ts, row_id = after
+    return f'{column}.{op}."{ts}",and({column}.eq."{ts}",id.{op}.{row_id})'
+
+
+def _page(rows: list[dict], limit: int | None, key) -> tuple[list[dict], str | None]:
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_keyset(*key(rows[-1]))
+
+
 # --- Recipes ---
 
 def get_recipe_by_canonical_url(canonical_url: str) -> dict | None:
+    cached = recipe_cache.get_by_url(canonical_url)
+    if cached is not None:
+        return cached
     r = get_client().table('recipes').select('*').eq('canonical_url', canonical_url).execute()
-    return r.data[0] if r.data else None
+    if not r.data:
+        return None
+    recipe_cache.put(r.data[0])
+    return r.data[0]
 
 
 def upsert_recipe(data: dict) -> dict:
     r = get_client().table('recipes').upsert(data, on_conflict='canonical_url').execute()
+    recipe_cache.put(r.data[0])
     return r.data[0]
 
 
@@ -38,21 +107,141 @@ def get_recipes_by_channel(channel_id: str, limit: int = 50, offset: int = 0) ->
     return r.data
 
 
-def search_recipes(search: str = None, channel_id: str = None,
-                   limit: int = 50, offset: int = 0) -> tuple[list[dict], int]:
-    q = get_client().table('recipes').select('*', count='exact')
+SEARCH_EXACT_COUNT_CAP = 1000
+
+
+def search_recipes(search: str = None, channel_id: str = None, limit: int = 50,
+                   offset: int = 0, summary: bool = False) -> tuple[list[dict], int, bool]:
+    """(recipes, total, total_is_estimated).
+
+    Searches go through the ranked search_recipes RPC; totals past its exact
+    cap are planner estimates. Plain listings use PostgREST's estimated count.
+    summary drops ingredients, instructions and equipment from each row.
+    """
+    if search and search.strip():
+        r = get_client().rpc('search_recipes', {
+            'p_query': search.strip(),
+            'p_channel_id': channel_id,
+            'p_limit': limit,
+            'p_offset': offset,
+            'p_exact_cap': SEARCH_EXACT_COUNT_CAP,
+            'p_summary': summary,
+        }).execute()
+        data = r.data or {}
+        return data.get('recipes') or [], data.get('total') or 0, bool(data.get('estimated'))
+
+    q = get_client().table('recipes').select(RECIPE_SUMMARY_COLUMNS if summary else '*',
+                                             count='estimated')
+    if channel_id:
+        q = q.eq('channel_id', channel_id)
+    r = q.order('created_at', desc=True).range(offset, offset + limit - 1).execute()
+    # 'estimated' is exact below PostgREST's max-rows and a planner estimate
+    # above it; the response doesn't say which, so report it as estimated there.
+    return r.data, r.count or 0, (r.count or 0) > SEARCH_EXACT_COUNT_CAP
+
+
+def get_recipes_page(channel_id: str = None, limit: int = 50, cursor: str = None,
+                     summary: bool = False) -> tuple[list[dict], str | None]:
+    """Catalog listing, newest first, keyset-paged on (created_at, id)."""
+    after = decode_keyset(cursor)
+    q = (get_client().table('recipes')
+         .select(RECIPE_SUMMARY_COLUMNS if summary else '*')
+         .order('created_at', desc=True)
+         .order('id', desc=True))
     if channel_id:
         q = q.eq('channel_id', channel_id)
-    if search:
-        q = q.ilike('recipe_name', f'%{search}%')
-    q = q.order('created_at', desc=True).range(offset, offset + limit - 1)
-    r = q.execute()
-    return r.data, r.count or 0
+    if after:
+        q = q.or_(_keyset_filter(after, 'lt', column='created_at'))
+    rows = q.limit(limit + 1).execute().data
+    return _page(rows, limit, lambda row: (row['created_at'], row['id']))
 
 
 def get_recipe_by_id(recipe_id: str) -> dict | None:
+    cached = recipe_cache.get(recipe_id)
+    if cached is not None:
+        return cached
     r = get_client().table('recipes').select('*').eq('id', recipe_id).execute()
-    return r.data[0] if r.data else None
+    if not r.data:
+        return None
+    recipe_cache.put(r.data[0])
+    return r.data[0]
+
+
+def get_recipes_by_ids(recipe_ids: list[str]) -> list[dict]:
+    """Recipes for the given ids, in request order, skipping unknown ids.
+
+    Cached rows are served locally; the rest come back in one query.
+    """
+    ids = list(dict.fromkeys(recipe_ids))
+    by_id = {}
+    for rid in ids:
+        cached = recipe_cache.get(rid)
+        if cached is not None:
+            by_id[rid] = cached
+    missing = [rid for rid in ids if rid not in by_id]
+    if missing:
+        r = get_client().table('recipes').select('*').in_('id', missing).execute()
+        for row in r.data:
+            recipe_cache.put(row)
+            by_id[row['id']] = row
+    return [by_id[rid] for rid in ids if rid in by_id]
+
+
+def get_recipes_after(after_id: str = None, columns: str = '*',
+                      limit: int = 500) -> list[dict]:
+    q = get_client().table('recipes').select(columns).order('id').limit(limit)
+    if after_id:
+        q = q.gt('id', after_id)
+    return q.execute().data
+
+
+def get_recipes_updated_since(since: str | None, after: tuple[str, str] = None,
+                              columns: str = '*', limit: int = 500) -> list[dict]:
+    """Recipes updated at or after since, oldest first, keyset-paged on (updated_at, id)."""
+    q = (get_client().table('recipes').select(columns)
+         .order('updated_at').order('id').limit(limit))
+    if since:
+        q = q.gte('updated_at', since)
+    if after:
+        q = q.or_(_keyset_filter(after, 'gt', column='updated_at'))
+    return q.execute().data
+
+
+def update_recipe_fields(recipe_id: str, fields: dict) -> dict:
+    r = (get_client().table('recipes')
+         .update(fields)
+         .eq('id', recipe_id)
+         .execute())
+    if r.data:
+        recipe_cache.put(r.data[0])
+    else:
+        recipe_cache.invalidate(recipe_id)
+    return r.data[0] if r.data else {}
+
+
+# --- Ingredient Vocabulary ---
+
+def intern_vocab_terms(names: list[str]) -> dict[str, int]:
+    rows = [{'normalized_name': n, 'tokens': n.split()} for n in sorted(set(names))]
+    if not rows:
+        return {}
+    r = (get_client().table('ingredient_vocab')
+         .upsert(rows, on_conflict='normalized_name')
+         .execute())
+    return {row['normalized_name']: row['id'] for row in r.data}
+
+
+def match_vocab_terms(items: list[str], tokens: list[str],
+                      after_id: int = 0) -> tuple[list[int], int]:
+    """(ids above after_id matching the pantry items, id through which the
+    vocabulary is settled; see match_vocab_terms in schema.sql)."""
+    r = get_client().rpc('match_vocab_terms', {
+        'p_items': items,
+        'p_tokens': tokens,
+        'p_after_id': after_id,
+    }).execute()
+    row = r.data[0]
+    return row['term_ids'] or [], row['through'] or 0
 
 
 # --- User Library ---
@@ -63,18 +252,46 @@ def get_user_recipes(user_id: str) -> list[dict]:
          .eq('user_id', user_id)
          .order('added_at', desc=True)
          .execute())
-    results = []
-    for ur in r.data:
-        recipe = ur.pop('recipes', {}) or {}
-        results.append({
-            'user_recipe_id': ur['id'],
-            'recipe_id': ur['recipe_id'],
-            'rating': ur.get('rating'),
-            'notes': ur.get('notes'),
-            'added_at': ur.get('added_at'),
-            **{k: v for k, v in recipe.items() if k != 'id'},
-        })
-    return results
+    return [_flatten_user_recipe(ur) for ur in r.data]
+
+
+def _flatten_user_recipe(ur: dict) -> dict:
+    recipe = ur.pop('recipes', {}) or {}
+    return {
+        'user_recipe_id': ur['id'],
+        'recipe_id': ur['recipe_id'],
+        'rating': ur.get('rating'),
+        'notes': ur.get('notes'),
+        'added_at': ur.get('added_at'),
+        **{k: v for k, v in recipe.items() if k != 'id'},
+    }
+
+
+def get_user_recipes_by_ids(user_recipe_ids: list[str]) -> list[dict]:
+    if not user_recipe_ids:
+        return []
+    r = (get_client().table('user_recipes')
+         .select('*, recipes(*)')
+         .in_('id', list(user_recipe_ids))
+         .execute())
+    return [_flatten_user_recipe(ur) for ur in r.data]
+
+
+def match_library_counts(user_id: str, term_ids: list[int], channel_id: str = None,
+                         require_match: bool = False) -> list[dict]:
+    r = get_client().rpc('match_library_counts', {
+        'p_user_id': user_id,
+        'p_term_ids': term_ids,
+        'p_channel_id': channel_id,
+        'p_require_match': require_match,
+    }).execute()
+    return r.data
+
+
+def get_match_versions(user_id: str) -> dict:
+    """The user's pantry/library versions and the newest recipe update."""
+    r = get_client().rpc('get_match_versions', {'p_user_id': user_id}).execute()
+    return r.data[0]
 
 
 def save_user_recipe(user_id: str, recipe_id: str) -> dict:
@@ -109,14 +326,6 @@ def update_user_recipe(user_id: str, recipe_id: str, rating: int | None = ...,
     return r.data[0] if r.data else {}
 
 
-def get_user_recipe_by_id(user_recipe_id: str) -> dict | None:
-    r = (get_client().table('user_recipes')
-         .select('*')
-         .eq('id', user_recipe_id)
-         .execute())
-    return r.data[0] if r.data else None
-
-
 # --- Favorite Chefs ---
 
 def get_favorite_chefs(user_id: str) -> list[dict]:
@@ -144,82 +353,19 @@ def remove_favorite_chef(user_id: str, channel_id: str) -> None:
 
 def get_user_chefs(user_id: str) -> list[dict]:
     """Get distinct chefs from user's library with recipe counts and favorite status."""
-    recipes = get_user_recipes(user_id)
-    favs = {f['channel_id'] for f in get_favorite_chefs(user_id)}
-    chefs = {}
-    for r in recipes:
-        cid = r.get('channel_id')
-        if not cid:
-            continue
-        if cid not in chefs:
-            chefs[cid] = {
-                'channel_id': cid,
-                'channel_name': r.get('channel_name', ''),
-                'recipe_count': 0,
-                'is_favorite': cid in favs,
-            }
-        chefs[cid]['recipe_count'] += 1
-    return list(chefs.values())
+    r = get_client().rpc('get_user_chefs', {'p_user_id': user_id}).execute()
+    return r.data
 
 
 # --- Collections ---
 
 def get_collections(user_id: str) -> list[dict]:
-    r = (get_client().table('collections')
-         .select('*')
-         .eq('user_id', user_id)
-         .order('sort_order')
-         .execute())
-    collections_data = []
-    user_recipes = get_user_recipes(user_id)
-    all_count = len(user_recipes)
-    all_thumbs = [ur.get('image_url') for ur in user_recipes[:4] if ur.get('image_url')]
-
-    # Get user_recipe_ids that are in at least one user-created collection
-    in_collections = set()
-    for c in r.data:
-        rc = (get_client().table('recipe_collections')
-              .select('user_recipe_id')
-              .eq('collection_id', c['id'])
-              .execute())
-        for row in rc.data:
-            in_collections.add(row['user_recipe_id'])
-
-    # Loose = not in any collection
-    loose = [ur for ur in user_recipes if ur['user_recipe_id'] not in in_collections]
-    loose_thumbs = [ur.get('image_url') for ur in loose[:4] if ur.get('image_url')]
-
-    collections_data.append({
-        'id': 'all_recipes', 'name': 'All Recipes',
-        'recipe_count': all_count, 'thumbnails': all_thumbs,
-        'sort_order': 0, 'is_system': True,
-    })
-    collections_data.append({
-        'id': 'loose_recipes', 'name': 'Loose Recipes',
-        'recipe_count': len(loose), 'thumbnails': loose_thumbs,
-        'sort_order': 1, 'is_system': True,
-    })
-
-    for c in r.data:
-        rc = (get_client().table('recipe_collections')
-              .select('user_recipe_id')
-              .eq('collection_id', c['id'])
-              .execute())
-        count = len(rc.data)
-        thumbs = []
-        for row in rc.data[:4]:
-            ur = get_user_recipe_by_id(row['user_recipe_id'])
-            if ur:
-                recipe = get_recipe_by_id(ur['recipe_id'])
-                if recipe and recipe.get('image_url'):
-                    thumbs.append(recipe['image_url'])
-        collections_data.append({
-            'id': c['id'], 'name': c['name'],
-            'recipe_count': count, 'thumbnails': thumbs,
-            'sort_order': c.get('sort_order', 0), 'is_system': False,
-        })
-
-    return collections_data
+    r = get_client().rpc('get_collections_overview', {'p_user_id': user_id}).execute()
+    return [{
+        'id': row['id'], 'name': row['name'],
+        'recipe_count': row['recipe_count'], 'thumbnails': row.get('thumbnails') or [],
+        'sort_order': row.get('sort_order'), 'is_system': row['is_system'],
+    } for row in r.data]
 
 
 def create_collection(user_id: str, name: str) -> dict:
@@ -276,44 +422,64 @@ def remove_recipe_from_collection(collection_id: str, user_recipe_id: str) -> No
 
 
 def get_collection_recipes(collection_id: str, user_id: str) -> list[dict]:
-    if collection_id == 'all_recipes':
-        return get_user_recipes(user_id)
+    return get_collection_recipes_page(collection_id, user_id)[0]
+
+
+def get_collection_recipes_page(collection_id: str, user_id: str, limit: int = None,
+                                cursor: str = None, summary: bool = False) -> tuple[list[dict], str | None]:
+    """One page of a collection and the cursor for the next (None at the end).
+
+    Library views are newest first; user collections keep the order recipes
+    were added in. Without a limit the whole collection is returned. summary
+    drops ingredients, instructions and equipment from each row.
+    """
+    columns = USER_RECIPE_SUMMARY_COLUMNS if summary else '*, recipes(*)'
+    after = decode_keyset(cursor)
+    fetch = limit + 1 if limit is not None else None
 
     if collection_id == 'loose_recipes':
-        all_recipes = get_user_recipes(user_id)
-        collections = (get_client().table('collections')
-                       .select('id')
-                       .eq('user_id', user_id)
-                       .execute())
-        in_collections = set()
-        for c in collections.data:
-            rc = (get_client().table('recipe_collections')
-                  .select('user_recipe_id')
-                  .eq('collection_id', c['id'])
-                  .execute())
-            for row in rc.data:
-                in_collections.add(row['user_recipe_id'])
-        return [r for r in all_recipes if r['user_recipe_id'] not in in_collections]
-
-    rc = (get_client().table('recipe_collections')
-          .select('user_recipe_id')
-          .eq('collection_id', collection_id)
-          .execute())
-    results = []
-    for row in rc.data:
-        ur = get_user_recipe_by_id(row['user_recipe_id'])
-        if ur:
-            recipe = get_recipe_by_id(ur['recipe_id'])
-            if recipe:
-                results.append({
-                    'user_recipe_id': ur['id'],
-                    'recipe_id': ur['recipe_id'],
-                    'rating': ur.get('rating'),
-                    'notes': ur.get('notes'),
-                    'added_at': ur.get('added_at'),
-                    **{k: v for k, v in recipe.items() if k != 'id'},
-                })
-    return results
+        r = get_client().rpc('get_loose_recipes', {
+            'p_user_id': user_id,
+            'p_after_added_at': after[0] if after else None,
+            'p_after_id': after[1] if after else None,
+            'p_limit': fetch,
+            'p_summary': summary,
+        }).execute()
+        rows = [{
+            'user_recipe_id': row['user_recipe_id'],
+            'recipe_id': row['recipe_id'],
+            'rating': row.get('rating'),
+            'notes': row.get('notes'),
+            'added_at': row.get('added_at'),
+            **{k: v for k, v in (row.get('recipe') or {}).items() if k != 'id'},
+        } for row in r.data]
+        return _page(rows, limit, lambda row: (row['added_at'], row['user_recipe_id']))
+
+    if collection_id == 'all_recipes':
+        q = (get_client().table('user_recipes')
+             .select(columns)
+             .eq('user_id', user_id)
+             .order('added_at', desc=True)
+             .order('id', desc=True))
+        if after:
+            q = q.or_(_keyset_filter(after, 'lt'))
+        if fetch is not None:
+            q = q.limit(fetch)
+        rows = [_flatten_user_recipe(ur) for ur in q.execute().data]
+        return _page(rows, limit, lambda row: (row['added_at'], row['user_recipe_id']))
+
+    q = (get_client().table('recipe_collections')
+         .select(f'id, added_at, user_recipes({columns})')
+         .eq('collection_id', collection_id)
+         .order('added_at')
+         .order('id'))
+    if after:
+        q = q.or_(_keyset_filter(after, 'gt'))
+    if fetch is not None:
+        q = q.limit(fetch)
+    members = [row for row in q.execute().data if row.get('user_recipes')]
+    members, next_cursor = _page(members, limit, lambda row: (row['added_at'], row['id']))
+    return [_flatten_user_recipe(row['user_recipes']) for row in members], next_cursor
 
 
 # --- Pantry ---
@@ -339,9 +505,10 @@ def add_pantry_item(user_id: str, name: str, category: str = 'staple') -> dict:
     return r.data[0]
 
 
-def remove_pantry_item(item_id: str) -> None:
+def remove_pantry_item(user_id: str, item_id: str) -> None:
     (get_client().table('pantry_items')
      .delete()
+     .eq('user_id', user_id)
      .eq('id', item_id)
      .execute())
 
@@ -362,35 +529,24 @@ def create_import_job(user_id: str, source_type: str, source_id: str,
 
 
 def update_import_job(job_id: str, **kwargs) -> dict:
-    updates = {}
-    if 'status' in kwargs:
-        updates['status'] = kwargs['status']
-    if 'total_videos' in kwargs:
-        updates['total_videos'] = kwargs['total_videos']
-
-    if kwargs.get('processed_increment'):
-        job = get_import_job(job_id)
-        updates['processed'] = (job.get('processed') or 0) + 1
-    if kwargs.get('succeeded_increment'):
-        job = job if 'job' in dir() else get_import_job(job_id)
-        updates['succeeded'] = (job.get('succeeded') or 0) + 1
-    if kwargs.get('failed_increment'):
-        job = job if 'job' in dir() else get_import_job(job_id)
-        updates['failed'] = (job.get('failed') or 0) + 1
-
-    if kwargs.get('error'):
-        job = job if 'job' in dir() else get_import_job(job_id)
-        errors = job.get('errors') or []
-        errors.append(kwargs['error'])
-        updates['errors'] = errors
-
-    if updates:
-        r = (get_client().table('import_jobs')
-             .update(updates)
-             .eq('id', job_id)
-             .execute())
-        return r.data[0] if r.data else {}
-    return {}
+    """Apply status/total changes, counter increments and an error in one statement.
+
+    Increments and error appends happen server-side, so concurrent updates to
+    the same job never lose counts. finish=True sets the final status from the
+    succeeded count.
+    """
+    r = get_client().rpc('update_import_job', {
+        'p_job_id': job_id,
+        'p_status': kwargs.get('status'),
+        'p_total_videos': kwargs.get('total_videos'),
+        'p_processed': int(bool(kwargs.get('processed_increment'))),
+        'p_succeeded': int(bool(kwargs.get('succeeded_increment'))),
+        'p_failed': int(bool(kwargs.get('failed_increment'))),
+        'p_error': kwargs.get('error'),
+        'p_finish': bool(kwargs.get('finish')),
+    }).execute()
+    data = r.data[0] if isinstance(r.data, list) and r.data else r.data
+    return data or {}
 
 
 def get_import_job(job_id: str) -> dict | None:
@@ -401,6 +557,86 @@ def get_import_job(job_id: str) -> dict | None:
     return r.data[0] if r.data else None
 
 
+# --- Import Queue ---
+
+def enqueue_import_job(job_id: str) -> dict:
+    """Queue a job's expand item; a worker lists its videos and enqueues them."""
+    r = (get_client().table('import_job_items')
+         .upsert({'job_id': job_id, 'kind': 'expand', 'position': 0},
+                 on_conflict='job_id,kind,position', ignore_duplicates=True)
+         .execute())
+    return r.data[0] if r.data else {}
+
+
+def enqueue_import_videos(job_id: str, video_urls: list[str]) -> dict:
+    if video_urls:
+        (get_client().table('import_job_items')
+         .upsert([{'job_id': job_id, 'kind': 'video', 'position': i, 'url': url}
+                  for i, url in enumerate(video_urls)],
+                 on_conflict='job_id,kind,position', ignore_duplicates=True)
+         .execute())
+    return update_import_job(job_id, status='processing', total_videos=len(video_urls))
+
+
+def lease_import_items(worker_id: str, limit: int, lease_seconds: int) -> list[dict]:
+    r = get_client().rpc('lease_import_items', {
+        'p_worker': worker_id,
+        'p_limit': limit,
+        'p_lease_seconds': lease_seconds,
+    }).execute()
+    return r.data or []
+
+
+def heartbeat_import_items(worker_id: str, item_ids: list[int], lease_seconds: int) -> int:
+    if not item_ids:
+        return 0
+    r = get_client().rpc('heartbeat_import_items', {
+        'p_worker': worker_id,
+        'p_ids': item_ids,
+        'p_lease_seconds': lease_seconds,
+    }).execute()
+    return r.data or 0
+
+
+def complete_import_item(item_id: int, worker_id: str, status: str, error: dict = None,
+                         retry_in: int = None, count_user: str = None) -> dict | None:
+    """Finish a leased item, or requeue it after retry_in seconds.
+
+    A succeeded video item adds one to count_user's monthly import count in
+    the same transaction, so an item is counted once however often it runs.
+    Returns the updated job, or None if the lease had expired and another
+    worker took the item over.
+    """
+    r = get_client().rpc('complete_import_item', {
+        'p_id': item_id,
+        'p_worker': worker_id,
+        'p_status': status,
+        'p_error': error,
+        'p_retry_in_seconds': retry_in,
+        'p_count_user': count_user,
+    }).execute()
+    data = r.data[0] if isinstance(r.data, list) and r.data else r.data
+    # A NULL composite comes back as a row of nulls.
+    return data if data and data.get('id') else None
+
+
+def claim_import(canonical_url: str, owner: str, ttl_seconds: int) -> bool:
+    r = get_client().rpc('claim_import', {
+        'p_canonical_url': canonical_url,
+        'p_owner': owner,
+        'p_ttl_seconds': ttl_seconds,
+    }).execute()
+    return bool(r.data)
+
+
+def release_import(canonical_url: str, owner: str) -> None:
+    (get_client().table('import_claims')
+     .delete()
+     .eq('canonical_url', canonical_url)
+     .eq('claimed_by', owner)
+     .execute())
+
+
 # --- Import Counts ---
 
 def get_import_count(user_id: str, month: str = None) -> int:
@@ -417,56 +653,35 @@ def get_import_count(user_id: str, month: str = None) -> int:
 def increment_import_count(user_id: str, month: str = None) -> int:
     if month is None:
         month = datetime.utcnow().strftime('%Y-%m')
-    existing = (get_client().table('import_counts')
-                .select('*')
-                .eq('user_id', user_id)
-                .eq('month', month)
-                .execute())
-    if existing.data:
-        new_count = existing.data[0]['count'] + 1
-        (get_client().table('import_counts')
-         .update({'count': new_count})
-         .eq('user_id', user_id)
-         .eq('month', month)
-         .execute())
-        return new_count
-    else:
-        (get_client().table('import_counts')
-         .insert({'user_id': user_id, 'month': month, 'count': 1})
-         .execute())
-        return 1
+    r = get_client().rpc('increment_import_count', {'p_user_id': user_id, 'p_month': month}).execute()
+    return r.data
 
 
 # --- Shopping Lists ---
 
 def get_saved_lists(user_id: str) -> list[dict]:
     r = (get_client().table('saved_shopping_lists')
-         .select('*')
+         .select('*, shopping_list_recipes(recipe_id)')
          .eq('user_id', user_id)
          .order('created_at', desc=True)
          .execute())
     results = []
     for sl in r.data:
-        rc = (get_client().table('shopping_list_recipes')
-              .select('recipe_id')
-              .eq('shopping_list_id', sl['id'])
-              .execute())
-        recipe_ids = [row['recipe_id'] for row in rc.data]
-        results.append({**sl, 'recipe_ids': recipe_ids})
+        links = sl.pop('shopping_list_recipes', None) or []
+        results.append({**sl, 'recipe_ids': [row['recipe_id'] for row in links]})
     return results
 
 
 def save_shopping_list(user_id: str, name: str, recipe_ids: list[str],
                        items: list[dict]) -> dict:
-    r = (get_client().table('saved_shopping_lists')
-         .insert({'user_id': user_id, 'name': name, 'items': items})
-         .execute())
-    sl = r.data[0]
-    for rid in recipe_ids:
-        (get_client().table('shopping_list_recipes')
-         .insert({'shopping_list_id': sl['id'], 'recipe_id': rid})
-         .execute())
-    return sl
+    # The list row and its recipe links are written in one transaction.
+    r = get_client().rpc('save_shopping_list', {
+        'p_user_id': user_id,
+        'p_name': name,
+        'p_items': items,
+        'p_recipe_ids': list(dict.fromkeys(recipe_ids)),
+    }).execute()
+    return r.data[0] if isinstance(r.data, list) else r.data
 
 
 def delete_shopping_list(list_id: str) -> None:
@@ -0,0 +1,180 @@
+"""Pooled HTTP client for outbound fetches (video pages, recipe sites).
+
+One AsyncClient per event loop keeps connections alive across imports and
+speaks HTTP/2 where the server offers it. main.py opens it on startup and
+closes it on shutdown; worker.py does the same around its run loop. Redirects
+are not followed here: importer.safe_fetch follows them itself so every hop
+is checked.
+
+Hostnames are resolved off the event loop and cached for DNS_CACHE_TTL. Every
+connection the client opens goes to an address from resolve_public(), so a
+host is checked against BLOCKED_NETWORKS with the same answer it is then
+connected to; a DNS change between the check and the connect can't slip a
+private address through. Proxy settings from the environment are ignored for
+the same reason: a proxy would make the connection on our behalf.
+"""
+import asyncio
+import contextlib
+import ipaddress
+import os
+import socket
+import weakref
+
+import httpcore
+import httpx
+from cachetools import TTLCache
+
+FETCH_TIMEOUT = float(os.environ.get('FETCH_TIMEOUT', '15'))
+FETCH_CONNECT_TIMEOUT = float(os.environ.get('FETCH_CONNECT_TIMEOUT', '5'))
+FETCH_POOL_SIZE = int(os.environ.get('FETCH_POOL_SIZE', '50'))
+FETCH_POOL_KEEPALIVE = int(os.environ.get('FETCH_POOL_KEEPALIVE', '20'))
+FETCH_KEEPALIVE_EXPIRY = float(os.environ.get('FETCH_KEEPALIVE_EXPIRY', '30'))
+# httpx limits connections per pool, not per host; this caps requests in
+# flight to any one host so a big playlist can't hammer a single site.
+FETCH_PER_HOST = int(os.environ.get('FETCH_PER_HOST', '8'))
+# getaddrinfo doesn't report record TTLs, so answers are kept for a fixed
+# period at or below what most hosts publish.
+DNS_CACHE_TTL = float(os.environ.get('DNS_CACHE_TTL', '60'))
+DNS_CACHE_SIZE = 1024
+
+BLOCKED_NETWORKS = [
+    ipaddress.ip_network('10.0.0.0/8'),
+    ipaddress.ip_network('172.16.0.0/12'),
+    ipaddress.ip_network('192.168.0.0/16'),
+    ipaddress.ip_network('169.254.0.0/16'),
+    ipaddress.ip_network('127.0.0.0/8'),
+    ipaddress.ip_network('::1/128'),
+    ipaddress.ip_network('fc00::/7'),
+]
+
+class HostResolutionError(OSError):
+    """A hostname didn't resolve. Often temporary, unlike the ValueErrors
+    raised for private addresses."""
+
+
+_dns_cache = TTLCache(maxsize=DNS_CACHE_SIZE, ttl=DNS_CACHE_TTL)
+_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_host_limits: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def is_private_ip(ip_str: str) -> bool:
+    try:
+        addr = ipaddress.ip_address(ip_str)
+        return any(addr in net for net in BLOCKED_NETWORKS)
+    except ValueError:
+        return True
+
+
+async def resolve(hostname: str) -> list[str]:
+    addresses = _dns_cache.get(hostname)
+    if addresses is None:
+        # Looked up at call time so tests can patch socket.getaddrinfo.
+        results = await asyncio.get_running_loop().run_in_executor(
+            None, socket.getaddrinfo, hostname, None)
+        addresses = _dns_cache[hostname] = list(dict.fromkeys(addr[0] for *_, addr in results))
+    return addresses
+
+
+async def resolve_public(hostname: str) -> list[str]:
+    """hostname's addresses; HostResolutionError if it doesn't resolve,
+    ValueError if any is private."""
+    try:
+        addresses = await resolve(hostname)
+    except socket.gaierror:
+        raise HostResolutionError(f'Could not resolve hostname: {hostname}')
+    if not addresses or any(is_private_ip(ip) for ip in addresses):
+        raise ValueError('URL resolves to a private/internal address')
+    return addresses
+
+
+def clear_dns_cache() -> None:
+    _dns_cache.clear()
+
+
+class _PinnedBackend(httpcore.AsyncNetworkBackend):
+    """Connects to the checked addresses from resolve_public() rather than
+    letting the socket layer resolve the hostname again. TLS still verifies
+    and sends SNI for the hostname."""
+
+    def __init__(self):
+        self._backend = httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        addresses = await resolve_public(host)
+        for i, ip in enumerate(addresses):
+            try:
+                return await self._backend.connect_tcp(ip, port, timeout=timeout,
+                                                       local_address=local_address,
+                                                       socket_options=socket_options)
+            except httpcore.ConnectError:
+                if i == len(addresses) - 1:
+                    raise
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        raise httpcore.ConnectError('Unix sockets are not allowed')
+
+    async def sleep(self, seconds):
+        await self._backend.sleep(seconds)
+
+
+class _PinnedTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, limits: httpx.Limits):
+        super().__init__(http2=True, limits=limits)
+        # httpx has no network_backend option, so swap in an equivalent pool.
+        # AsyncHTTPTransport keeps it in the private _pool, which is why
+        # requirements.txt pins httpx and httpcore exactly; fail here rather
+        # than connect unpinned if an upgrade moves it.
+        if not isinstance(getattr(self, '_pool', None), httpcore.AsyncConnectionPool):
+            raise RuntimeError(f'httpx {httpx.__version__} does not keep its connection pool '
+                               'in _pool; update _PinnedTransport before upgrading')
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            http2=True,
+            network_backend=_PinnedBackend(),
+        )
+
+
+def get_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        limits = httpx.Limits(max_connections=FETCH_POOL_SIZE,
+                              max_keepalive_connections=FETCH_POOL_KEEPALIVE,
+                              keepalive_expiry=FETCH_KEEPALIVE_EXPIRY)
+        client = _clients[loop] = httpx.AsyncClient(
+            transport=_PinnedTransport(limits),
+            trust_env=False,
+            follow_redirects=False,
+            timeout=httpx.Timeout(FETCH_TIMEOUT, connect=FETCH_CONNECT_TIMEOUT),
+        )
+    return client
+
+
+@contextlib.asynccontextmanager
+async def host_limit(host: str):
+    """Hold one of host's FETCH_PER_HOST slots. A host's entry lives only
+    while a request holds or waits for it, so the table doesn't grow with
+    every host ever fetched."""
+    limits = _host_limits.setdefault(asyncio.get_running_loop(), {})
+    entry = limits.get(host)
+    if entry is None:
+        entry = limits[host] = [asyncio.Semaphore(FETCH_PER_HOST), 0]
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if not entry[1]:
+            del limits[host]
+
+
+async def close() -> None:
+    loop = asyncio.get_running_loop()
+    client = _clients.pop(loop, None)
+    _host_limits.pop(loop, None)
+    if client is not None:
+        await client.aclose()
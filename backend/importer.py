@@ -1,13 +1,17 @@
 import asyncio
-import ipaddress
+import functools
 import logging
+import os
 import socket
+import weakref
 from datetime import datetime, timezone
 from urllib.parse import urlparse
 
 import httpx
 
+import adb
 import db
+import http_client
 from url_utils import (
     normalize_url, is_youtube_video, is_youtube_short,
     is_youtube_live, extract_video_id,
@@ -20,29 +24,59 @@ from claude_extract import (
     identify_recipe_url, extract_recipe_from_page,
     extract_recipe_from_transcript, extract_og_image,
 )
+from matching import ingredient_key, equipment_key
+from vocab import get_vocabulary
 
 logger = logging.getLogger(__name__)
 
-BLOCKED_NETWORKS = [
-    ipaddress.ip_network('10.0.0.0/8'),
-    ipaddress.ip_network('172.16.0.0/12'),
-    ipaddress.ip_network('192.168.0.0/16'),
-    ipaddress.ip_network('169.254.0.0/16'),
-    ipaddress.ip_network('127.0.0.0/8'),
-    ipaddress.ip_network('::1/128'),
-    ipaddress.ip_network('fc00::/7'),
-]
+# Bulk imports: videos in flight across all jobs and within one job, plus
+# per-stage limits so page fetches overlap with (rate-limited) LLM calls.
+IMPORT_CONCURRENCY = int(os.environ.get('IMPORT_CONCURRENCY', '16'))
+IMPORT_JOB_CONCURRENCY = int(os.environ.get('IMPORT_JOB_CONCURRENCY', '4'))
+FETCH_CONCURRENCY = int(os.environ.get('IMPORT_FETCH_CONCURRENCY', '8'))
+LLM_CONCURRENCY = int(os.environ.get('IMPORT_LLM_CONCURRENCY', '4'))
 
+# Concurrent imports of one URL share a single extraction per process. With
+# IMPORT_SHARED_CLAIMS=1 a claim row (import_claims) extends that across
+# processes: other workers wait for the claim holder's recipe.
+IMPORT_SHARED_CLAIMS = os.environ.get('IMPORT_SHARED_CLAIMS', '') == '1'
+IMPORT_CLAIM_TTL = int(os.environ.get('IMPORT_CLAIM_TTL', '180'))
+IMPORT_CLAIM_POLL = 1.0
+CLAIM_OWNER = f'{socket.gethostname()}:{os.getpid()}'
 
-def _is_private_ip(ip_str: str) -> bool:
-    try:
-        addr = ipaddress.ip_address(ip_str)
-        return any(addr in net for net in BLOCKED_NETWORKS)
-    except ValueError:
-        return True
+MAX_REDIRECTS = 5
 
 
-async def safe_fetch(url: str) -> httpx.Response:
+class RecipeNotFoundError(Exception):
+    """The video or page was fetched but has no recipe to extract."""
+
+
+_limits: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_flights: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+
+def _limit(stage: str) -> asyncio.Semaphore:
+    # Semaphores belong to one event loop, so keep a set per running loop.
+    limits = _limits.setdefault(asyncio.get_running_loop(), {})
+    if stage not in limits:
+        sizes = {'video': IMPORT_CONCURRENCY, 'fetch': FETCH_CONCURRENCY, 'llm': LLM_CONCURRENCY}
+        limits[stage] = asyncio.Semaphore(sizes[stage])
+    return limits[stage]
+
+
+async def _fetch(fetch_fn, *args, **kwargs):
+    async with _limit('fetch'):
+        return await fetch_fn(*args, **kwargs)
+
+
+async def _blocking(stage: str, fn, *args, **kwargs):
+    """Run a sync network/LLM call on a thread under its stage limit."""
+    async with _limit(stage):
+        return await asyncio.to_thread(fn, *args, **kwargs)
+
+
+async def _check_url(url: str) -> str:
+    """The URL's hostname, if it is http(s) and resolves only to public addresses."""
     parsed = urlparse(url)
     if parsed.scheme not in ('http', 'https'):
         raise ValueError(f'Unsupported scheme: {parsed.scheme}')
@@ -51,22 +85,106 @@ async def safe_fetch(url: str) -> httpx.Response:
     if not hostname:
         raise ValueError('No hostname in URL')
 
+    # Cached, so the client's connect gets the same addresses checked here.
+    await http_client.resolve_public(hostname)
+    return hostname
+
+
+async def safe_fetch(url: str) -> httpx.Response:
+    client = http_client.get_client()
+    for _ in range(MAX_REDIRECTS + 1):
+        # Redirects are followed by hand so each hop is checked, not just the first.
+        hostname = await _check_url(url)
+        async with http_client.host_limit(hostname):
+            resp = await client.get(url)
+        if not resp.is_redirect:
+            resp.raise_for_status()
+            return resp
+        url = str(resp.next_request.url)
+    raise ValueError('Too many redirects')
+
+
+def with_vocab_ids(recipe_row: dict) -> dict:
+    ing_keys = [ingredient_key(i) for i in recipe_row.get('ingredients', [])]
+    eq_keys = [equipment_key(e) for e in recipe_row.get('equipment', [])]
+    try:
+        ids = get_vocabulary().intern(ing_keys + eq_keys)
+    except Exception as e:
+        logger.warning(f'Failed to intern vocabulary terms: {e}')
+        return recipe_row
+    return {
+        **recipe_row,
+        'ingredient_ids': ids[:len(ing_keys)],
+        'equipment_ids': ids[len(ing_keys):],
+    }
+
+
+async def _single_flight(canonical: str, extract) -> tuple[dict, str]:
+    """Run extract() once for concurrent imports of the same canonical URL.
+
+    Every caller awaits the same task and gets the same (recipe, source), or
+    the same exception. The task is shielded, so one caller going away does
+    not cancel the import for the others.
+    """
+    flights = _flights.setdefault(asyncio.get_running_loop(), {})
+    task = flights.get(canonical)
+    if task is None:
+        task = flights[canonical] = asyncio.ensure_future(_claimed(canonical, extract))
+        task.add_done_callback(lambda _: flights.pop(canonical, None))
+    return await asyncio.shield(task)
+
+
+async def _claimed(canonical: str, extract) -> tuple[dict, str]:
+    if not IMPORT_SHARED_CLAIMS:
+        # A flight that finished after the caller's cache lookup has already
+        # been removed from _flights, but its recipe is saved by now.
+        cached = await adb.get_recipe_by_canonical_url(canonical)
+        if cached:
+            return cached, 'cache'
+        return await extract()
+    # Another process may be importing this URL: wait for its recipe, or for
+    # its claim to be released or expire and take over.
+    while not await adb.claim_import(canonical, CLAIM_OWNER, IMPORT_CLAIM_TTL):
+        await asyncio.sleep(IMPORT_CLAIM_POLL)
+        cached = await adb.get_recipe_by_canonical_url(canonical)
+        if cached:
+            return cached, 'cache'
     try:
-        results = socket.getaddrinfo(hostname, None)
-        for _, _, _, _, addr in results:
-            ip = addr[0]
-            if _is_private_ip(ip):
-                raise ValueError('URL resolves to a private/internal address')
-    except socket.gaierror:
-        raise ValueError(f'Could not resolve hostname: {hostname}')
+        cached = await adb.get_recipe_by_canonical_url(canonical)
+        if cached:
+            return cached, 'cache'
+        return await extract()
+    finally:
+        try:
+            await adb.release_import(canonical, CLAIM_OWNER)
+        except Exception as e:
+            logger.warning(f'Failed to release import claim for {canonical}: {e}')
 
-    async with httpx.AsyncClient(timeout=15, follow_redirects=True) as client:
-        resp = await client.get(url)
-        resp.raise_for_status()
-        return resp
+
+async def _finish_import(recipe: dict, source: str, user_id: str = None,
+                         count_import: bool = True) -> dict:
+    if user_id:
+        try:
+            await adb.save_user_recipe(user_id, recipe['id'])
+        except Exception:
+            pass
+        if count_import:
+            await adb.run_sync(increment_import_count_for_user, user_id)
+    return {
+        'recipe_id': recipe['id'],
+        'recipe_name': recipe['recipe_name'],
+        'ingredient_count': len(recipe.get('ingredients', [])),
+        'source': source,
+        'cached': source == 'cache',
+    }
 
 
-async def import_youtube_video(url: str, user_id: str = None) -> dict:
+async def import_youtube_video(url: str, user_id: str = None, count_import: bool = True) -> dict:
+    """Import a video's recipe, saving it to user_id's library if given.
+
+    count_import=False leaves the monthly import count alone; the queue
+    worker counts the video when it records the item as done.
+    """
     if is_youtube_short(url):
         raise ValueError("YouTube Shorts aren't supported — try a regular video link")
     if is_youtube_live(url):
@@ -79,23 +197,16 @@ async def import_youtube_video(url: str, user_id: str = None) -> dict:
     if not video_id:
         raise ValueError('Could not extract video ID')
 
-    cached = db.get_recipe_by_canonical_url(canonical)
+    cached = await adb.get_recipe_by_canonical_url(canonical)
     if cached:
-        if user_id:
-            try:
-                db.save_user_recipe(user_id, cached['id'])
-            except Exception:
-                pass
-            increment_import_count_for_user(user_id)
-        return {
-            'recipe_id': cached['id'],
-            'recipe_name': cached['recipe_name'],
-            'ingredient_count': len(cached.get('ingredients', [])),
-            'source': 'cache',
-            'cached': True,
-        }
-
-    html = await fetch_video_page(video_id, safe_fetch_fn=safe_fetch)
+        return await _finish_import(cached, 'cache', user_id, count_import)
+    recipe, source = await _single_flight(
+        canonical, functools.partial(_extract_youtube_video, canonical, video_id))
+    return await _finish_import(recipe, source, user_id, count_import)
+
+
+async def _extract_youtube_video(canonical: str, video_id: str) -> tuple[dict, str]:
+    html = await _fetch(fetch_video_page, video_id, safe_fetch_fn=safe_fetch)
     metadata = extract_video_metadata(html)
     description = extract_description_text(html)
     thumbnail = get_thumbnail_url(video_id)
@@ -106,15 +217,16 @@ async def import_youtube_video(url: str, user_id: str = None) -> dict:
     recipe_page_url = None
 
     if description:
-        recipe_url = identify_recipe_url(description)
+        recipe_url = await _blocking('llm', identify_recipe_url, description)
         if recipe_url:
             try:
-                page_resp = await safe_fetch(recipe_url)
+                page_resp = await _fetch(safe_fetch, recipe_url)
                 page_html = page_resp.text
                 og_image = extract_og_image(page_html)
                 if og_image:
                     image_url = og_image
-                recipe_data = extract_recipe_from_page(page_html, source_url=recipe_url)
+                recipe_data = await _blocking('llm', extract_recipe_from_page, page_html,
+                                              source_url=recipe_url)
                 if recipe_data:
                     source = 'recipe_link'
                     recipe_page_url = recipe_url
@@ -122,18 +234,18 @@ async def import_youtube_video(url: str, user_id: str = None) -> dict:
                 logger.warning(f'Failed to fetch recipe page {recipe_url}: {e}')
 
     if not recipe_data:
-        transcript = get_transcript(video_id)
+        transcript = await _blocking('fetch', get_transcript, video_id)
         if transcript:
-            recipe_data = extract_recipe_from_transcript(
-                transcript, video_title=metadata.get('title')
+            recipe_data = await _blocking(
+                'llm', extract_recipe_from_transcript, transcript, video_title=metadata.get('title')
             )
             if recipe_data:
                 source = 'transcript'
 
     if not recipe_data:
-        raise ImportError("Couldn't find a recipe in this video")
+        raise RecipeNotFoundError("Couldn't find a recipe in this video")
 
-    db_recipe = db.upsert_recipe({
+    db_recipe = await adb.upsert_recipe(await adb.run_sync(with_vocab_ids, {
         'canonical_url': canonical,
         'source_type': 'youtube',
         'youtube_video_id': video_id,
@@ -149,52 +261,31 @@ async def import_youtube_video(url: str, user_id: str = None) -> dict:
         'channel_id': metadata.get('channel_id'),
         'channel_name': metadata.get('channel_name'),
         'image_url': image_url,
-    })
-
-    if user_id:
-        try:
-            db.save_user_recipe(user_id, db_recipe['id'])
-        except Exception:
-            pass
-        increment_import_count_for_user(user_id)
-
-    return {
-        'recipe_id': db_recipe['id'],
-        'recipe_name': db_recipe['recipe_name'],
-        'ingredient_count': len(recipe_data['ingredients']),
-        'source': source,
-        'cached': False,
-    }
+    }))
+    return db_recipe, source
 
 
 async def import_recipe_url(url: str, user_id: str = None) -> dict:
     canonical = normalize_url(url)
 
-    cached = db.get_recipe_by_canonical_url(canonical)
+    cached = await adb.get_recipe_by_canonical_url(canonical)
     if cached:
-        if user_id:
-            try:
-                db.save_user_recipe(user_id, cached['id'])
-            except Exception:
-                pass
-            increment_import_count_for_user(user_id)
-        return {
-            'recipe_id': cached['id'],
-            'recipe_name': cached['recipe_name'],
-            'ingredient_count': len(cached.get('ingredients', [])),
-            'source': 'cache',
-            'cached': True,
-        }
-
-    page_resp = await safe_fetch(url)
+        return await _finish_import(cached, 'cache', user_id)
+    recipe, source = await _single_flight(
+        canonical, functools.partial(_extract_recipe_url, canonical, url))
+    return await _finish_import(recipe, source, user_id)
+
+
+async def _extract_recipe_url(canonical: str, url: str) -> tuple[dict, str]:
+    page_resp = await _fetch(safe_fetch, url)
     page_html = page_resp.text
     og_image = extract_og_image(page_html)
 
-    recipe_data = extract_recipe_from_page(page_html, source_url=url)
+    recipe_data = await _blocking('llm', extract_recipe_from_page, page_html, source_url=url)
     if not recipe_data:
-        raise ImportError("Couldn't find a recipe on this page")
+        raise RecipeNotFoundError("Couldn't find a recipe on this page")
 
-    db_recipe = db.upsert_recipe({
+    db_recipe = await adb.upsert_recipe(await adb.run_sync(with_vocab_ids, {
         'canonical_url': canonical,
         'source_type': 'website',
         'recipe_url': url,
@@ -206,70 +297,62 @@ async def import_recipe_url(url: str, user_id: str = None) -> dict:
         'instructions': recipe_data.get('instructions', []),
         'equipment': recipe_data.get('equipment', []),
         'image_url': og_image,
-    })
+    }))
+    return db_recipe, 'direct'
 
-    if user_id:
-        try:
-            db.save_user_recipe(user_id, db_recipe['id'])
-        except Exception:
-            pass
-        increment_import_count_for_user(user_id)
 
-    return {
-        'recipe_id': db_recipe['id'],
-        'recipe_name': db_recipe['recipe_name'],
-        'ingredient_count': len(recipe_data['ingredients']),
-        'source': 'direct',
-        'cached': False,
-    }
+async def _import_videos(job_id: str, video_urls: list[str], user_id: str = None):
+    await adb.update_import_job(job_id, total_videos=len(video_urls))
+    job_limit = asyncio.Semaphore(IMPORT_JOB_CONCURRENCY)
 
+    async def import_one(url: str):
+        async with job_limit, _limit('video'):
+            return await import_youtube_video(url, user_id=user_id)
 
-async def run_playlist_import(job_id: str, playlist_id: str, user_id: str):
+    tasks = [asyncio.create_task(import_one(url)) for url in video_urls]
     try:
-        db.update_import_job(job_id, status='processing')
-        # Placeholder: in production, use YouTube Data API to get playlist videos
-        # For now, this structure is correct for when we add OAuth
-        video_urls = []  # await youtube.get_playlist_video_urls(playlist_id)
-        db.update_import_job(job_id, total_videos=len(video_urls))
-
-        for url in video_urls:
+        # Videos run concurrently but are reported in playlist order.
+        for url, task in zip(video_urls, tasks):
             try:
-                await import_youtube_video(url, user_id=user_id)
-                db.update_import_job(job_id, succeeded_increment=True)
+                await task
+                await adb.update_import_job(job_id, succeeded_increment=True, processed_increment=True)
             except Exception as e:
-                db.update_import_job(job_id, failed_increment=True,
-                                     error={'url': url, 'reason': str(e)})
-            db.update_import_job(job_id, processed_increment=True)
+                await adb.update_import_job(job_id, failed_increment=True, processed_increment=True,
+                                            error={'url': url, 'reason': str(e)})
+    finally:
+        for task in tasks:
+            task.cancel()
+    await adb.update_import_job(job_id, finish=True)
 
-        final = db.get_import_job(job_id)
-        status = 'completed' if (final or {}).get('succeeded', 0) > 0 else 'failed'
-        db.update_import_job(job_id, status=status)
-    except Exception as e:
-        db.update_import_job(job_id, status='failed',
-                             error={'url': 'job_level', 'reason': str(e)})
 
+async def list_job_videos(source_type: str, source_id: str) -> list[str]:
+    # Placeholder: in production, use YouTube Data API to get playlist videos
+    # For now, this structure is correct for when we add OAuth
+    # await youtube.get_playlist_video_urls(source_id) / get_channel_video_urls(source_id)
+    return []
 
-async def run_channel_import(job_id: str, channel_id: str, user_id: str):
-    try:
-        db.update_import_job(job_id, status='processing')
-        video_urls = []  # await youtube.get_channel_video_urls(channel_id)
-        db.update_import_job(job_id, total_videos=len(video_urls))
 
-        for url in video_urls:
-            try:
-                await import_youtube_video(url, user_id=None)
-                db.update_import_job(job_id, succeeded_increment=True)
-            except Exception as e:
-                db.update_import_job(job_id, failed_increment=True,
-                                     error={'url': url, 'reason': str(e)})
-            db.update_import_job(job_id, processed_increment=True)
+def job_import_user(source_type: str, user_id: str) -> str | None:
+    # Channel imports fill the shared catalog, not the requester's library.
+    return user_id if source_type == 'playlist' else None
 
-        final = db.get_import_job(job_id)
-        status = 'completed' if (final or {}).get('succeeded', 0) > 0 else 'failed'
-        db.update_import_job(job_id, status=status)
+
+async def _run_job(job_id: str, source_type: str, source_id: str, user_id: str):
+    try:
+        await adb.update_import_job(job_id, status='processing')
+        video_urls = await list_job_videos(source_type, source_id)
+        await _import_videos(job_id, video_urls, user_id=job_import_user(source_type, user_id))
     except Exception as e:
-        db.update_import_job(job_id, status='failed',
-                             error={'url': 'job_level', 'reason': str(e)})
+        await adb.update_import_job(job_id, status='failed',
+                                    error={'url': 'job_level', 'reason': str(e)})
+
+
+async def run_playlist_import(job_id: str, playlist_id: str, user_id: str):
+    await _run_job(job_id, 'playlist', playlist_id, user_id)
+
+
+async def run_channel_import(job_id: str, channel_id: str, user_id: str):
+    await _run_job(job_id, 'channel', channel_id, user_id)
 
 
 def check_import_limit(user_id: str, is_pro: bool = False) -> dict:
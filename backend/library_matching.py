@@ -0,0 +1,89 @@
+import logging
+
+import db
+from matching import PantryIndex, compute_match, rank_matches, select_matches
+from vocab import resolve_ids
+
+logger = logging.getLogger(__name__)
+
+
+def rank_library(user_id: str, pantry_index: PantryIndex, tools_index: PantryIndex,
+                 channel_id: str = None, only_my_tools: bool = False,
+                 limit: int = None, offset: int = 0, min_coverage: float = 0.0,
+                 max_missing: int = None, sort: str = 'coverage') -> tuple[list[dict], int]:
+    """Rank a user's library against their pantry; returns (page, total).
+
+    Counts come from the match_library_counts RPC, so only the returned page
+    is fetched as full rows. If that fails the whole library is loaded and
+    scored in Python.
+    """
+    params = dict(only_my_tools=only_my_tools, limit=limit, offset=offset,
+                  min_coverage=min_coverage, max_missing=max_missing, sort=sort)
+    try:
+        return _rank_in_db(user_id, pantry_index, tools_index, channel_id, **params)
+    except Exception as e:
+        logger.warning(f'Database-side matching unavailable, scoring in Python: {e}')
+
+    recipes = db.get_user_recipes(user_id)
+    if channel_id:
+        recipes = [r for r in recipes if r.get('channel_id') == channel_id]
+    return rank_matches(pantry_index, tools_index, recipes, **params)
+
+
+def _fetch_counts(user_id: str, pantry_index: PantryIndex, channel_id: str | None,
+                  require_match: bool) -> list[dict]:
+    return db.match_library_counts(user_id, sorted(pantry_index.matched_ids), channel_id,
+                                   require_match=require_match)
+
+
+def _has_unresolved_terms(rows: list[dict], *indexes: PantryIndex) -> bool:
+    through = min(index.ids_through for index in indexes)
+    return any((row.get('max_term_id') or 0) > through for row in rows)
+
+
+def _rank_in_db(user_id: str, pantry_index: PantryIndex, tools_index: PantryIndex,
+                channel_id: str | None, only_my_tools: bool, limit: int | None,
+                offset: int, min_coverage: float, max_missing: int | None,
+                sort: str) -> tuple[list[dict], int]:
+    require_match = min_coverage > 0
+    for index in (pantry_index, tools_index):
+        if not index.ids_through:
+            resolve_ids(index)
+    rows = _fetch_counts(user_id, pantry_index, channel_id, require_match)
+    if _has_unresolved_terms(rows, pantry_index, tools_index):
+        # Terms interned since this pantry version was resolved, or too
+        # recently to be settled then.
+        resolve_ids(tools_index)
+        if resolve_ids(pantry_index):
+            rows = _fetch_counts(user_id, pantry_index, channel_id, require_match)
+
+    full = {r['user_recipe_id']: r for r in db.get_user_recipes_by_ids(
+        [row['user_recipe_id'] for row in rows if not row['indexed']])}
+
+    matched, totals, missing_tools = [], [], []
+    for row in rows:
+        recipe = full.get(row['user_recipe_id'])
+        if row['indexed'] or recipe is None:
+            matched.append(row['matched'])
+            totals.append(row['total'])
+            missing_tools.append(sum(
+                not tools_index.matches_id(vid) for vid in row.get('equipment_ids') or []))
+        else:
+            result = compute_match([], [], recipe,
+                                   pantry_index=pantry_index, tools_index=tools_index)
+            matched.append(result['matched'])
+            totals.append(result['total'])
+            missing_tools.append(len(result['missing_tools']))
+
+    selected, total = select_matches((matched, totals, missing_tools), rows,
+                                     only_my_tools=only_my_tools, limit=limit,
+                                     offset=offset, min_coverage=min_coverage,
+                                     max_missing=max_missing, sort=sort)
+
+    page_ids = [rows[i]['user_recipe_id'] for i in selected]
+    full.update({r['user_recipe_id']: r for r in db.get_user_recipes_by_ids(
+        [uid for uid in page_ids if uid not in full])})
+    page = [compute_match([], [], full[uid], only_my_tools=only_my_tools,
+                          pantry_index=pantry_index, tools_index=tools_index)
+            for uid in page_ids if uid in full]
+    return page, total
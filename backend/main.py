@@ -1,8 +1,10 @@
 import asyncio
 import logging
+import os
+from contextlib import asynccontextmanager
 from typing import Optional
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field, field_validator
@@ -11,13 +13,22 @@ from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from dotenv import load_dotenv
 
+import adb
 import db
+import http_client
+import match_cache
+import recipe_cache
+from catalog_index import get_catalog_index, search_catalog
 from importer import (
-    import_youtube_video, import_recipe_url,
+    import_youtube_video, import_recipe_url, RecipeNotFoundError,
     run_playlist_import, run_channel_import,
     check_import_limit,
 )
-from matching import compute_matches, generate_shopping_list
+from matching import (
+    generate_shopping_list, encode_cursor, decode_cursor, SORT_OPTIONS,
+)
+from library_matching import rank_library
+from quantities import parse_quantity, format_amount, scale_ingredients
 from claude_extract import suggest_substitutions
 from url_utils import is_youtube_channel
 from youtube import extract_channel_id_from_url
@@ -25,8 +36,25 @@ from youtube import extract_channel_id_from_url
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+# Run channel/playlist imports on this process's event loop instead of the
+# queue; for local development without a worker (python worker.py).
+IMPORT_INLINE = os.environ.get('IMPORT_INLINE', '') == '1'
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    http_client.get_client()
+    try:
+        await adb.run_sync(get_catalog_index)
+    except Exception as e:
+        # Loaded on the first /api/discover instead.
+        logger.warning(f"Failed to warm the catalog index: {e}")
+    yield
+    await http_client.close()
+
+
 limiter = Limiter(key_func=get_remote_address)
-app = FastAPI(title="PantryPal API", version="1.0.0")
+app = FastAPI(title="PantryPal API", version="1.0.0", lifespan=lifespan)
 app.state.limiter = limiter
 app.add_middleware(
     CORSMiddleware,
@@ -101,6 +129,22 @@ class MatchRequest(BaseModel):
     user_id: str = Field(max_length=100)
     channel_id: Optional[str] = None
     only_my_tools: bool = False
+    limit: Optional[int] = Field(None, ge=1, le=200)
+    cursor: Optional[str] = Field(None, max_length=100)
+    min_coverage: float = Field(0.0, ge=0, le=1)
+    max_missing: Optional[int] = Field(None, ge=0)
+    sort: str = Field(default='coverage', max_length=20)
+    @field_validator('sort')
+    @classmethod
+    def validate_sort(cls, v):
+        if v not in SORT_OPTIONS:
+            raise ValueError(f"sort must be one of {', '.join(SORT_OPTIONS)}")
+        return v
+
+class DiscoverRequest(BaseModel):
+    user_id: str = Field(max_length=100)
+    limit: int = Field(20, ge=1, le=100)
+    min_coverage: float = Field(0.0, ge=0, le=1)
 
 class SubstitutionsRequest(BaseModel):
     user_id: str = Field(max_length=100)
@@ -126,12 +170,17 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/api/stats")
+async def api_stats():
+    return {"match_cache": match_cache.stats(), "recipe_cache": recipe_cache.stats()}
+
+
 # --- Import ---
 
 @app.post("/api/import/youtube")
 @limiter.limit("30/minute")
 async def api_import_youtube(req: ImportYoutubeRequest, request: Request):
-    limit = check_import_limit(req.user_id)
+    limit = await adb.run_sync(check_import_limit, req.user_id)
     if not limit['allowed']:
         return JSONResponse(status_code=403, content={
             "error": "Monthly import limit reached",
@@ -140,16 +189,16 @@ async def api_import_youtube(req: ImportYoutubeRequest, request: Request):
     try:
         result = await import_youtube_video(req.youtube_url, user_id=req.user_id)
         return result
-    except ValueError as e:
+    except (ValueError, http_client.HostResolutionError) as e:
         return JSONResponse(status_code=400, content={"error": str(e)})
-    except ImportError as e:
+    except RecipeNotFoundError as e:
         return JSONResponse(status_code=422, content={"error": str(e)})
 
 
 @app.post("/api/import/recipe-url")
 @limiter.limit("30/minute")
 async def api_import_recipe_url(req: ImportRecipeUrlRequest, request: Request):
-    limit = check_import_limit(req.user_id)
+    limit = await adb.run_sync(check_import_limit, req.user_id)
     if not limit['allowed']:
         return JSONResponse(status_code=403, content={
             "error": "Monthly import limit reached",
@@ -158,12 +207,19 @@ async def api_import_recipe_url(req: ImportRecipeUrlRequest, request: Request):
     try:
         result = await import_recipe_url(req.url, user_id=req.user_id)
         return result
-    except ValueError as e:
+    except (ValueError, http_client.HostResolutionError) as e:
         return JSONResponse(status_code=400, content={"error": str(e)})
-    except ImportError as e:
+    except RecipeNotFoundError as e:
         return JSONResponse(status_code=422, content={"error": str(e)})
 
 
+async def _start_import(job: dict, runner, source_id: str, user_id: str):
+    if IMPORT_INLINE:
+        asyncio.create_task(runner(job['id'], source_id, user_id))
+    else:
+        await adb.enqueue_import_job(job['id'])
+
+
 @app.post("/api/import/channel")
 @limiter.limit("30/minute")
 async def api_import_channel(req: ImportChannelRequest, request: Request):
@@ -172,8 +228,8 @@ async def api_import_channel(req: ImportChannelRequest, request: Request):
     channel_id = extract_channel_id_from_url(req.channel_url)
     if not channel_id:
         return JSONResponse(status_code=400, content={"error": "Could not extract channel ID"})
-    job = db.create_import_job(req.user_id, 'channel', channel_id)
-    asyncio.create_task(run_channel_import(job['id'], channel_id, req.user_id))
+    job = await adb.create_import_job(req.user_id, 'channel', channel_id)
+    await _start_import(job, run_channel_import, channel_id, req.user_id)
     return JSONResponse(status_code=202, content={
         "job_id": job['id'], "channel_id": channel_id,
     })
@@ -182,8 +238,8 @@ async def api_import_channel(req: ImportChannelRequest, request: Request):
 @app.post("/api/import/playlist")
 @limiter.limit("30/minute")
 async def api_import_playlist(req: ImportPlaylistRequest, request: Request):
-    job = db.create_import_job(req.user_id, 'playlist', req.playlist_id)
-    asyncio.create_task(run_playlist_import(job['id'], req.playlist_id, req.user_id))
+    job = await adb.create_import_job(req.user_id, 'playlist', req.playlist_id)
+    await _start_import(job, run_playlist_import, req.playlist_id, req.user_id)
     return JSONResponse(status_code=202, content={
         "job_id": job['id'],
     })
@@ -191,7 +247,7 @@ async def api_import_playlist(req: ImportPlaylistRequest, request: Request):
 
 @app.get("/api/import/job/{job_id}")
 async def api_get_import_job(job_id: str):
-    job = db.get_import_job(job_id)
+    job = await adb.get_import_job(job_id)
     if not job:
         return JSONResponse(status_code=404, content={"error": "Job not found"})
     return job
@@ -200,7 +256,7 @@ async def api_get_import_job(job_id: str):
 @app.get("/api/import/limit/{user_id}")
 @limiter.limit("30/minute")
 async def api_get_import_limit(user_id: str, request: Request):
-    return check_import_limit(user_id)
+    return await adb.run_sync(check_import_limit, user_id)
 
 
 # --- Shared Recipes ---
@@ -208,18 +264,40 @@ async def api_get_import_limit(user_id: str, request: Request):
 @app.get("/api/recipes")
 @limiter.limit("30/minute")
 async def api_get_recipes(request: Request, channel_id: str = None,
-                          search: str = None, limit: int = 50, offset: int = 0):
-    recipes, total = db.search_recipes(search=search, channel_id=channel_id,
-                                       limit=min(limit, 100), offset=offset)
-    return {"recipes": recipes, "total": total}
+                          search: str = None, limit: int = 50, offset: int = 0,
+                          cursor: str = None, summary: bool = False):
+    # Passing cursor (empty for the first page) selects keyset paging; search
+    # results are ranked, so they page by offset only. summary only changes
+    # the columns, never the response shape.
+    if cursor is not None and search:
+        return JSONResponse(status_code=400, content={"error": "cursor can't be combined with search"})
+    if cursor is not None:
+        try:
+            recipes, next_cursor = await adb.get_recipes_page(
+                channel_id=channel_id, limit=min(max(limit, 1), 100), cursor=cursor or None,
+                summary=summary)
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"error": str(e)})
+        return {"recipes": recipes, "next_cursor": next_cursor}
+    recipes, total, estimated = await adb.search_recipes(
+        search=search, channel_id=channel_id, limit=min(limit, 100), offset=offset,
+        summary=summary)
+    return {"recipes": recipes, "total": total, "total_estimated": estimated}
 
 
 @app.get("/api/recipes/{recipe_id}")
 @limiter.limit("30/minute")
-async def api_get_recipe(recipe_id: str, request: Request):
-    recipe = db.get_recipe_by_id(recipe_id)
+async def api_get_recipe(recipe_id: str, request: Request,
+                         servings: Optional[float] = Query(None, gt=0)):
+    recipe = await adb.get_recipe_by_id(recipe_id)
     if not recipe:
         return JSONResponse(status_code=404, content={"error": "Recipe not found"})
+    if servings is not None:
+        base = parse_quantity(recipe.get('servings')).get('amount')
+        if not base:
+            return JSONResponse(status_code=400, content={"error": "Recipe has no numeric servings to scale from"})
+        recipe = {**recipe, 'servings': format_amount(servings),
+                  'ingredients': scale_ingredients(recipe.get('ingredients') or [], servings / base)}
     return recipe
 
 
@@ -227,15 +305,16 @@ async def api_get_recipe(recipe_id: str, request: Request):
 
 @app.get("/api/user/{user_id}/recipes")
 @limiter.limit("30/minute")
-async def api_get_user_recipes(user_id: str, request: Request):
-    return {"recipes": db.get_user_recipes(user_id)}
+async def api_get_user_recipes(user_id: str, request: Request, limit: Optional[int] = None,
+                               cursor: str = None, summary: bool = False):
+    return await _collection_page(user_id, 'all_recipes', limit, cursor, summary)
 
 
 @app.post("/api/user/{user_id}/recipes")
 @limiter.limit("30/minute")
 async def api_add_user_recipe(user_id: str, req: AddRecipeRequest, request: Request):
     try:
-        result = db.save_user_recipe(user_id, req.recipe_id)
+        result = await adb.save_user_recipe(user_id, req.recipe_id)
         return JSONResponse(status_code=201, content={
             "user_recipe_id": result['id'], "recipe_id": req.recipe_id,
         })
@@ -246,7 +325,7 @@ async def api_add_user_recipe(user_id: str, req: AddRecipeRequest, request: Requ
 @app.delete("/api/user/{user_id}/recipes/{recipe_id}")
 @limiter.limit("30/minute")
 async def api_remove_user_recipe(user_id: str, recipe_id: str, request: Request):
-    db.remove_user_recipe(user_id, recipe_id)
+    await adb.remove_user_recipe(user_id, recipe_id)
     return JSONResponse(status_code=204, content=None)
 
 
@@ -254,7 +333,7 @@ async def api_remove_user_recipe(user_id: str, recipe_id: str, request: Request)
 @limiter.limit("30/minute")
 async def api_update_user_recipe(user_id: str, recipe_id: str,
                                  req: UpdateRecipeRequest, request: Request):
-    result = db.update_user_recipe(user_id, recipe_id,
+    result = await adb.update_user_recipe(user_id, recipe_id,
                                    rating=req.rating if req.rating is not None else ...,
                                    notes=req.notes if req.notes is not None else ...)
     return result
@@ -265,26 +344,26 @@ async def api_update_user_recipe(user_id: str, recipe_id: str,
 @app.get("/api/user/{user_id}/chefs")
 @limiter.limit("30/minute")
 async def api_get_user_chefs(user_id: str, request: Request):
-    return {"chefs": db.get_user_chefs(user_id)}
+    return {"chefs": await adb.get_user_chefs(user_id)}
 
 
 @app.get("/api/user/{user_id}/chefs/favorites")
 @limiter.limit("30/minute")
 async def api_get_favorite_chefs(user_id: str, request: Request):
-    return {"chefs": db.get_favorite_chefs(user_id)}
+    return {"chefs": await adb.get_favorite_chefs(user_id)}
 
 
 @app.post("/api/user/{user_id}/chefs/favorites")
 @limiter.limit("30/minute")
 async def api_add_favorite_chef(user_id: str, req: FavoriteChefRequest, request: Request):
-    db.add_favorite_chef(user_id, req.channel_id)
+    await adb.add_favorite_chef(user_id, req.channel_id)
     return JSONResponse(status_code=201, content={"status": "ok"})
 
 
 @app.delete("/api/user/{user_id}/chefs/favorites/{channel_id}")
 @limiter.limit("30/minute")
 async def api_remove_favorite_chef(user_id: str, channel_id: str, request: Request):
-    db.remove_favorite_chef(user_id, channel_id)
+    await adb.remove_favorite_chef(user_id, channel_id)
     return JSONResponse(status_code=204, content=None)
 
 
@@ -293,14 +372,14 @@ async def api_remove_favorite_chef(user_id: str, channel_id: str, request: Reque
 @app.get("/api/user/{user_id}/pantry")
 @limiter.limit("30/minute")
 async def api_get_pantry(user_id: str, request: Request):
-    return db.get_pantry(user_id)
+    return await adb.get_pantry(user_id)
 
 
 @app.post("/api/user/{user_id}/pantry")
 @limiter.limit("30/minute")
 async def api_add_pantry_item(user_id: str, req: PantryItemRequest, request: Request):
     try:
-        result = db.add_pantry_item(user_id, req.name, req.category)
+        result = await adb.add_pantry_item(user_id, req.name, req.category)
         return JSONResponse(status_code=201, content=result)
     except Exception:
         return JSONResponse(status_code=409, content={"error": "Item already exists"})
@@ -309,7 +388,7 @@ async def api_add_pantry_item(user_id: str, req: PantryItemRequest, request: Req
 @app.delete("/api/user/{user_id}/pantry/{item_id}")
 @limiter.limit("30/minute")
 async def api_remove_pantry_item(user_id: str, item_id: str, request: Request):
-    db.remove_pantry_item(item_id)
+    await adb.remove_pantry_item(user_id, item_id)
     return JSONResponse(status_code=204, content=None)
 
 
@@ -318,13 +397,13 @@ async def api_remove_pantry_item(user_id: str, item_id: str, request: Request):
 @app.get("/api/user/{user_id}/collections")
 @limiter.limit("30/minute")
 async def api_get_collections(user_id: str, request: Request):
-    return {"collections": db.get_collections(user_id)}
+    return {"collections": await adb.get_collections(user_id)}
 
 
 @app.post("/api/user/{user_id}/collections")
 @limiter.limit("30/minute")
 async def api_create_collection(user_id: str, req: CreateCollectionRequest, request: Request):
-    result = db.create_collection(user_id, req.name)
+    result = await adb.create_collection(user_id, req.name)
     return JSONResponse(status_code=201, content=result)
 
 
@@ -332,34 +411,52 @@ async def api_create_collection(user_id: str, req: CreateCollectionRequest, requ
 @limiter.limit("30/minute")
 async def api_rename_collection(user_id: str, collection_id: str,
                                 req: RenameCollectionRequest, request: Request):
-    return db.rename_collection(collection_id, req.name)
+    return await adb.rename_collection(collection_id, req.name)
 
 
 @app.delete("/api/user/{user_id}/collections/{collection_id}")
 @limiter.limit("30/minute")
 async def api_delete_collection(user_id: str, collection_id: str, request: Request):
-    db.delete_collection(collection_id)
+    await adb.delete_collection(collection_id)
     return JSONResponse(status_code=204, content=None)
 
 
 @app.put("/api/user/{user_id}/collections/reorder")
 @limiter.limit("30/minute")
 async def api_reorder_collections(user_id: str, req: ReorderCollectionsRequest, request: Request):
-    db.reorder_collections(user_id, req.ordered_ids)
+    await adb.reorder_collections(user_id, req.ordered_ids)
     return {"status": "ok"}
 
 
 @app.get("/api/user/{user_id}/collections/{collection_id}/recipes")
 @limiter.limit("30/minute")
-async def api_get_collection_recipes(user_id: str, collection_id: str, request: Request):
-    return {"recipes": db.get_collection_recipes(collection_id, user_id)}
+async def api_get_collection_recipes(user_id: str, collection_id: str, request: Request,
+                                     limit: Optional[int] = None, cursor: str = None,
+                                     summary: bool = False):
+    return await _collection_page(user_id, collection_id, limit, cursor, summary)
+
+
+async def _collection_page(user_id: str, collection_id: str, limit: int | None,
+                           cursor: str | None, summary: bool):
+    if limit is None and cursor is None:
+        if collection_id == 'all_recipes' and not summary:
+            return {"recipes": await adb.get_user_recipes(user_id)}
+        recipes, _ = await adb.get_collection_recipes_page(collection_id, user_id, summary=summary)
+        return {"recipes": recipes}
+    try:
+        recipes, next_cursor = await adb.get_collection_recipes_page(
+            collection_id, user_id, limit=min(max(limit or 50, 1), 200), cursor=cursor,
+            summary=summary)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    return {"recipes": recipes, "next_cursor": next_cursor}
 
 
 @app.post("/api/user/{user_id}/collections/{collection_id}/recipes")
 @limiter.limit("30/minute")
 async def api_add_to_collection(user_id: str, collection_id: str,
                                 req: CollectionRecipeRequest, request: Request):
-    db.add_recipe_to_collection(collection_id, req.user_recipe_id)
+    await adb.add_recipe_to_collection(collection_id, req.user_recipe_id)
     return JSONResponse(status_code=201, content={"status": "ok"})
 
 
@@ -367,26 +464,64 @@ async def api_add_to_collection(user_id: str, collection_id: str,
 @limiter.limit("30/minute")
 async def api_remove_from_collection(user_id: str, collection_id: str,
                                      user_recipe_id: str, request: Request):
-    db.remove_recipe_from_collection(collection_id, user_recipe_id)
+    await adb.remove_recipe_from_collection(collection_id, user_recipe_id)
     return JSONResponse(status_code=204, content=None)
 
 
 # --- Matching ---
 
-@app.post("/api/match")
-@limiter.limit("30/minute")
-async def api_match(req: MatchRequest, request: Request):
-    pantry = db.get_pantry(req.user_id)
+def _load_pantry_lists(user_id: str) -> tuple[list[str], list[str]]:
+    pantry = db.get_pantry(user_id)
     pantry_items = [i['name'] for i in pantry.get('staples', [])] + \
                    [i['name'] for i in pantry.get('current', [])]
     user_tools = [i['name'] for i in pantry.get('tools', [])]
+    return pantry_items, user_tools
+
 
-    recipes = db.get_user_recipes(req.user_id)
-    if req.channel_id:
-        recipes = [r for r in recipes if r.get('channel_id') == req.channel_id]
+async def _pantry_indexes(user_id: str, versions: dict = None):
+    versions = versions or await adb.get_match_versions(user_id)
+    return await adb.run_sync(match_cache.get_pantry_indexes, user_id, versions['pantry_version'],
+                              lambda: _load_pantry_lists(user_id))
+
+
+@app.post("/api/match")
+@limiter.limit("30/minute")
+async def api_match(req: MatchRequest, request: Request):
+    try:
+        offset = decode_cursor(req.cursor)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
 
-    matches = compute_matches(pantry_items, user_tools, recipes,
-                              only_my_tools=req.only_my_tools)
+    versions = await adb.get_match_versions(req.user_id)
+    key = match_cache.result_key(req.user_id, versions, req.only_my_tools, req.channel_id,
+                                 req.limit, offset, req.min_coverage,
+                                 req.max_missing, req.sort)
+    result = match_cache.get_result(key)
+    if result is not None:
+        return result
+
+    pantry_index, tools_index = await _pantry_indexes(req.user_id, versions)
+    matches, total = await adb.run_sync(rank_library, req.user_id, pantry_index, tools_index,
+                                        channel_id=req.channel_id,
+                                        only_my_tools=req.only_my_tools,
+                                        limit=req.limit, offset=offset,
+                                        min_coverage=req.min_coverage,
+                                        max_missing=req.max_missing, sort=req.sort)
+    more = req.limit is not None and offset + len(matches) < total
+    result = {
+        "matches": matches,
+        "total": total,
+        "next_cursor": encode_cursor(offset + len(matches)) if more else None,
+    }
+    match_cache.put_result(key, result)
+    return result
+
+
+@app.post("/api/discover")
+@limiter.limit("30/minute")
+async def api_discover(req: DiscoverRequest, request: Request):
+    pantry_index, _ = await _pantry_indexes(req.user_id)
+    matches = await search_catalog(pantry_index, limit=req.limit, min_coverage=req.min_coverage)
     return {"matches": matches}
 
 
@@ -405,49 +540,41 @@ async def api_substitutions(req: SubstitutionsRequest, request: Request):
 @app.post("/api/shopping-list/generate")
 @limiter.limit("30/minute")
 async def api_generate_shopping_list(req: GenerateShoppingListRequest, request: Request):
-    pantry = db.get_pantry(req.user_id)
-    pantry_items = [i['name'] for i in pantry.get('staples', [])] + \
-                   [i['name'] for i in pantry.get('current', [])]
-
-    recipes = []
-    for rid in req.recipe_ids:
-        recipe = db.get_recipe_by_id(rid)
-        if recipe:
-            recipes.append(recipe)
-
-    items = generate_shopping_list(pantry_items, recipes)
+    pantry_index, _ = await _pantry_indexes(req.user_id)
+    recipes = await adb.get_recipes_by_ids(req.recipe_ids)
+    items = await adb.run_cpu(generate_shopping_list, [], recipes, pantry_index=pantry_index)
     return {"items": items}
 
 
 @app.get("/api/user/{user_id}/shopping-lists")
 @limiter.limit("30/minute")
 async def api_get_shopping_lists(user_id: str, request: Request):
-    return {"lists": db.get_saved_lists(user_id)}
+    return {"lists": await adb.get_saved_lists(user_id)}
 
 
 @app.post("/api/user/{user_id}/shopping-lists")
 @limiter.limit("30/minute")
 async def api_save_shopping_list(user_id: str, req: SaveShoppingListRequest, request: Request):
-    count = db.count_saved_lists(user_id)
+    count = await adb.count_saved_lists(user_id)
     # TODO: check isPro for 10 limit vs 1
     if count >= 10:
         return JSONResponse(status_code=403, content={
             "error": "You've reached the maximum number of saved shopping lists.",
             "count": count, "limit": 10,
         })
-    result = db.save_shopping_list(user_id, req.name, req.recipe_ids, req.items)
+    result = await adb.save_shopping_list(user_id, req.name, req.recipe_ids, req.items)
     return JSONResponse(status_code=201, content={"id": result['id'], "name": result['name']})
 
 
 @app.delete("/api/user/{user_id}/shopping-lists/{list_id}")
 @limiter.limit("30/minute")
 async def api_delete_shopping_list(user_id: str, list_id: str, request: Request):
-    db.delete_shopping_list(list_id)
+    await adb.delete_shopping_list(list_id)
     return JSONResponse(status_code=204, content=None)
 
 
 @app.get("/api/user/{user_id}/shopping-lists/count")
 @limiter.limit("30/minute")
 async def api_shopping_list_count(user_id: str, request: Request):
-    count = db.count_saved_lists(user_id)
+    count = await adb.count_saved_lists(user_id)
     return {"count": count, "limit": 10, "is_pro": False}
@@ -0,0 +1,74 @@
+import threading
+
+from cachetools import TTLCache
+
+from matching import PantryIndex
+
+RESULT_CACHE_SIZE = 1024
+RESULT_CACHE_TTL = 300
+INDEX_CACHE_SIZE = 512
+INDEX_CACHE_TTL = 1800
+
+# Entries are keyed by the versions from db.get_match_versions, read with each
+# request. Triggers bump them on every pantry or library write, so a result
+# computed before a write is never served after it, whichever process wrote.
+_lock = threading.Lock()
+_results = TTLCache(maxsize=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL)
+_indexes = TTLCache(maxsize=INDEX_CACHE_SIZE, ttl=INDEX_CACHE_TTL)
+_counters = {'hits': 0, 'misses': 0, 'index_hits': 0, 'index_misses': 0}
+
+
+def result_key(user_id: str, versions: dict, only_my_tools: bool,
+               channel_id: str | None, *extra) -> tuple:
+    return (user_id, versions['pantry_version'], versions['library_version'],
+            versions['catalog_version'], only_my_tools, channel_id or '', *extra)
+
+
+def get_result(key: tuple):
+    with _lock:
+        value = _results.get(key)
+        _counters['hits' if value is not None else 'misses'] += 1
+        return value
+
+
+def put_result(key: tuple, value) -> None:
+    with _lock:
+        _results[key] = value
+
+
+def get_pantry_indexes(user_id: str, pantry_version: int,
+                       load_pantry) -> tuple[PantryIndex, PantryIndex]:
+    """(pantry_index, tools_index) for the given version of the user's pantry.
+
+    load_pantry is called on a miss and must return (pantry_items, user_tools).
+    """
+    key = (user_id, pantry_version)
+    with _lock:
+        indexes = _indexes.get(key)
+        _counters['index_hits' if indexes is not None else 'index_misses'] += 1
+    if indexes is None:
+        pantry_items, user_tools = load_pantry()
+        indexes = (PantryIndex(pantry_items), PantryIndex(user_tools))
+        with _lock:
+            _indexes[key] = indexes
+    return indexes
+
+
+def stats() -> dict:
+    with _lock:
+        lookups = _counters['hits'] + _counters['misses']
+        return {
+            **_counters,
+            'hit_rate': round(_counters['hits'] / lookups, 4) if lookups else 0,
+            'size': len(_results),
+            'maxsize': _results.maxsize,
+            'index_size': len(_indexes),
+        }
+
+
+def clear() -> None:
+    with _lock:
+        _results.clear()
+        _indexes.clear()
+        for k in _counters:
+            _counters[k] = 0
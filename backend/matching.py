@@ -1,3 +1,10 @@
+import base64
+import functools
+import heapq
+
+from quantities import parse_quantity, format_amount
+
+
 def _normalize_name(name: str) -> str:
     return name.lower().strip()
 
@@ -8,6 +15,21 @@ def _token_overlap(a: str, b: str) -> bool:
     return bool(tokens_a & tokens_b)
 
 
+def ingredient_key(ing: dict) -> str:
+    return _normalize_name(ing.get('normalized_name', ing.get('name', '')))
+
+
+def equipment_key(eq: dict) -> str:
+    return _normalize_name(eq.get('name', ''))
+
+
+def _aligned_ids(recipe: dict, field: str, items: list) -> list[int] | None:
+    ids = recipe.get(field)
+    if ids and len(ids) == len(items):
+        return ids
+    return None
+
+
 def _ingredient_matches(pantry_name: str, recipe_normalized: str) -> bool:
     pn = _normalize_name(pantry_name)
     rn = _normalize_name(recipe_normalized)
@@ -16,21 +38,181 @@ def _ingredient_matches(pantry_name: str, recipe_normalized: str) -> bool:
     return _token_overlap(pn, rn)
 
 
-def compute_match(pantry_items: list[str], user_tools: list[str], recipe: dict,
-                  only_my_tools: bool = False, tool_subs: dict = None) -> dict | None:
+class _SubstringAutomaton:
+    """Aho-Corasick automaton answering "does any pattern occur in text"."""
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [False]
+        for pattern in patterns:
+            state = 0
+            for ch in pattern:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(False)
+                state = nxt
+            self._out[state] = True
+
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                fallback = self._goto[f].get(ch, 0)
+                self._fail[nxt] = fallback if fallback != nxt else 0
+                self._out[nxt] = self._out[nxt] or self._out[self._fail[nxt]]
+
+    def search(self, text: str) -> bool:
+        goto, fail, out = self._goto, self._fail, self._out
+        if out[0]:
+            return True
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                return True
+        return False
+
+
+class PantryIndex:
+    """Precomputed lookup over a pantry (or tool list) with the same semantics
+    as running _ingredient_matches against every item.
+
+    Build one per pantry version and reuse it across recipes; answers are
+    memoized per normalized ingredient name. Once the vocabulary has been
+    resolved against it (add_resolved_ids), interned ids are answered by set
+    membership without looking at names.
+    """
+
+    _SEPARATOR = '\x00'
+
+    def __init__(self, items: list[str]):
+        names = [_normalize_name(i) for i in items]
+        self.items = names
+        self._tokens = set()
+        for n in names:
+            self._tokens.update(n.split())
+        self._automaton = _SubstringAutomaton(names)
+        self._haystack = self._SEPARATOR.join(names)
+        self._memo: dict[str, bool] = {}
+        self._matched_ids: frozenset[int] = frozenset()
+        self.ids_through = 0
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    @property
+    def tokens(self) -> set[str]:
+        return self._tokens
+
+    def matches(self, name: str) -> bool:
+        rn = _normalize_name(name)
+        hit = self._memo.get(rn)
+        if hit is None:
+            hit = self._memo[rn] = self._lookup(rn)
+        return hit
+
+    @property
+    def matched_ids(self) -> frozenset[int]:
+        return self._matched_ids
+
+    def add_resolved_ids(self, matched: set[int], through: int) -> bool:
+        """Record which vocabulary ids up to through match this index.
+
+        matched may also hold newer ids. Returns whether any id was new.
+        """
+        # Set before through moves, so a concurrent reader never sees an id
+        # counted as resolved without its answer.
+        before = self._matched_ids
+        self._matched_ids = before | frozenset(matched)
+        self.ids_through = max(self.ids_through, through)
+        return len(self._matched_ids) > len(before)
+
+    def matches_id(self, vid: int, name: str = None) -> bool:
+        """Like matches() for the interned vocabulary id of name.
+
+        Resolved ids are a set lookup; newer ones fall back to matching name,
+        and count as missing if no name is given.
+        """
+        if vid in self._matched_ids:
+            return True
+        if vid <= self.ids_through:
+            return False
+        return name is not None and self.matches(name)
+
+    def _lookup(self, rn: str) -> bool:
+        if not self.items:
+            return False
+        # recipe name contained in a pantry item
+        if self._SEPARATOR in rn:
+            if any(rn in p for p in self.items):
+                return True
+        elif rn in self._haystack:
+            return True
+        # pantry item contained in the recipe name
+        if self._automaton.search(rn):
+            return True
+        return any(t in self._tokens for t in rn.split())
+
+
+@functools.lru_cache(maxsize=32)
+def _cached_index(items: tuple[str, ...]) -> PantryIndex:
+    return PantryIndex(list(items))
+
+
+def _index_for(items: list[str], index: PantryIndex | None) -> PantryIndex:
+    """index, or a PantryIndex for items shared across calls, so callers
+    matching one pantry recipe by recipe don't rebuild it each time."""
+    return index if index is not None else _cached_index(tuple(items or ()))
+
+
+def _ingredient_hits(recipe: dict, pantry_index: PantryIndex):
+    """Yield (ingredient, normalized_name, found) for each recipe ingredient."""
     ingredients = recipe.get('ingredients', [])
+    ingredient_ids = _aligned_ids(recipe, 'ingredient_ids', ingredients)
+    for i, ing in enumerate(ingredients):
+        norm = ingredient_key(ing)
+        if ingredient_ids:
+            yield ing, norm, pantry_index.matches_id(ingredient_ids[i], norm)
+        else:
+            yield ing, norm, pantry_index.matches(norm)
+
+
+def _tool_hits(recipe: dict, tools_index: PantryIndex, tool_subs: dict):
+    """Yield (equipment, covered) where covered means owned or substitutable."""
     equipment = recipe.get('equipment', [])
+    equipment_ids = _aligned_ids(recipe, 'equipment_ids', equipment)
+    for i, eq in enumerate(equipment):
+        eq_name = equipment_key(eq)
+        if equipment_ids:
+            has_tool = tools_index.matches_id(equipment_ids[i], eq_name)
+        else:
+            has_tool = tools_index.matches(eq_name)
+        yield eq, has_tool or eq_name in tool_subs
+
+
+def compute_match(pantry_items: list[str], user_tools: list[str], recipe: dict,
+                  only_my_tools: bool = False, tool_subs: dict = None,
+                  pantry_index: PantryIndex = None,
+                  tools_index: PantryIndex = None) -> dict | None:
     tool_subs = tool_subs or {}
+    pantry_index = _index_for(pantry_items, pantry_index)
+    tools_index = _index_for(user_tools, tools_index)
 
     matched_count = 0
-    total = len(ingredients)
+    total = len(recipe.get('ingredients', []))
     missing_ingredients = []
 
-    pantry_lower = [_normalize_name(p) for p in pantry_items]
-
-    for ing in ingredients:
-        norm = _normalize_name(ing.get('normalized_name', ing.get('name', '')))
-        found = any(_ingredient_matches(p, norm) for p in pantry_lower)
+    for ing, norm, found in _ingredient_hits(recipe, pantry_index):
         if found:
             matched_count += 1
         else:
@@ -40,13 +222,9 @@ def compute_match(pantry_items: list[str], user_tools: list[str], recipe: dict,
             })
 
     missing_tools = []
-    tools_lower = [_normalize_name(t) for t in user_tools]
 
-    for eq in equipment:
-        eq_name = _normalize_name(eq.get('name', ''))
-        has_tool = any(_ingredient_matches(t, eq_name) for t in tools_lower)
-        has_sub = eq_name in tool_subs
-        if not has_tool and not has_sub:
+    for eq, covered in _tool_hits(recipe, tools_index, tool_subs):
+        if not covered:
             missing_tools.append({
                 'name': eq.get('name', ''),
                 'is_special': eq.get('is_special', False),
@@ -57,8 +235,16 @@ def compute_match(pantry_items: list[str], user_tools: list[str], recipe: dict,
         if uncovered:
             return None
 
-    coverage = matched_count / total if total > 0 else 0
+    return build_match_result(recipe, matched_count, total,
+                              missing_ingredients, missing_tools)
+
+
+def coverage_ratio(matched_count: int, total: int) -> float:
+    return round(matched_count / total if total > 0 else 0, 4)
+
 
+def build_match_result(recipe: dict, matched_count: int, total: int,
+                       missing_ingredients: list[dict], missing_tools: list[dict]) -> dict:
     return {
         'recipe_id': recipe.get('id', recipe.get('recipe_id', '')),
         'user_recipe_id': recipe.get('user_recipe_id', ''),
@@ -69,7 +255,7 @@ def compute_match(pantry_items: list[str], user_tools: list[str], recipe: dict,
         'servings': recipe.get('servings', ''),
         'prep_time': recipe.get('prep_time', ''),
         'cook_time': recipe.get('cook_time', ''),
-        'coverage': round(coverage, 4),
+        'coverage': coverage_ratio(matched_count, total),
         'matched': matched_count,
         'total': total,
         'missing_ingredients': missing_ingredients,
@@ -78,41 +264,176 @@ def compute_match(pantry_items: list[str], user_tools: list[str], recipe: dict,
     }
 
 
+def _score_recipes(pantry_index: PantryIndex, tools_index: PantryIndex,
+                   recipes: list[dict], tool_subs: dict) -> tuple[list[int], list[int], list[int]]:
+    """Per-recipe (matched, total, missing tool) counts without building result dicts."""
+    matched, totals, missing_tools = [], [], []
+    for recipe in recipes:
+        matched.append(sum(found for _, _, found in _ingredient_hits(recipe, pantry_index)))
+        totals.append(len(recipe.get('ingredients', [])))
+        missing_tools.append(sum(not covered for _, covered in _tool_hits(recipe, tools_index, tool_subs)))
+    return matched, totals, missing_tools
+
+
+SORT_OPTIONS = ('coverage', 'missing', 'rating', 'name')
+
+
+def _sort_key(sort: str):
+    if sort == 'missing':
+        return lambda c: (c[2], -c[1], c[0])
+    if sort == 'rating':
+        return lambda c: (-(c[3].get('rating') or 0), -c[1], c[0])
+    if sort == 'name':
+        return lambda c: ((c[3].get('recipe_name') or '').lower(), c[0])
+    return lambda c: (-c[1], c[0])
+
+
+def select_matches(scores: tuple[list[int], list[int], list[int]], rows: list[dict],
+                   only_my_tools: bool = False, limit: int = None, offset: int = 0,
+                   min_coverage: float = 0.0, max_missing: int = None,
+                   sort: str = 'coverage') -> tuple[list[int], int]:
+    """Filter and order scored rows; returns (row positions for the page, total).
+
+    rows only need the fields the sort looks at (rating, recipe_name).
+    """
+    if sort not in SORT_OPTIONS:
+        raise ValueError(f'Unknown sort: {sort}')
+    candidates = []
+    for i, (matched, total, missing_tools) in enumerate(zip(*scores)):
+        if only_my_tools and missing_tools:
+            continue
+        coverage = coverage_ratio(matched, total)
+        if coverage < min_coverage:
+            continue
+        if max_missing is not None and total - matched > max_missing:
+            continue
+        candidates.append((i, coverage, total - matched, rows[i]))
+
+    key = _sort_key(sort)
+    if limit is None:
+        selected = sorted(candidates, key=key)[offset:]
+    else:
+        selected = heapq.nsmallest(offset + limit, candidates, key=key)[offset:]
+    return [c[0] for c in selected], len(candidates)
+
+
+def rank_matches(pantry_index: PantryIndex, tools_index: PantryIndex,
+                 recipes: list[dict], only_my_tools: bool = False,
+                 tool_subs: dict = None, limit: int = None, offset: int = 0,
+                 min_coverage: float = 0.0, max_missing: int = None,
+                 sort: str = 'coverage') -> tuple[list[dict], int]:
+    """Filter, rank and page match results.
+
+    Recipes are scored as plain counts; full result dicts are only built for
+    the returned page. Returns (page, total_after_filters).
+    """
+    if sort not in SORT_OPTIONS:
+        raise ValueError(f'Unknown sort: {sort}')
+    tool_subs = tool_subs or {}
+    scores = _score_recipes(pantry_index, tools_index, recipes, tool_subs)
+
+    selected, total = select_matches(scores, recipes, only_my_tools=only_my_tools,
+                                     limit=limit, offset=offset,
+                                     min_coverage=min_coverage,
+                                     max_missing=max_missing, sort=sort)
+    page = [compute_match([], [], recipes[i], only_my_tools=only_my_tools, tool_subs=tool_subs,
+                          pantry_index=pantry_index, tools_index=tools_index)
+            for i in selected]
+    return page, total
+
+
 def compute_matches(pantry_items: list[str], user_tools: list[str],
                     recipes: list[dict], only_my_tools: bool = False,
-                    tool_subs: dict = None) -> list[dict]:
-    matches = []
-    for recipe in recipes:
-        result = compute_match(pantry_items, user_tools, recipe,
-                               only_my_tools=only_my_tools, tool_subs=tool_subs)
-        if result is not None:
-            matches.append(result)
-    matches.sort(key=lambda x: x['coverage'], reverse=True)
+                    tool_subs: dict = None,
+                    pantry_index: PantryIndex = None,
+                    tools_index: PantryIndex = None) -> list[dict]:
+    pantry_index = _index_for(pantry_items, pantry_index)
+    tools_index = _index_for(user_tools, tools_index)
+    matches, _ = rank_matches(pantry_index, tools_index, recipes,
+                              only_my_tools=only_my_tools, tool_subs=tool_subs)
     return matches
 
 
-def generate_shopping_list(pantry_items: list[str], recipes: list[dict]) -> list[dict]:
-    pantry_lower = {_normalize_name(p) for p in pantry_items}
+def encode_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(f'o:{offset}'.encode()).decode()
+
+
+def decode_cursor(cursor: str | None) -> int:
+    if not cursor:
+        return 0
+    try:
+        prefix, offset = base64.urlsafe_b64decode(cursor.encode()).decode().split(':')
+        if prefix != 'o' or int(offset) < 0:
+            raise ValueError
+        return int(offset)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+
+
+def _add_amount(item: dict, ing: dict) -> None:
+    quantity = ing.get('quantity')
+    if not str(quantity or '').strip():
+        return
+    parsed = ing if 'parsed' in ing else parse_quantity(quantity, ing.get('unit'))
+    if not parsed.get('parsed'):
+        text = ' '.join(p for p in (str(quantity).strip(), ing.get('unit') or '') if p)
+        item['_other'].append(text)
+        return
+    unit = parsed.get('canonical_unit', '')
+    low, high = item['_totals'].get(unit, (0.0, 0.0))
+    amount_max = parsed.get('amount_max')
+    item['_totals'][unit] = (low + parsed['amount'],
+                             high + (amount_max if amount_max is not None else parsed['amount']))
+
+
+def _finish_amounts(item: dict) -> dict:
+    totals, other = item.pop('_totals'), item.pop('_other')
+    item['amounts'] = [{
+        'quantity': format_amount(low) + (f'-{format_amount(high)}' if high > low else ''),
+        'unit': unit,
+    } for unit, (low, high) in totals.items()]
+    item['amounts'] += [{'quantity': text, 'unit': ''} for text in other]
+    if len(item['amounts']) == 1:
+        item['quantity'], item['unit'] = item['amounts'][0]['quantity'], item['amounts'][0]['unit']
+    elif item['amounts']:
+        item['quantity'] = ' + '.join(' '.join(p for p in (a['quantity'], a['unit']) if p)
+                                      for a in item['amounts'])
+        item['unit'] = ''
+    return item
+
+
+def generate_shopping_list(pantry_items: list[str], recipes: list[dict],
+                           pantry_index: PantryIndex = None) -> list[dict]:
+    """Missing ingredients across recipes, grouped by category.
+
+    Quantities of the same ingredient are summed per canonical unit using the
+    amounts parsed at import (or parsed here for older rows); anything that
+    does not parse is kept verbatim alongside the totals.
+    """
+    pantry_index = _index_for(pantry_items, pantry_index)
     needed = {}
 
     for recipe in recipes:
-        for ing in recipe.get('ingredients', []):
-            norm = _normalize_name(ing.get('normalized_name', ing.get('name', '')))
-            if any(_ingredient_matches(p, norm) for p in pantry_lower):
+        for ing, norm, found in _ingredient_hits(recipe, pantry_index):
+            if found:
                 continue
-            key = norm
-            if key not in needed:
-                needed[key] = {
+            item = needed.get(norm)
+            if item is None:
+                item = needed[norm] = {
                     'name': ing.get('name', ''),
                     'quantity': ing.get('quantity', ''),
                     'unit': ing.get('unit', ''),
                     'category': ing.get('category', 'other'),
                     'recipe_names': [],
+                    '_totals': {},
+                    '_other': [],
                 }
-            needed[key]['recipe_names'].append(recipe.get('recipe_name', ''))
+            _add_amount(item, ing)
+            item['recipe_names'].append(recipe.get('recipe_name', ''))
 
     categories = {}
     for item in needed.values():
+        _finish_amounts(item)
         cat = item['category']
         if cat not in categories:
             categories[cat] = []
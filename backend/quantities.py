@@ -0,0 +1,151 @@
+import re
+
+UNICODE_FRACTIONS = {
+    '½': 0.5, '⅓': 1 / 3, '⅔': 2 / 3, '¼': 0.25, '¾': 0.75, '⅕': 0.2,
+    '⅖': 0.4, '⅗': 0.6, '⅘': 0.8, '⅙': 1 / 6, '⅚': 5 / 6, '⅛': 0.125,
+    '⅜': 0.375, '⅝': 0.625, '⅞': 0.875,
+}
+
+WORD_NUMBERS = {
+    'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
+    'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11,
+    'twelve': 12, 'dozen': 12, 'half': 0.5,
+}
+
+UNIT_ALIASES = {
+    'tsp': ('tsp', 'tsps', 'teaspoon', 'teaspoons', 't'),
+    'tbsp': ('tbsp', 'tbsps', 'tbs', 'tbl', 'tablespoon', 'tablespoons', 'T'),
+    'cup': ('cup', 'cups', 'c'),
+    'fl oz': ('fl oz', 'fluid ounce', 'fluid ounces', 'fl. oz'),
+    'oz': ('oz', 'ounce', 'ounces'),
+    'lb': ('lb', 'lbs', 'pound', 'pounds'),
+    'g': ('g', 'gr', 'gram', 'grams', 'gramme', 'grammes'),
+    'kg': ('kg', 'kgs', 'kilogram', 'kilograms'),
+    'ml': ('ml', 'milliliter', 'milliliters', 'millilitre', 'millilitres'),
+    'l': ('l', 'liter', 'liters', 'litre', 'litres'),
+    'pt': ('pt', 'pint', 'pints'),
+    'qt': ('qt', 'quart', 'quarts'),
+    'gal': ('gal', 'gallon', 'gallons'),
+    'pinch': ('pinch', 'pinches'),
+    'dash': ('dash', 'dashes'),
+    'clove': ('clove', 'cloves'),
+    'can': ('can', 'cans', 'tin', 'tins'),
+    'package': ('package', 'packages', 'pkg', 'pack', 'packs'),
+    'stick': ('stick', 'sticks'),
+    'slice': ('slice', 'slices'),
+    'piece': ('piece', 'pieces', 'pc', 'pcs'),
+    'sprig': ('sprig', 'sprigs'),
+    'bunch': ('bunch', 'bunches'),
+    'head': ('head', 'heads'),
+    'large': ('large',),
+    'medium': ('medium',),
+    'small': ('small',),
+}
+
+# Single-letter aliases are case sensitive ('t' is a teaspoon, 'T' a tablespoon).
+_CASE_SENSITIVE = {'t': 'tsp', 'T': 'tbsp'}
+_UNITS = {alias.lower(): unit for unit, aliases in UNIT_ALIASES.items()
+          for alias in aliases if alias not in _CASE_SENSITIVE}
+
+_NUMBER = r'(?:\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?(?:\s*[{fr}])?|[{fr}])'.format(
+    fr=''.join(UNICODE_FRACTIONS))
+_QUANTITY_RE = re.compile(
+    r'^\s*(?P<low>{n})(?:\s*(?:-|–|—|to|or)\s*(?P<high>{n}))?\s*(?P<rest>.*?)\s*$'.format(n=_NUMBER))
+
+
+def _to_number(text: str) -> float | None:
+    text = text.strip()
+    if not text:
+        return None
+    if text[-1] in UNICODE_FRACTIONS:
+        whole = text[:-1].strip()
+        return (float(whole) if whole else 0.0) + UNICODE_FRACTIONS[text[-1]]
+    total = 0.0
+    for part in text.split():
+        if '/' in part:
+            num, den = part.split('/')
+            if int(den) == 0:
+                return None
+            total += int(num) / int(den)
+        else:
+            total += float(part)
+    return total
+
+
+def canonical_unit(unit: str) -> tuple[str, bool]:
+    """(canonical unit, recognized). Unknown units come back lowercased."""
+    text = (unit or '').strip().rstrip('.')
+    if not text:
+        return '', True
+    if text in _CASE_SENSITIVE:
+        return _CASE_SENSITIVE[text], True
+    key = re.sub(r'\s+', ' ', text.lower())
+    if key in _UNITS:
+        return _UNITS[key], True
+    return key, False
+
+
+def parse_quantity(quantity, unit: str = '') -> dict:
+    """Parse free-text quantity/unit into structured fields.
+
+    Returns amount (float or None), amount_max (upper bound of a range, else
+    None), canonical_unit, and parsed: True only when the amount was read
+    deterministically and the unit is known or absent.
+    """
+    result = {'amount': None, 'amount_max': None, 'canonical_unit': '', 'parsed': False}
+    if isinstance(quantity, (int, float)) and not isinstance(quantity, bool):
+        quantity = str(quantity)
+    text = (quantity or '').strip()
+    unit_text = (unit or '').strip()
+
+    match = _QUANTITY_RE.match(text) if text else None
+    low = high = None
+    rest = ''
+    if match:
+        low = _to_number(match.group('low'))
+        high = _to_number(match.group('high')) if match.group('high') else None
+        rest = match.group('rest')
+    elif text.lower() in WORD_NUMBERS:
+        low = float(WORD_NUMBERS[text.lower()])
+    elif text:
+        first, _, remainder = text.partition(' ')
+        if first.lower() in WORD_NUMBERS:
+            low, rest = float(WORD_NUMBERS[first.lower()]), remainder
+
+    if not unit_text and rest:
+        unit_text = rest
+        rest = ''
+
+    result['canonical_unit'], known_unit = canonical_unit(unit_text)
+    if low is None:
+        return result
+    result['amount'] = low
+    if high is not None and high > low:
+        result['amount_max'] = high
+    result['parsed'] = known_unit and not rest
+    return result
+
+
+def format_amount(amount: float) -> str:
+    return f'{round(amount, 2):g}'
+
+
+def with_parsed_quantity(ing: dict) -> dict:
+    return {**ing, **parse_quantity(ing.get('quantity'), ing.get('unit'))}
+
+
+def scale_ingredients(ingredients: list[dict], factor: float) -> list[dict]:
+    """Multiply parsed amounts by factor; unparsed quantities are left as written."""
+    scaled = []
+    for ing in ingredients:
+        if 'parsed' not in ing:
+            ing = with_parsed_quantity(ing)
+        if not ing.get('parsed'):
+            scaled.append(ing)
+            continue
+        low = ing['amount'] * factor
+        high = ing['amount_max'] * factor if ing.get('amount_max') is not None else None
+        quantity = format_amount(low) + (f'-{format_amount(high)}' if high is not None else '')
+        scaled.append({**ing, 'amount': low, 'amount_max': high, 'quantity': quantity,
+                       'unit': ing.get('unit') or ing.get('canonical_unit', '')})
+    return scaled
@@ -0,0 +1,140 @@
+"""Read-through cache for shared recipe rows.
+
+Rows are keyed by id, with a canonical_url -> id map alongside. db.py fills
+the cache on reads and on upsert_recipe. When REDIS_URL is set and the redis
+package is installed, entries are also written to Redis, so a row fetched by
+one worker is a hit in the others. Redis errors are logged and otherwise
+ignored; the database is always the fallback.
+"""
+import json
+import logging
+import os
+import threading
+
+from cachetools import TTLCache
+
+try:
+    import redis
+except ImportError:  # optional dependency
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+RECIPE_CACHE_SIZE = 4096
+RECIPE_CACHE_TTL = 3600
+SHARED_TTL = 6 * 3600
+_PREFIX = 'recipe:'
+
+_lock = threading.Lock()
+_by_id = TTLCache(maxsize=RECIPE_CACHE_SIZE, ttl=RECIPE_CACHE_TTL)
+_id_by_url = TTLCache(maxsize=RECIPE_CACHE_SIZE, ttl=RECIPE_CACHE_TTL)
+_counters = {'hits': 0, 'misses': 0, 'shared_hits': 0, 'shared_errors': 0}
+_shared = None
+_shared_checked = False
+
+
+def _get_shared():
+    global _shared, _shared_checked
+    if not _shared_checked:
+        _shared_checked = True
+        url = os.environ.get('REDIS_URL', '')
+        if url and redis is not None:
+            _shared = redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2)
+        elif url:
+            logger.warning('REDIS_URL is set but the redis package is not installed')
+    return _shared
+
+
+def _shared_call(fn, *args):
+    shared = _get_shared()
+    if shared is None:
+        return None
+    try:
+        return fn(shared, *args)
+    except Exception as e:
+        with _lock:
+            _counters['shared_errors'] += 1
+        logger.warning(f'Shared recipe cache unavailable: {e}')
+        return None
+
+
+def _put_local(recipe: dict) -> None:
+    with _lock:
+        _by_id[recipe['id']] = recipe
+        if recipe.get('canonical_url'):
+            _id_by_url[recipe['canonical_url']] = recipe['id']
+
+
+def _lookup(shared_key: str, resolve_local) -> dict | None:
+    with _lock:
+        recipe = resolve_local()
+        if recipe is not None:
+            _counters['hits'] += 1
+            return dict(recipe)
+    raw = _shared_call(lambda r: r.get(_PREFIX + shared_key))
+    if raw:
+        recipe = json.loads(raw)
+        _put_local(recipe)
+        with _lock:
+            _counters['shared_hits'] += 1
+        return dict(recipe)
+    with _lock:
+        _counters['misses'] += 1
+    return None
+
+
+def get(recipe_id: str) -> dict | None:
+    return _lookup(recipe_id, lambda: _by_id.get(recipe_id))
+
+
+def get_by_url(canonical_url: str) -> dict | None:
+    def resolve_local():
+        rid = _id_by_url.get(canonical_url)
+        return _by_id.get(rid) if rid is not None else None
+    return _lookup('url:' + canonical_url, resolve_local)
+
+
+def put(recipe: dict) -> None:
+    if not recipe or not recipe.get('id'):
+        return
+    recipe = dict(recipe)
+    _put_local(recipe)
+
+    def write(r):
+        raw = json.dumps(recipe, default=str)
+        pipe = r.pipeline()
+        pipe.setex(_PREFIX + recipe['id'], SHARED_TTL, raw)
+        if recipe.get('canonical_url'):
+            pipe.setex(_PREFIX + 'url:' + recipe['canonical_url'], SHARED_TTL, raw)
+        pipe.execute()
+    _shared_call(write)
+
+
+def invalidate(recipe_id: str) -> None:
+    with _lock:
+        recipe = _by_id.pop(recipe_id, None)
+        url = recipe.get('canonical_url') if recipe else None
+        if url:
+            _id_by_url.pop(url, None)
+    keys = [_PREFIX + recipe_id] + ([_PREFIX + 'url:' + url] if url else [])
+    _shared_call(lambda r: r.delete(*keys))
+
+
+def stats() -> dict:
+    with _lock:
+        lookups = _counters['hits'] + _counters['shared_hits'] + _counters['misses']
+        return {
+            **_counters,
+            'hit_rate': round((_counters['hits'] + _counters['shared_hits']) / lookups, 4) if lookups else 0,
+            'size': len(_by_id),
+            'maxsize': _by_id.maxsize,
+            'shared': _get_shared() is not None,
+        }
+
+
+def clear() -> None:
+    with _lock:
+        _by_id.clear()
+        _id_by_url.clear()
+        for k in _counters:
+            _counters[k] = 0
@@ -1,5 +1,7 @@
 -- PantryPal Supabase Schema
 
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- Shared recipe cache
 CREATE TABLE recipes (
   id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
@@ -19,6 +21,8 @@ CREATE TABLE recipes (
   channel_id TEXT,
   channel_name TEXT,
   image_url TEXT,
+  ingredient_ids INTEGER[] NOT NULL DEFAULT '{}',
+  equipment_ids INTEGER[] NOT NULL DEFAULT '{}',
   created_at TIMESTAMPTZ DEFAULT now(),
   updated_at TIMESTAMPTZ DEFAULT now()
 );
@@ -26,6 +30,50 @@ CREATE TABLE recipes (
 CREATE INDEX idx_recipes_canonical_url ON recipes(canonical_url);
 CREATE INDEX idx_recipes_youtube_video_id ON recipes(youtube_video_id);
 CREATE INDEX idx_recipes_channel_id ON recipes(channel_id);
+CREATE INDEX idx_recipes_ingredient_ids ON recipes USING GIN (ingredient_ids);
+CREATE INDEX idx_recipes_created_at ON recipes(created_at DESC);
+CREATE INDEX idx_recipes_updated_at ON recipes(updated_at, id);
+
+-- Catalog search: a weighted tsvector (name > channel > ingredients) for
+-- ranked word search, and lowercased text with trigrams for substring and
+-- typo-tolerant matches. Both are expression indexes, so no extra columns
+-- need to be kept in sync.
+CREATE OR REPLACE FUNCTION recipe_ingredient_names(p_ingredients JSONB)
+RETURNS TEXT LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+  SELECT COALESCE(string_agg(i->>'name', ' '), '')
+  FROM jsonb_array_elements(CASE WHEN jsonb_typeof(p_ingredients) = 'array'
+                                 THEN p_ingredients ELSE '[]'::jsonb END) i;
+$$;
+
+CREATE OR REPLACE FUNCTION recipe_search_vector(p_name TEXT, p_channel TEXT, p_ingredients JSONB)
+RETURNS tsvector LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+  SELECT setweight(to_tsvector('english', COALESCE(p_name, '')), 'A')
+      || setweight(to_tsvector('simple', COALESCE(p_channel, '')), 'B')
+      || setweight(to_tsvector('english', recipe_ingredient_names(p_ingredients)), 'C');
+$$;
+
+CREATE OR REPLACE FUNCTION recipe_search_text(p_name TEXT, p_channel TEXT, p_ingredients JSONB)
+RETURNS TEXT LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+  SELECT lower(concat_ws(' ', p_name, p_channel, recipe_ingredient_names(p_ingredients)));
+$$;
+
+CREATE INDEX idx_recipes_search_vector ON recipes
+  USING GIN (recipe_search_vector(recipe_name, channel_name, ingredients));
+CREATE INDEX idx_recipes_search_trgm ON recipes
+  USING GIN (recipe_search_text(recipe_name, channel_name, ingredients) gin_trgm_ops);
+
+-- Interned ingredient/equipment names (ids referenced by recipes.ingredient_ids / equipment_ids)
+CREATE TABLE ingredient_vocab (
+  id SERIAL PRIMARY KEY,
+  normalized_name TEXT UNIQUE NOT NULL,
+  tokens TEXT[] NOT NULL DEFAULT '{}',
+  created_at TIMESTAMPTZ DEFAULT now()
+);
+
+-- Used by match_vocab_terms, one per matching rule.
+CREATE INDEX idx_ingredient_vocab_tokens ON ingredient_vocab USING GIN (tokens);
+CREATE INDEX idx_ingredient_vocab_trgm ON ingredient_vocab USING GIN (normalized_name gin_trgm_ops);
+CREATE INDEX idx_ingredient_vocab_prefix ON ingredient_vocab (left(normalized_name, 3));
 
 -- Personal recipe library
 CREATE TABLE user_recipes (
@@ -40,6 +88,7 @@ CREATE TABLE user_recipes (
 );
 
 CREATE INDEX idx_user_recipes_user ON user_recipes(user_id);
+CREATE INDEX idx_user_recipes_user_added ON user_recipes(user_id, added_at DESC, id DESC);
 
 -- Collections (playlist model)
 CREATE TABLE collections (
@@ -63,6 +112,7 @@ CREATE TABLE recipe_collections (
 
 CREATE INDEX idx_recipe_collections_collection ON recipe_collections(collection_id);
 CREATE INDEX idx_recipe_collections_user_recipe ON recipe_collections(user_recipe_id);
+CREATE INDEX idx_recipe_collections_collection_added ON recipe_collections(collection_id, added_at, id);
 
 -- Favorite chefs
 CREATE TABLE favorite_chefs (
@@ -87,6 +137,14 @@ CREATE TABLE pantry_items (
 
 CREATE INDEX idx_pantry_user ON pantry_items(user_id);
 
+-- Match cache versions: bumped by triggers on every pantry_items / user_recipes
+-- write, whichever process makes it, and read with each /api/match request.
+CREATE TABLE match_versions (
+  user_id TEXT PRIMARY KEY,
+  pantry_version BIGINT NOT NULL DEFAULT 0,
+  library_version BIGINT NOT NULL DEFAULT 0
+);
+
 -- Import tracking
 CREATE TABLE import_jobs (
   id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
@@ -104,6 +162,39 @@ CREATE TABLE import_jobs (
   updated_at TIMESTAMPTZ DEFAULT now()
 );
 
+-- Durable import queue: one 'expand' item per job (lists the videos), then
+-- one 'video' item per video. Workers lease items with FOR UPDATE SKIP
+-- LOCKED; an expired lease makes the item available again.
+CREATE TABLE import_job_items (
+  id BIGSERIAL PRIMARY KEY,
+  job_id UUID NOT NULL REFERENCES import_jobs(id) ON DELETE CASCADE,
+  kind TEXT NOT NULL DEFAULT 'video' CHECK (kind IN ('expand', 'video')),
+  position INTEGER NOT NULL DEFAULT 0,
+  url TEXT,
+  status TEXT NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'running', 'succeeded', 'failed')),
+  attempts INTEGER NOT NULL DEFAULT 0,
+  run_after TIMESTAMPTZ NOT NULL DEFAULT now(),
+  leased_by TEXT,
+  lease_expires_at TIMESTAMPTZ,
+  last_error TEXT,
+  created_at TIMESTAMPTZ DEFAULT now(),
+  updated_at TIMESTAMPTZ DEFAULT now(),
+  UNIQUE(job_id, kind, position)
+);
+
+CREATE INDEX idx_import_job_items_ready ON import_job_items(run_after, id)
+  WHERE status IN ('pending', 'running');
+CREATE INDEX idx_import_job_items_job ON import_job_items(job_id, status);
+
+-- Cross-process single-flight for imports of one canonical URL
+-- (importer.IMPORT_SHARED_CLAIMS). A claim expires so a crashed holder
+-- never blocks an import for good.
+CREATE TABLE import_claims (
+  canonical_url TEXT PRIMARY KEY,
+  claimed_by TEXT NOT NULL,
+  expires_at TIMESTAMPTZ NOT NULL
+);
+
 -- Monthly import counter
 CREATE TABLE import_counts (
   id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
@@ -144,6 +235,9 @@ CREATE POLICY "No anon inserts" ON recipes FOR INSERT WITH CHECK (false);
 CREATE POLICY "No anon updates" ON recipes FOR UPDATE USING (false);
 CREATE POLICY "No anon deletes" ON recipes FOR DELETE USING (false);
 
+ALTER TABLE ingredient_vocab ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Vocab publicly readable" ON ingredient_vocab FOR SELECT USING (true);
+
 ALTER TABLE user_recipes ENABLE ROW LEVEL SECURITY;
 CREATE POLICY "No anon access" ON user_recipes FOR ALL USING (false);
 
@@ -159,9 +253,18 @@ CREATE POLICY "No anon access" ON recipe_collections FOR ALL USING (false);
 ALTER TABLE pantry_items ENABLE ROW LEVEL SECURITY;
 CREATE POLICY "No anon access" ON pantry_items FOR ALL USING (false);
 
+ALTER TABLE match_versions ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "No anon access" ON match_versions FOR ALL USING (false);
+
 ALTER TABLE import_jobs ENABLE ROW LEVEL SECURITY;
 CREATE POLICY "No anon access" ON import_jobs FOR ALL USING (false);
 
+ALTER TABLE import_job_items ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "No anon access" ON import_job_items FOR ALL USING (false);
+
+ALTER TABLE import_claims ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "No anon access" ON import_claims FOR ALL USING (false);
+
 ALTER TABLE import_counts ENABLE ROW LEVEL SECURITY;
 CREATE POLICY "No anon access" ON import_counts FOR ALL USING (false);
 
@@ -171,6 +274,461 @@ CREATE POLICY "No anon access" ON saved_shopping_lists FOR ALL USING (false);
 ALTER TABLE shopping_list_recipes ENABLE ROW LEVEL SECURITY;
 CREATE POLICY "No anon access" ON shopping_list_recipes FOR ALL USING (false);
 
+-- Matching: per-recipe counts for a user's library. p_term_ids are the
+-- ingredient_vocab ids the pantry matches (resolved by the API with the same
+-- rules as matching.py), so counting is exact set membership. Rows whose id
+-- arrays are missing or stale come back with indexed = false and are scored
+-- from the full row instead. p_require_match drops rows sharing no term with
+-- the pantry, using the GIN index on ingredient_ids.
+CREATE OR REPLACE FUNCTION match_library_counts(
+  p_user_id TEXT,
+  p_term_ids INTEGER[],
+  p_channel_id TEXT DEFAULT NULL,
+  p_require_match BOOLEAN DEFAULT false
+) RETURNS TABLE (
+  user_recipe_id UUID,
+  recipe_id UUID,
+  recipe_name TEXT,
+  rating INTEGER,
+  matched INTEGER,
+  total INTEGER,
+  equipment_ids INTEGER[],
+  max_term_id INTEGER,
+  indexed BOOLEAN
+) LANGUAGE sql STABLE AS $$
+  SELECT ur.id, r.id, r.recipe_name, ur.rating,
+         (SELECT count(*)::int FROM unnest(r.ingredient_ids) t WHERE t = ANY(p_term_ids)),
+         jsonb_array_length(r.ingredients),
+         r.equipment_ids,
+         (SELECT max(t) FROM unnest(r.ingredient_ids || r.equipment_ids) t),
+         cardinality(r.ingredient_ids) = jsonb_array_length(r.ingredients)
+           AND cardinality(r.equipment_ids) = jsonb_array_length(r.equipment)
+  FROM user_recipes ur
+  JOIN recipes r ON r.id = ur.recipe_id
+  WHERE ur.user_id = p_user_id
+    AND (p_channel_id IS NULL OR r.channel_id = p_channel_id)
+    AND (NOT p_require_match
+         OR r.ingredient_ids && p_term_ids
+         OR cardinality(r.ingredient_ids) <> jsonb_array_length(r.ingredients))
+  ORDER BY ur.added_at DESC;
+$$;
+
+-- Vocabulary ids a pantry matches, by the rules of matching.PantryIndex: the
+-- term occurs in an item, an item occurs in the term, or they share a token.
+-- Only ids above p_after_id are examined, and the caller picks up from through
+-- next time. Ids don't commit in order, so a lower id can become visible
+-- after a higher one; through is therefore the newest id created over
+-- p_settle_seconds ago, and the window above it is scanned again next time.
+CREATE OR REPLACE FUNCTION match_vocab_terms(
+  p_items TEXT[],
+  p_tokens TEXT[],
+  p_after_id INTEGER DEFAULT 0,
+  p_settle_seconds INTEGER DEFAULT 120
+) RETURNS TABLE (
+  term_ids INTEGER[],
+  through INTEGER
+) LANGUAGE sql STABLE AS $$
+  WITH items AS (
+    SELECT DISTINCT item FROM unnest(p_items) item
+  ), prefixes AS (
+    -- Every substring of up to three characters: a term occurring in an
+    -- item starts with one of them.
+    SELECT DISTINCT substr(item, s, n) AS prefix
+    FROM items, generate_series(1, greatest(length(item), 1)) s, generate_series(0, 3) n
+  ), matched AS (
+    SELECT v.id FROM ingredient_vocab v
+    WHERE v.id > p_after_id AND v.tokens && p_tokens
+    UNION
+    SELECT v.id FROM ingredient_vocab v
+    JOIN items i ON v.normalized_name LIKE
+      '%' || replace(replace(replace(i.item, '\', '\\'), '%', '\%'), '_', '\_') || '%'
+    WHERE v.id > p_after_id
+    UNION
+    SELECT v.id FROM ingredient_vocab v
+    JOIN prefixes p ON left(v.normalized_name, 3) = p.prefix
+    WHERE v.id > p_after_id
+      AND EXISTS (SELECT 1 FROM items i WHERE strpos(i.item, v.normalized_name) > 0)
+  )
+  SELECT COALESCE((SELECT array_agg(id) FROM matched), '{}'),
+         COALESCE((SELECT max(id) FROM ingredient_vocab
+                   WHERE created_at < now() - make_interval(secs => p_settle_seconds)), 0);
+$$;
+
+-- Versions keying cached match results: the user's pantry and library
+-- versions, plus the newest recipe update (imports can change recipes that
+-- are already in someone's library).
+CREATE OR REPLACE FUNCTION get_match_versions(p_user_id TEXT)
+RETURNS TABLE (
+  pantry_version BIGINT,
+  library_version BIGINT,
+  catalog_version TIMESTAMPTZ
+) LANGUAGE sql STABLE AS $$
+  SELECT COALESCE(v.pantry_version, 0), COALESCE(v.library_version, 0),
+         (SELECT max(updated_at) FROM recipes)
+  FROM (SELECT p_user_id AS user_id) u
+  LEFT JOIN match_versions v ON v.user_id = u.user_id;
+$$;
+
+-- Collections overview: the All / Loose system rows plus every user
+-- collection with its recipe count and first four thumbnails, in one call.
+CREATE OR REPLACE FUNCTION get_collections_overview(p_user_id TEXT)
+RETURNS TABLE (
+  id TEXT,
+  name TEXT,
+  recipe_count INTEGER,
+  thumbnails TEXT[],
+  sort_order INTEGER,
+  is_system BOOLEAN
+) LANGUAGE sql STABLE AS $$
+  WITH library AS (
+    SELECT ur.id AS user_recipe_id, r.image_url, ur.added_at,
+           EXISTS (SELECT 1 FROM recipe_collections rc
+                   JOIN collections c ON c.id = rc.collection_id
+                   WHERE rc.user_recipe_id = ur.id AND c.user_id = p_user_id) AS in_collection
+    FROM user_recipes ur
+    JOIN recipes r ON r.id = ur.recipe_id
+    WHERE ur.user_id = p_user_id
+  ), overview AS (
+    SELECT 'all_recipes'::text AS id, 'All Recipes'::text AS name,
+           (SELECT count(*)::int FROM library) AS recipe_count,
+           ARRAY(SELECT image_url FROM (SELECT image_url, added_at FROM library
+                                        ORDER BY added_at DESC LIMIT 4) t
+                 WHERE image_url IS NOT NULL ORDER BY added_at DESC) AS thumbnails,
+           0 AS sort_order, true AS is_system
+    UNION ALL
+    SELECT 'loose_recipes', 'Loose Recipes',
+           (SELECT count(*)::int FROM library WHERE NOT in_collection),
+           ARRAY(SELECT image_url FROM (SELECT image_url, added_at FROM library
+                                        WHERE NOT in_collection
+                                        ORDER BY added_at DESC LIMIT 4) t
+                 WHERE image_url IS NOT NULL ORDER BY added_at DESC),
+           1, true
+    UNION ALL
+    SELECT c.id::text, c.name,
+           (SELECT count(*)::int FROM recipe_collections rc WHERE rc.collection_id = c.id),
+           ARRAY(SELECT image_url FROM (SELECT r.image_url, rc.added_at
+                                        FROM recipe_collections rc
+                                        JOIN user_recipes ur ON ur.id = rc.user_recipe_id
+                                        JOIN recipes r ON r.id = ur.recipe_id
+                                        WHERE rc.collection_id = c.id
+                                        ORDER BY rc.added_at LIMIT 4) t
+                 WHERE image_url IS NOT NULL ORDER BY added_at),
+           c.sort_order, false
+    FROM collections c
+    WHERE c.user_id = p_user_id
+  )
+  SELECT * FROM overview ORDER BY is_system DESC, sort_order;
+$$;
+
+-- The list-screen projection of a recipe, for RPCs that return summaries.
+-- Keep in step with db.RECIPE_SUMMARY_COLUMNS.
+CREATE OR REPLACE FUNCTION recipe_summary(r recipes)
+RETURNS JSONB LANGUAGE sql IMMUTABLE AS $$
+  SELECT jsonb_build_object(
+    'id', r.id, 'recipe_name', r.recipe_name, 'image_url', r.image_url,
+    'channel_id', r.channel_id, 'channel_name', r.channel_name, 'source_type', r.source_type,
+    'servings', r.servings, 'prep_time', r.prep_time, 'cook_time', r.cook_time,
+    'created_at', r.created_at);
+$$;
+
+-- Loose recipes: library entries in none of the user's collections, newest
+-- first, with keyset pagination on (added_at, id). p_summary returns
+-- recipe_summary() instead of the whole recipe, for list screens.
+CREATE OR REPLACE FUNCTION get_loose_recipes(
+  p_user_id TEXT,
+  p_after_added_at TIMESTAMPTZ DEFAULT NULL,
+  p_after_id UUID DEFAULT NULL,
+  p_limit INTEGER DEFAULT NULL,
+  p_summary BOOLEAN DEFAULT false
+) RETURNS TABLE (
+  user_recipe_id UUID,
+  recipe_id UUID,
+  rating INTEGER,
+  notes TEXT,
+  added_at TIMESTAMPTZ,
+  recipe JSONB
+) LANGUAGE sql STABLE AS $$
+  SELECT ur.id, ur.recipe_id, ur.rating, ur.notes, ur.added_at,
+         CASE WHEN p_summary THEN recipe_summary(r) ELSE to_jsonb(r) END
+  FROM user_recipes ur
+  JOIN recipes r ON r.id = ur.recipe_id
+  WHERE ur.user_id = p_user_id
+    AND NOT EXISTS (SELECT 1 FROM recipe_collections rc
+                    JOIN collections c ON c.id = rc.collection_id
+                    WHERE rc.user_recipe_id = ur.id AND c.user_id = p_user_id)
+    AND (p_after_added_at IS NULL OR (ur.added_at, ur.id) < (p_after_added_at, p_after_id))
+  ORDER BY ur.added_at DESC, ur.id DESC
+  LIMIT p_limit;
+$$;
+
+-- Shopping lists: insert a list and all of its recipe links atomically.
+CREATE OR REPLACE FUNCTION save_shopping_list(
+  p_user_id TEXT,
+  p_name TEXT,
+  p_items JSONB,
+  p_recipe_ids UUID[]
+) RETURNS saved_shopping_lists LANGUAGE plpgsql AS $$
+DECLARE
+  saved saved_shopping_lists;
+BEGIN
+  INSERT INTO saved_shopping_lists (user_id, name, items)
+  VALUES (p_user_id, p_name, COALESCE(p_items, '[]'::jsonb))
+  RETURNING * INTO saved;
+
+  INSERT INTO shopping_list_recipes (shopping_list_id, recipe_id)
+  SELECT saved.id, rid FROM unnest(p_recipe_ids) AS rid
+  ON CONFLICT (shopping_list_id, recipe_id) DO NOTHING;
+
+  RETURN saved;
+END;
+$$;
+
+-- Import jobs: counters and the error log are updated in place, so concurrent
+-- progress reports never overwrite each other. p_finish sets the final status
+-- from the succeeded count.
+CREATE OR REPLACE FUNCTION update_import_job(
+  p_job_id UUID,
+  p_status TEXT DEFAULT NULL,
+  p_total_videos INTEGER DEFAULT NULL,
+  p_processed INTEGER DEFAULT 0,
+  p_succeeded INTEGER DEFAULT 0,
+  p_failed INTEGER DEFAULT 0,
+  p_error JSONB DEFAULT NULL,
+  p_finish BOOLEAN DEFAULT false
+) RETURNS import_jobs LANGUAGE sql AS $$
+  UPDATE import_jobs SET
+    total_videos = COALESCE(p_total_videos, total_videos),
+    processed = COALESCE(processed, 0) + p_processed,
+    succeeded = COALESCE(succeeded, 0) + p_succeeded,
+    failed = COALESCE(failed, 0) + p_failed,
+    errors = CASE WHEN p_error IS NULL THEN errors
+                  ELSE COALESCE(errors, '[]'::jsonb) || jsonb_build_array(p_error) END,
+    status = CASE WHEN p_finish THEN
+                    CASE WHEN COALESCE(succeeded, 0) + p_succeeded > 0 THEN 'completed' ELSE 'failed' END
+                  ELSE COALESCE(p_status, status) END
+  WHERE id = p_job_id
+  RETURNING *;
+$$;
+
+-- Monthly import counter: one upsert instead of select-then-write.
+CREATE OR REPLACE FUNCTION increment_import_count(p_user_id TEXT, p_month TEXT)
+RETURNS INTEGER LANGUAGE sql AS $$
+  INSERT INTO import_counts (user_id, month, count)
+  VALUES (p_user_id, p_month, 1)
+  ON CONFLICT (user_id, month) DO UPDATE SET count = COALESCE(import_counts.count, 0) + 1
+  RETURNING count;
+$$;
+
+-- Catalog search: ranked page plus total in one call. Totals are exact up to
+-- p_exact_cap matches; beyond that the planner's row estimate is returned and
+-- estimated is true, so broad queries never count the whole catalog.
+-- p_summary returns recipe_summary() rows for list screens.
+CREATE OR REPLACE FUNCTION search_recipes(
+  p_query TEXT,
+  p_channel_id TEXT DEFAULT NULL,
+  p_limit INTEGER DEFAULT 50,
+  p_offset INTEGER DEFAULT 0,
+  p_exact_cap INTEGER DEFAULT 1000,
+  p_summary BOOLEAN DEFAULT false
+) RETURNS JSONB LANGUAGE plpgsql STABLE AS $$
+DECLARE
+  tsq tsquery := websearch_to_tsquery('english', p_query);
+  pattern TEXT := '%' || replace(replace(replace(lower(p_query), '\', '\\'), '%', '\%'), '_', '\_') || '%';
+  page JSONB;
+  total INTEGER;
+  plan JSON;
+BEGIN
+  SELECT COALESCE(jsonb_agg(
+           CASE WHEN p_summary THEN recipe_summary(m.recipe) ELSE to_jsonb(m.recipe) END
+           ORDER BY m.rank DESC, m.created_at DESC), '[]'::jsonb)
+  INTO page
+  FROM (
+    SELECT r AS recipe, r.created_at,
+           ts_rank(recipe_search_vector(r.recipe_name, r.channel_name, r.ingredients), tsq)
+             + similarity(recipe_search_text(r.recipe_name, r.channel_name, r.ingredients), lower(p_query))
+             AS rank
+    FROM recipes r
+    WHERE (p_channel_id IS NULL OR r.channel_id = p_channel_id)
+      AND (recipe_search_vector(r.recipe_name, r.channel_name, r.ingredients) @@ tsq
+           OR recipe_search_text(r.recipe_name, r.channel_name, r.ingredients) LIKE pattern)
+    ORDER BY rank DESC, r.created_at DESC
+    LIMIT p_limit OFFSET p_offset
+  ) m;
+
+  SELECT count(*) INTO total FROM (
+    SELECT 1 FROM recipes r
+    WHERE (p_channel_id IS NULL OR r.channel_id = p_channel_id)
+      AND (recipe_search_vector(r.recipe_name, r.channel_name, r.ingredients) @@ tsq
+           OR recipe_search_text(r.recipe_name, r.channel_name, r.ingredients) LIKE pattern)
+    LIMIT p_exact_cap + 1
+  ) capped;
+
+  IF total <= p_exact_cap THEN
+    RETURN jsonb_build_object('recipes', page, 'total', total, 'estimated', false);
+  END IF;
+
+  EXECUTE format(
+    'EXPLAIN (FORMAT JSON) SELECT 1 FROM recipes r
+     WHERE (%L::text IS NULL OR r.channel_id = %L)
+       AND (recipe_search_vector(r.recipe_name, r.channel_name, r.ingredients) @@ %L::tsquery
+            OR recipe_search_text(r.recipe_name, r.channel_name, r.ingredients) LIKE %L)',
+    p_channel_id, p_channel_id, tsq, pattern) INTO plan;
+  RETURN jsonb_build_object(
+    'recipes', page,
+    'total', GREATEST(total, (plan->0->'Plan'->>'Plan Rows')::int),
+    'estimated', true);
+END;
+$$;
+
+-- Chefs tab: recipe counts per channel in a user's library with favorite
+-- status, most recently saved channel first.
+CREATE OR REPLACE FUNCTION get_user_chefs(p_user_id TEXT)
+RETURNS TABLE (
+  channel_id TEXT,
+  channel_name TEXT,
+  recipe_count INTEGER,
+  is_favorite BOOLEAN
+) LANGUAGE sql STABLE AS $$
+  SELECT r.channel_id,
+         COALESCE((array_agg(r.channel_name ORDER BY ur.added_at DESC))[1], ''),
+         count(*)::int,
+         bool_or(f.id IS NOT NULL)
+  FROM user_recipes ur
+  JOIN recipes r ON r.id = ur.recipe_id
+  LEFT JOIN favorite_chefs f ON f.user_id = p_user_id AND f.channel_id = r.channel_id
+  WHERE ur.user_id = p_user_id AND r.channel_id IS NOT NULL AND r.channel_id <> ''
+  GROUP BY r.channel_id
+  ORDER BY max(ur.added_at) DESC;
+$$;
+
+-- Import queue: lease up to p_limit ready items (pending and due, or running
+-- with an expired lease) for p_worker.
+CREATE OR REPLACE FUNCTION lease_import_items(
+  p_worker TEXT,
+  p_limit INTEGER,
+  p_lease_seconds INTEGER
+) RETURNS TABLE (
+  id BIGINT,
+  job_id UUID,
+  kind TEXT,
+  url TEXT,
+  attempts INTEGER,
+  user_id TEXT,
+  source_type TEXT,
+  source_id TEXT
+) LANGUAGE sql AS $$
+  WITH picked AS (
+    SELECT i.id FROM import_job_items i
+    WHERE (i.status = 'pending' AND i.run_after <= now())
+       OR (i.status = 'running' AND i.lease_expires_at < now())
+    ORDER BY i.run_after, i.id
+    LIMIT p_limit
+    FOR UPDATE SKIP LOCKED
+  ), leased AS (
+    UPDATE import_job_items i
+    SET status = 'running', leased_by = p_worker, attempts = i.attempts + 1,
+        lease_expires_at = now() + make_interval(secs => p_lease_seconds)
+    FROM picked
+    WHERE i.id = picked.id
+    RETURNING i.*
+  )
+  SELECT l.id, l.job_id, l.kind, l.url, l.attempts, j.user_id, j.source_type, j.source_id
+  FROM leased l
+  JOIN import_jobs j ON j.id = l.job_id
+  ORDER BY l.id;
+$$;
+
+CREATE OR REPLACE FUNCTION heartbeat_import_items(
+  p_worker TEXT,
+  p_ids BIGINT[],
+  p_lease_seconds INTEGER
+) RETURNS INTEGER LANGUAGE sql AS $$
+  WITH touched AS (
+    UPDATE import_job_items
+    SET lease_expires_at = now() + make_interval(secs => p_lease_seconds)
+    WHERE id = ANY(p_ids) AND leased_by = p_worker AND status = 'running'
+    RETURNING 1
+  )
+  SELECT count(*)::int FROM touched;
+$$;
+
+-- Finish a leased item. p_retry_in_seconds puts it back in the queue after a
+-- delay; otherwise p_status ('succeeded' or 'failed') is final and the job's
+-- counters are updated in the same transaction. A succeeded video also counts
+-- towards p_count_user's monthly imports; the lease check below lets that
+-- happen once per item. The job is finished once no items remain. Returns
+-- NULL if the lease was lost to another worker.
+CREATE OR REPLACE FUNCTION complete_import_item(
+  p_id BIGINT,
+  p_worker TEXT,
+  p_status TEXT,
+  p_error JSONB DEFAULT NULL,
+  p_retry_in_seconds INTEGER DEFAULT NULL,
+  p_count_user TEXT DEFAULT NULL
+) RETURNS import_jobs LANGUAGE plpgsql AS $$
+DECLARE
+  item import_job_items;
+  job import_jobs;
+BEGIN
+  UPDATE import_job_items
+  SET status = CASE WHEN p_retry_in_seconds IS NULL THEN p_status ELSE 'pending' END,
+      run_after = CASE WHEN p_retry_in_seconds IS NULL THEN run_after
+                       ELSE now() + make_interval(secs => p_retry_in_seconds) END,
+      leased_by = NULL,
+      lease_expires_at = NULL,
+      last_error = p_error->>'reason'
+  WHERE id = p_id AND leased_by = p_worker AND status = 'running'
+  RETURNING * INTO item;
+
+  IF item.id IS NULL THEN
+    RETURN NULL;
+  END IF;
+
+  -- Serialize completions per job so exactly one of them sees the last item.
+  SELECT * INTO job FROM import_jobs WHERE id = item.job_id FOR UPDATE;
+  IF p_retry_in_seconds IS NOT NULL THEN
+    RETURN job;
+  END IF;
+
+  IF item.kind = 'video' THEN
+    IF p_status = 'succeeded' AND p_count_user IS NOT NULL THEN
+      PERFORM increment_import_count(p_count_user, to_char(now() AT TIME ZONE 'UTC', 'YYYY-MM'));
+    END IF;
+    job := update_import_job(item.job_id,
+                             p_processed => 1,
+                             p_succeeded => (p_status = 'succeeded')::int,
+                             p_failed => (p_status = 'failed')::int,
+                             p_error => p_error);
+  ELSIF p_status = 'failed' THEN
+    RETURN update_import_job(item.job_id, p_status => 'failed', p_error => p_error);
+  END IF;
+
+  IF NOT EXISTS (SELECT 1 FROM import_job_items
+                 WHERE job_id = item.job_id AND status IN ('pending', 'running')) THEN
+    job := update_import_job(item.job_id, p_finish => true);
+  END IF;
+  RETURN job;
+END;
+$$;
+
+-- True if p_owner now holds the claim on p_canonical_url: it was free,
+-- expired, or already p_owner's.
+CREATE OR REPLACE FUNCTION claim_import(
+  p_canonical_url TEXT,
+  p_owner TEXT,
+  p_ttl_seconds INTEGER
+) RETURNS BOOLEAN LANGUAGE sql AS $$
+  WITH claimed AS (
+    INSERT INTO import_claims (canonical_url, claimed_by, expires_at)
+    VALUES (p_canonical_url, p_owner, now() + make_interval(secs => p_ttl_seconds))
+    ON CONFLICT (canonical_url) DO UPDATE
+      SET claimed_by = EXCLUDED.claimed_by, expires_at = EXCLUDED.expires_at
+      WHERE import_claims.expires_at < now() OR import_claims.claimed_by = EXCLUDED.claimed_by
+    RETURNING 1
+  )
+  SELECT EXISTS (SELECT 1 FROM claimed);
+$$;
+
 -- Triggers
 CREATE OR REPLACE FUNCTION update_updated_at()
 RETURNS TRIGGER AS $$ BEGIN NEW.updated_at = now(); RETURN NEW; END; $$ LANGUAGE plpgsql;
@@ -179,4 +737,24 @@ CREATE TRIGGER recipes_updated BEFORE UPDATE ON recipes FOR EACH ROW EXECUTE FUN
 CREATE TRIGGER user_recipes_updated BEFORE UPDATE ON user_recipes FOR EACH ROW EXECUTE FUNCTION update_updated_at();
 CREATE TRIGGER collections_updated BEFORE UPDATE ON collections FOR EACH ROW EXECUTE FUNCTION update_updated_at();
 CREATE TRIGGER jobs_updated BEFORE UPDATE ON import_jobs FOR EACH ROW EXECUTE FUNCTION update_updated_at();
+CREATE TRIGGER job_items_updated BEFORE UPDATE ON import_job_items FOR EACH ROW EXECUTE FUNCTION update_updated_at();
 CREATE TRIGGER lists_updated BEFORE UPDATE ON saved_shopping_lists FOR EACH ROW EXECUTE FUNCTION update_updated_at();
+
+CREATE OR REPLACE FUNCTION bump_match_version()
+RETURNS TRIGGER AS $$
+DECLARE
+  v_user TEXT := CASE WHEN TG_OP = 'DELETE' THEN OLD.user_id ELSE NEW.user_id END;
+BEGIN
+  IF TG_TABLE_NAME = 'pantry_items' THEN
+    INSERT INTO match_versions (user_id, pantry_version) VALUES (v_user, 1)
+    ON CONFLICT (user_id) DO UPDATE SET pantry_version = match_versions.pantry_version + 1;
+  ELSE
+    INSERT INTO match_versions (user_id, library_version) VALUES (v_user, 1)
+    ON CONFLICT (user_id) DO UPDATE SET library_version = match_versions.library_version + 1;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER pantry_items_match_version AFTER INSERT OR UPDATE OR DELETE ON pantry_items FOR EACH ROW EXECUTE FUNCTION bump_match_version();
+CREATE TRIGGER user_recipes_match_version AFTER INSERT OR UPDATE OR DELETE ON user_recipes FOR EACH ROW EXECUTE FUNCTION bump_match_version();
@@ -0,0 +1,40 @@
+"""
+Parse ingredient quantities into amount / canonical_unit fields for recipes
+imported before quantities were structured at import time.
+Run: python scripts/backfill_quantities.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import db
+from quantities import with_parsed_quantity
+
+
+def main():
+    updated = 0
+    after_id = None
+    while True:
+        rows = db.get_recipes_after(after_id, columns='id, ingredients')
+        if not rows:
+            break
+        for row in rows:
+            ingredients = row.get('ingredients') or []
+            if all('parsed' in ing for ing in ingredients):
+                continue
+            db.update_recipe_fields(row['id'], {
+                'ingredients': [ing if 'parsed' in ing else with_parsed_quantity(ing)
+                                for ing in ingredients],
+            })
+            updated += 1
+        after_id = rows[-1]['id']
+
+    print(f"\nDone: {updated} recipes updated")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Populate recipes.ingredient_ids / equipment_ids for rows imported before the
+ingredient vocabulary existed.
+Run: python scripts/backfill_vocab.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import db
+from importer import with_vocab_ids
+
+
+def main():
+    updated = 0
+    after_id = None
+    while True:
+        rows = db.get_recipes_after(after_id, columns='id, ingredients, equipment, ingredient_ids, equipment_ids')
+        if not rows:
+            break
+        for row in rows:
+            if len(row.get('ingredient_ids') or []) == len(row.get('ingredients') or []) and \
+               len(row.get('equipment_ids') or []) == len(row.get('equipment') or []):
+                continue
+            filled = with_vocab_ids(row)
+            if filled is row:
+                continue
+            db.update_recipe_fields(row['id'], {
+                'ingredient_ids': filled['ingredient_ids'],
+                'equipment_ids': filled['equipment_ids'],
+            })
+            updated += 1
+        after_id = rows[-1]['id']
+
+    print(f"\nDone: {updated} recipes updated")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+"""
+Benchmark the matching hot path on seeded synthetic libraries and pantries.
+Run: python scripts/bench_matching.py [--full] [--save] [--check]
+
+Reports latency percentiles (ms), allocated blocks and peak traced memory
+(KiB) per case. Each case is timed over --runs separate runs; p50 is the
+median of the runs' medians and noise is the spread between them. --save
+writes the results as the baseline; --check compares against it and exits
+non-zero when a case is slower than the baseline by more than --tolerance
+and by more than NOISE_FACTOR times the noise (at least MIN_REGRESSION_MS),
+or heavier by --tolerance. Cases that look slower are measured again
+--recheck times and judged on the median of all their measurements, since a
+whole process can run slow.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from matching import PantryIndex, compute_match, compute_matches, rank_matches, generate_shopping_list
+from quantities import with_parsed_quantity
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baselines.json')
+
+QUICK_GRID = [(100, 10), (1000, 50), (5000, 100)]
+# A latency change has to clear this many times the larger of the baseline's
+# and the current run's noise before it counts as a regression.
+NOISE_FACTOR = 3
+# Cases that take a millisecond or two swing by most of that between
+# processes, whatever the noise within one run says.
+MIN_REGRESSION_MS = 1.0
+FULL_GRID = [(n, p) for n in (100, 1000, 10000, 50000) for p in (10, 50, 500)]
+
+# Roughly ordered by how often they show up in recipes; sampling is Zipf-like
+# over this order so staples dominate and the long tail stays rare.
+INGREDIENTS = [
+    'salt', 'olive oil', 'garlic', 'onion', 'butter', 'black pepper', 'sugar', 'water',
+    'eggs', 'all-purpose flour', 'lemon juice', 'milk', 'vegetable oil', 'parmesan cheese',
+    'kosher salt', 'heavy cream', 'soy sauce', 'chicken broth', 'tomatoes', 'red pepper flakes',
+    'ginger', 'brown sugar', 'vanilla extract', 'baking powder', 'cumin', 'paprika',
+    'chicken thighs', 'cilantro', 'parsley', 'honey', 'lime juice', 'scallions', 'carrots',
+    'celery', 'shallots', 'thyme', 'rosemary', 'basil', 'oregano', 'cinnamon', 'baking soda',
+    'rice vinegar', 'sesame oil', 'dijon mustard', 'mayonnaise', 'bay leaves', 'potatoes',
+    'ground beef', 'chicken breast', 'bacon', 'spaghetti', 'rice', 'coconut milk',
+    'fish sauce', 'chili powder', 'cheddar cheese', 'mozzarella', 'sour cream', 'yogurt',
+    'spinach', 'mushrooms', 'bell pepper', 'zucchini', 'avocado', 'jalapeno', 'red onion',
+    'white wine', 'red wine vinegar', 'balsamic vinegar', 'maple syrup', 'cornstarch',
+    'panko breadcrumbs', 'feta', 'chickpeas', 'black beans', 'tomato paste', 'canned tomatoes',
+    'smoked paprika', 'turmeric', 'garam masala', 'coriander', 'cardamom', 'nutmeg',
+    'salmon', 'shrimp', 'pork shoulder', 'lamb', 'tofu', 'miso', 'gochujang', 'tahini',
+    'capers', 'anchovies', 'pine nuts', 'walnuts', 'almonds', 'dark chocolate', 'cocoa powder',
+    'buttermilk', 'cream cheese', 'ricotta', 'mascarpone', 'saffron', 'star anise',
+    'lemongrass', 'kaffir lime leaves', 'sumac', "za'atar", 'harissa', 'preserved lemon',
+]
+QUALIFIERS = ['fresh', 'chopped', 'minced', 'large', 'unsalted', 'boneless', 'toasted', 'dried']
+UNITS = ['cup', 'cups', 'tbsp', 'tsp', 'g', 'oz', 'lb', 'cloves', '', '']
+QUANTITIES = ['1', '2', '1/2', '1 1/2', '3', '2-3', '1/4', '200', 'to taste', 'a pinch']
+TOOLS = ['large pot', 'skillet', 'cast iron skillet', 'dutch oven', 'sheet pan', 'whisk',
+         'food processor', 'stand mixer', 'blender', 'mandoline', 'wok', 'instant pot']
+
+
+def _zipf_choice(rng: random.Random, items: list, s: float = 1.1):
+    weights = [1 / (rank + 1) ** s for rank in range(len(items))]
+    return rng.choices(items, weights=weights)[0]
+
+
+def synthetic_library(n: int, seed: int = 1) -> list[dict]:
+    rng = random.Random(seed)
+    recipes = []
+    for i in range(n):
+        names = set()
+        for _ in range(max(1, round(rng.gauss(9, 3)))):
+            name = _zipf_choice(rng, INGREDIENTS)
+            if rng.random() < 0.15:
+                name = f'{rng.choice(QUALIFIERS)} {name}'
+            names.add(name)
+        recipes.append({
+            'id': f'r{i}', 'user_recipe_id': f'ur{i}', 'recipe_id': f'r{i}',
+            'recipe_name': f'Recipe {i}', 'rating': rng.choice([None, 3, 4, 5]),
+            'ingredients': [with_parsed_quantity({
+                'name': name.title(), 'normalized_name': name,
+                'quantity': rng.choice(QUANTITIES), 'unit': rng.choice(UNITS),
+                'category': 'other',
+            }) for name in names],
+            'equipment': [{'name': t.title(), 'is_special': False}
+                          for t in rng.sample(TOOLS, rng.randint(0, 3))],
+        })
+    return recipes
+
+
+def synthetic_pantry(n: int, seed: int = 2) -> tuple[list[str], list[str]]:
+    rng = random.Random(seed)
+    items = set()
+    # Pantries are biased towards staples but wider than any single recipe.
+    pool = INGREDIENTS + [f'{q} {name}' for q in QUALIFIERS for name in INGREDIENTS]
+    while len(items) < min(n, len(pool)):
+        items.add(_zipf_choice(rng, pool, s=0.6))
+    return sorted(items), rng.sample(TOOLS, min(len(TOOLS), max(1, n // 20)))
+
+
+CASES = ('pantry_index', 'compute_match', 'compute_matches', 'rank_matches_top20',
+         'shopping_list_20')
+
+
+def _cases(library: list[dict], pantry: list[str], tools: list[str]) -> dict:
+    pantry_index, tools_index = PantryIndex(pantry), PantryIndex(tools)
+    return {
+        'pantry_index': lambda: PantryIndex(pantry),
+        'compute_match': lambda: [compute_match(pantry, tools, r) for r in library[:100]],
+        'compute_matches': lambda: compute_matches(pantry, tools, library),
+        'rank_matches_top20': lambda: rank_matches(pantry_index, tools_index, library, limit=20),
+        'shopping_list_20': lambda: generate_shopping_list(pantry, library[:20]),
+    }
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+def _timings(fn, repeat: int) -> list[float]:
+    fn()  # warm caches and imports
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def measure(fn, repeat: int, runs: int = 1) -> dict:
+    medians, samples = [], []
+    for _ in range(runs):
+        timings = _timings(fn, repeat)
+        medians.append(statistics.median(timings))
+        samples += timings
+    p50 = statistics.median(medians)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    fn()
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sum(s.count_diff for s in after.compare_to(before, 'filename') if s.count_diff > 0)
+
+    return {
+        'p50_ms': round(p50, 3),
+        # Median distance of the runs' medians from p50; with one run, of the samples.
+        'noise_ms': round(statistics.median(abs(m - p50) for m in (medians if runs > 1 else samples)), 3),
+        'p95_ms': round(_percentile(samples, 95), 3),
+        'p99_ms': round(_percentile(samples, 99), 3),
+        'alloc_blocks': blocks,
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def run(grid: list[tuple[int, int]], repeat: int, seed: int, runs: int = 1,
+        only: set[str] = None) -> dict:
+    results = {}
+    for n_recipes, n_pantry in grid:
+        keys = {name: f'{name}/recipes={n_recipes}/pantry={n_pantry}' for name in CASES}
+        if only is not None and not only & set(keys.values()):
+            continue
+        library = synthetic_library(n_recipes, seed=seed)
+        pantry, tools = synthetic_pantry(n_pantry, seed=seed + 1)
+        # Large libraries get fewer repeats so the full grid stays practical.
+        reps = max(3, repeat * 1000 // max(n_recipes, 1000))
+        for name, fn in _cases(library, pantry, tools).items():
+            key = keys[name]
+            if only is not None and key not in only:
+                continue
+            results[key] = measure(fn, reps, runs)
+            r = results[key]
+            print(f"{key:<55} p50 {r['p50_ms']:>9.3f}ms ±{r['noise_ms']:<7.3f} p95 {r['p95_ms']:>9.3f}ms  "
+                  f"p99 {r['p99_ms']:>9.3f}ms  {r['alloc_blocks']:>8} blocks  {r['peak_kib']:>9.1f} KiB")
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Cases whose p50 latency or peak memory exceed baseline * tolerance.
+
+    Latency also has to exceed the baseline by NOISE_FACTOR times the larger
+    noise of the two measurements, and by MIN_REGRESSION_MS, so run-to-run
+    jitter isn't reported.
+    """
+    regressions = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        noise = max(base.get('noise_ms', 0), current.get('noise_ms', 0))
+        limits = {
+            'p50_ms': max(base['p50_ms'] * tolerance,
+                          base['p50_ms'] + max(NOISE_FACTOR * noise, MIN_REGRESSION_MS)),
+            'peak_kib': base['peak_kib'] * tolerance,
+        }
+        for metric, limit in limits.items():
+            if base[metric] and current[metric] > limit:
+                regressions.append(f'{key}: {metric} {base[metric]} -> {current[metric]}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--full', action='store_true', help='100 to 50,000 recipes, 10 to 500 pantry items')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--runs', type=int, default=5, help='separate timing runs per case')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save', action='store_true', help='write results as the new baseline')
+    parser.add_argument('--check', action='store_true', help='fail on regressions against the baseline')
+    parser.add_argument('--tolerance', type=float, default=1.25)
+    parser.add_argument('--recheck', type=int, default=2,
+                        help='extra measurements of cases that look slower')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    args = parser.parse_args()
+
+    results = run(FULL_GRID if args.full else QUICK_GRID, args.repeat, args.seed, args.runs)
+
+    if args.check:
+        if not os.path.exists(args.baseline):
+            sys.exit(f'No baseline at {args.baseline}; run with --save first')
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        suspects = {r.split(':')[0] for r in compare(results, baseline, args.tolerance)}
+        p50s = {key: [results[key]['p50_ms']] for key in suspects}
+        for _ in range(args.recheck if suspects else 0):
+            print(f'\nRe-measuring {len(suspects)} slower cases')
+            again = run(FULL_GRID if args.full else QUICK_GRID, args.repeat, args.seed, args.runs,
+                        only=suspects)
+            for key, r in again.items():
+                p50s[key].append(r['p50_ms'])
+                results[key]['noise_ms'] = max(results[key]['noise_ms'], r['noise_ms'])
+        for key, values in p50s.items():
+            results[key]['p50_ms'] = round(statistics.median(values), 3)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print('\nRegressions:\n  ' + '\n  '.join(regressions))
+            sys.exit(1)
+        print('\nNo regressions')
+
+    if args.save:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f'\nBaseline written to {args.baseline}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import inspect
+import threading
+import pytest
+from unittest.mock import patch
+
+import adb
+import db
+
+
+class TestAdb:
+    @pytest.mark.asyncio
+    async def test_runs_db_function_off_the_event_loop(self):
+        loop_thread = threading.get_ident()
+        calls = []
+
+        def fake_get_pantry(user_id):
+            calls.append((user_id, threading.get_ident()))
+            return {'current': []}
+
+        with patch('db.get_pantry', side_effect=fake_get_pantry):
+            assert await adb.get_pantry('u1') == {'current': []}
+        assert calls[0][0] == 'u1'
+        assert calls[0][1] != loop_thread
+
+    @pytest.mark.asyncio
+    async def test_propagates_errors(self):
+        with patch('db.get_import_job', side_effect=RuntimeError('down')):
+            with pytest.raises(RuntimeError, match='down'):
+                await adb.get_import_job('j1')
+
+    def test_wrappers_match_db_signatures(self):
+        wrappers = [name for name, fn in vars(adb).items()
+                    if inspect.iscoroutinefunction(fn) and not name.startswith('_')
+                    and name not in ('run_sync', 'run_cpu')]
+        assert 'get_pantry' in wrappers
+        for name in wrappers:
+            assert inspect.signature(getattr(adb, name)) == inspect.signature(getattr(db, name)), name
+
+    @pytest.mark.asyncio
+    async def test_cpu_work_has_its_own_limiter(self):
+        limiters = []
+
+        async def fake_run_sync(fn, limiter):
+            limiters.append(limiter)
+            return fn()
+
+        with patch('adb.anyio.to_thread.run_sync', side_effect=fake_run_sync):
+            await adb.run_sync(lambda: None)
+            await adb.run_cpu(lambda: None)
+        assert limiters[0] is not limiters[1]
+        assert limiters[1].total_tokens == adb.CPU_CONCURRENCY
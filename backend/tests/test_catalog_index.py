@@ -0,0 +1,102 @@
+import pytest
+from unittest.mock import patch
+
+import catalog_index
+from catalog_index import CatalogIndex
+from matching import PantryIndex
+from vocab import Vocabulary
+
+TERMS = {1: 'eggs', 2: 'butter', 3: 'salt', 4: 'bread', 5: 'arborio rice',
+         6: 'parmesan', 7: 'white wine', 8: 'stock'}
+IDS = {name: vid for vid, name in TERMS.items()}
+
+
+def _recipe(rid, *names, updated_at='2025-01-01T00:00:00+00:00'):
+    return {'id': rid, 'recipe_name': rid.title(), 'updated_at': updated_at,
+            'ingredients': [{'name': n, 'normalized_name': n} for n in names],
+            'ingredient_ids': [IDS[n] for n in names]}
+
+
+def _pantry(*items):
+    index = PantryIndex(list(items))
+    index.add_resolved_ids({vid for vid, name in TERMS.items() if index.matches(name)},
+                           max(TERMS))
+    return index
+
+
+@pytest.fixture
+def index():
+    idx = CatalogIndex()
+    idx.add(_recipe('omelette', 'eggs', 'butter', 'salt'))
+    idx.add(_recipe('toast', 'bread', 'butter'))
+    idx.add(_recipe('risotto', 'arborio rice', 'parmesan', 'white wine', 'stock'))
+    return idx
+
+
+class TestCatalogIndex:
+    def test_ranks_by_coverage(self, index):
+        results = index.search(_pantry('egg', 'butter', 'sea salt'))
+        assert [r['recipe_id'] for r in results] == ['omelette', 'toast']
+        assert results[0]['coverage'] == 1.0
+        assert results[1]['matched'] == 1
+
+    def test_limit_and_min_coverage(self, index):
+        pantry = _pantry('butter', 'egg', 'parmesan')
+        assert len(index.search(pantry, limit=1)) == 1
+        assert [r['recipe_id'] for r in index.search(pantry, min_coverage=0.6)] == ['omelette']
+
+    def test_upsert_replaces_ingredients(self, index):
+        pantry = _pantry('bread', 'butter')
+        assert index.search(pantry)[0]['recipe_id'] == 'toast'
+        index.add(_recipe('toast', 'stock', 'salt'))
+        assert [r['recipe_id'] for r in index.search(pantry)] == ['omelette']
+
+class TestRefresh:
+    def test_pages_from_the_watermark(self):
+        idx = CatalogIndex()
+        pages = [[_recipe('a', 'eggs', updated_at='2025-01-01T00:00:00+00:00'),
+                  _recipe('b', 'salt', updated_at='2025-01-01T00:05:00+00:00')],
+                 [_recipe('c', 'stock', updated_at='2025-01-01T00:06:00+00:00')],
+                 [_recipe('d', 'bread', updated_at='2025-01-01T00:07:00+00:00')]]
+        with patch('catalog_index.db.get_recipes_updated_since', side_effect=pages) as fetch:
+            idx.refresh(batch_size=2)
+            assert len(idx) == 3
+            idx.refresh(batch_size=2)
+        assert len(idx) == 4
+        assert fetch.call_args_list[0].args[:2] == (None, None)
+        assert fetch.call_args_list[1].args[1] == ('2025-01-01T00:05:00+00:00', 'b')
+        # Re-reads REFRESH_OVERLAP seconds behind the newest row seen.
+        assert fetch.call_args_list[2].args[:2] == ('2025-01-01T00:05:00+00:00', None)
+
+    def test_interns_rows_without_ids(self):
+        idx = CatalogIndex()
+        row = {**_recipe('a', 'eggs', 'salt'), 'ingredient_ids': []}
+        vocab = Vocabulary()
+        with patch('catalog_index.db.get_recipes_updated_since', return_value=[row]), \
+             patch('catalog_index.get_vocabulary', return_value=vocab), \
+             patch('vocab.db.intern_vocab_terms', return_value={'eggs': 1, 'salt': 3}):
+            idx.refresh()
+        assert idx.max_term_id == 3
+        assert idx.search(_pantry('salt'))[0]['recipe_id'] == 'a'
+
+    @pytest.mark.asyncio
+    async def test_search_catalog_resolves_newer_terms(self, index):
+        pantry = _pantry('bread', 'butter')
+        pantry.ids_through = 0
+        with patch('catalog_index._index', index), \
+             patch.object(index, 'refresh'), \
+             patch('vocab.db.match_vocab_terms', return_value=([2, 4], 8)) as rpc:
+            results = await catalog_index.search_catalog(pantry)
+            await catalog_index.search_catalog(pantry)
+        assert results[0]['recipe_id'] == 'toast'
+        assert rpc.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_search_catalog_keeps_database_work_off_the_cpu_limiter(self, index):
+        pantry = _pantry('bread', 'butter')
+        with patch('catalog_index._index', index), \
+             patch.object(index, 'refresh') as refresh, \
+             patch('catalog_index.adb.run_cpu', wraps=catalog_index.adb.run_cpu) as run_cpu:
+            await catalog_index.search_catalog(pantry)
+        refresh.assert_called_once()
+        assert [c.args[0] for c in run_cpu.call_args_list] == [index.search]
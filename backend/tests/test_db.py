@@ -0,0 +1,231 @@
+import pytest
+from unittest.mock import patch, MagicMock
+
+import db
+
+
+def _uuid(i):
+    return f'00000000-0000-0000-0000-00000000000{i}'
+
+
+def _member(i):
+    return {'id': _uuid(i), 'added_at': f'2024-01-0{i}T00:00:00+00:00',
+            'user_recipes': {'id': f'ur{i}', 'recipe_id': f'r{i}', 'rating': None, 'notes': None,
+                             'added_at': '2024-01-01', 'recipes': {'id': f'r{i}', 'recipe_name': f'R{i}'}}}
+
+
+class TestKeysetCursor:
+    def test_round_trip(self):
+        cursor = db.encode_keyset('2024-01-01T00:00:00+00:00', _uuid(1))
+        assert db.decode_keyset(cursor) == ('2024-01-01T00:00:00+00:00', _uuid(1))
+
+    def test_empty_is_first_page(self):
+        assert db.decode_keyset(None) is None
+
+    @pytest.mark.parametrize('cursor', [
+        'garbage',
+        db.encode_keyset('', _uuid(1)),
+        db.encode_keyset('yesterday', _uuid(1)),
+        db.encode_keyset('2024-01-01', 'x'),
+        db.encode_keyset('2024-01-01', f'{_uuid(1)},id.neq.0'),
+        db.encode_keyset('2024-01-01",or(id.gt.0),x.eq."', _uuid(1)),
+    ])
+    def test_rejects_invalid(self, cursor):
+        with pytest.raises(ValueError, match='Invalid cursor'):
+            db.decode_keyset(cursor)
+
+
+class TestCollectionRecipesPage:
+    def _client(self, rows):
+        client = MagicMock()
+        query = client.table.return_value.select.return_value.eq.return_value \
+            .order.return_value.order.return_value
+        query.limit.return_value.execute.return_value.data = rows
+        query.or_.return_value.limit.return_value.execute.return_value.data = rows
+        return client, query
+
+    def test_single_joined_query_with_next_cursor(self):
+        client, query = self._client([_member(1), _member(2), _member(3)])
+        with patch('db.get_client', return_value=client):
+            recipes, cursor = db.get_collection_recipes_page('c1', 'u1', limit=2)
+        assert [r['recipe_name'] for r in recipes] == ['R1', 'R2']
+        assert recipes[0]['user_recipe_id'] == 'ur1'
+        query.limit.assert_called_once_with(3)
+        assert db.decode_keyset(cursor) == (_member(2)['added_at'], _uuid(2))
+
+    def test_last_page_has_no_cursor(self):
+        client, query = self._client([_member(3)])
+        after = db.encode_keyset(_member(2)['added_at'], _uuid(2))
+        with patch('db.get_client', return_value=client):
+            recipes, cursor = db.get_collection_recipes_page('c1', 'u1', limit=2, cursor=after)
+        assert [r['recipe_name'] for r in recipes] == ['R3']
+        assert cursor is None
+        assert f'id.gt.{_uuid(2)}' in query.or_.call_args[0][0]
+
+
+class TestCollectionsOverview:
+    def _client(self, rows):
+        client = MagicMock()
+        client.rpc.return_value.execute.return_value.data = rows
+        return client
+
+    def test_maps_rpc_rows(self):
+        rows = [
+            {'id': 'all_recipes', 'name': 'All Recipes', 'recipe_count': 3,
+             'thumbnails': ['a.jpg'], 'sort_order': 0, 'is_system': True},
+            {'id': 'c1', 'name': 'Weeknight', 'recipe_count': 1, 'thumbnails': ['b.jpg'],
+             'sort_order': 2, 'is_system': False, 'user_id': 'u1'},
+        ]
+        client = self._client(rows)
+        with patch('db.get_client', return_value=client):
+            collections = db.get_collections('u1')
+        client.rpc.assert_called_once_with('get_collections_overview', {'p_user_id': 'u1'})
+        client.table.assert_not_called()
+        assert collections[1] == {'id': 'c1', 'name': 'Weeknight', 'recipe_count': 1,
+                                  'thumbnails': ['b.jpg'], 'sort_order': 2, 'is_system': False}
+
+    def test_empty_collection(self):
+        client = self._client([{'id': 'c1', 'name': 'Empty', 'recipe_count': 0,
+                                'thumbnails': None, 'is_system': False}])
+        with patch('db.get_client', return_value=client):
+            [collection] = db.get_collections('u1')
+        assert collection['recipe_count'] == 0
+        assert collection['thumbnails'] == []
+        assert collection['sort_order'] is None
+
+
+class TestShoppingLists:
+    def test_saved_lists_use_one_embedded_select(self):
+        client = MagicMock()
+        query = client.table.return_value.select.return_value.eq.return_value.order.return_value
+        query.execute.return_value.data = [
+            {'id': 'l1', 'name': 'Week', 'shopping_list_recipes': [{'recipe_id': 'r1'}, {'recipe_id': 'r2'}]},
+            {'id': 'l2', 'name': 'Empty', 'shopping_list_recipes': []},
+        ]
+        with patch('db.get_client', return_value=client):
+            lists = db.get_saved_lists('u1')
+        client.table.return_value.select.assert_called_once_with('*, shopping_list_recipes(recipe_id)')
+        assert lists == [{'id': 'l1', 'name': 'Week', 'recipe_ids': ['r1', 'r2']},
+                         {'id': 'l2', 'name': 'Empty', 'recipe_ids': []}]
+
+    def test_save_is_a_single_rpc(self):
+        client = MagicMock()
+        client.rpc.return_value.execute.return_value.data = {'id': 'l1', 'name': 'Week'}
+        with patch('db.get_client', return_value=client):
+            saved = db.save_shopping_list('u1', 'Week', ['r1', 'r2', 'r1'], [])
+        assert saved == {'id': 'l1', 'name': 'Week'}
+        name, params = client.rpc.call_args[0]
+        assert name == 'save_shopping_list'
+        assert params['p_recipe_ids'] == ['r1', 'r2']
+        client.table.assert_not_called()
+
+
+class TestImportCounters:
+    def test_increment_import_count_is_one_upsert(self):
+        client = MagicMock()
+        client.rpc.return_value.execute.return_value.data = 4
+        with patch('db.get_client', return_value=client):
+            assert db.increment_import_count('u1', '2026-10') == 4
+        client.rpc.assert_called_once_with('increment_import_count', {'p_user_id': 'u1', 'p_month': '2026-10'})
+        client.table.assert_not_called()
+
+    def test_update_import_job_sends_increments(self):
+        client = MagicMock()
+        client.rpc.return_value.execute.return_value.data = {'id': 'j1', 'failed': 1}
+        with patch('db.get_client', return_value=client):
+            job = db.update_import_job('j1', failed_increment=True, processed_increment=True,
+                                       error={'url': 'u', 'reason': 'x'})
+        assert job == {'id': 'j1', 'failed': 1}
+        params = client.rpc.call_args[0][1]
+        assert (params['p_processed'], params['p_succeeded'], params['p_failed']) == (1, 0, 1)
+        assert params['p_error'] == {'url': 'u', 'reason': 'x'}
+
+
+class TestImportQueue:
+    def test_enqueue_videos_is_idempotent_upsert(self):
+        client = MagicMock()
+        client.rpc.return_value.execute.return_value.data = {'id': 'j1', 'total_videos': 2}
+        with patch('db.get_client', return_value=client):
+            db.enqueue_import_videos('j1', ['a', 'b'])
+        rows = client.table.return_value.upsert.call_args[0][0]
+        assert [(r['kind'], r['position'], r['url']) for r in rows] == [('video', 0, 'a'), ('video', 1, 'b')]
+        assert client.table.return_value.upsert.call_args.kwargs == {
+            'on_conflict': 'job_id,kind,position', 'ignore_duplicates': True}
+        assert client.rpc.call_args[0][1]['p_total_videos'] == 2
+
+    def test_complete_reports_lost_lease(self):
+        client = MagicMock()
+        client.rpc.return_value.execute.return_value.data = {'id': None, 'status': None}
+        with patch('db.get_client', return_value=client):
+            assert db.complete_import_item(7, 'w1', 'succeeded') is None
+        assert client.rpc.call_args[0] == ('complete_import_item', {
+            'p_id': 7, 'p_worker': 'w1', 'p_status': 'succeeded',
+            'p_error': None, 'p_retry_in_seconds': None, 'p_count_user': None})
+
+
+class TestSearchRecipes:
+    def test_search_uses_ranked_rpc(self):
+        client = MagicMock()
+        client.rpc.return_value.execute.return_value.data = {
+            'recipes': [{'id': 'r1'}], 'total': 5000, 'estimated': True}
+        with patch('db.get_client', return_value=client):
+            assert db.search_recipes(search=' carbonara ') == ([{'id': 'r1'}], 5000, True)
+        name, params = client.rpc.call_args[0]
+        assert name == 'search_recipes'
+        assert params['p_query'] == 'carbonara'
+        client.table.assert_not_called()
+
+    def test_listing_uses_estimated_count(self):
+        client = MagicMock()
+        query = client.table.return_value.select.return_value
+        query.order.return_value.range.return_value.execute.return_value = MagicMock(data=[], count=3)
+        with patch('db.get_client', return_value=client):
+            assert db.search_recipes() == ([], 3, False)
+        client.table.return_value.select.assert_called_once_with('*', count='estimated')
+
+    def test_summary(self):
+        client = MagicMock()
+        client.rpc.return_value.execute.return_value.data = {}
+        query = client.table.return_value.select.return_value
+        query.order.return_value.range.return_value.execute.return_value = MagicMock(data=[], count=0)
+        with patch('db.get_client', return_value=client):
+            db.search_recipes(search='soup', summary=True)
+            db.search_recipes(summary=True)
+        assert client.rpc.call_args[0][1]['p_summary'] is True
+        client.table.return_value.select.assert_called_once_with(
+            db.RECIPE_SUMMARY_COLUMNS, count='estimated')
+
+
+class TestSummaryPages:
+    def test_library_summary_projection(self):
+        client = MagicMock()
+        query = client.table.return_value.select.return_value.eq.return_value \
+            .order.return_value.order.return_value
+        query.execute.return_value.data = []
+        with patch('db.get_client', return_value=client):
+            db.get_collection_recipes_page('all_recipes', 'u1', summary=True)
+        client.table.return_value.select.assert_called_once_with(db.USER_RECIPE_SUMMARY_COLUMNS)
+        assert 'ingredients' not in db.RECIPE_SUMMARY_COLUMNS
+
+    def test_catalog_keyset_on_created_at(self):
+        client = MagicMock()
+        query = client.table.return_value.select.return_value.order.return_value.order.return_value
+        rows = [{'id': _uuid(i), 'created_at': f'2024-01-0{i}T00:00:00+00:00'} for i in (3, 2, 1)]
+        query.or_.return_value.limit.return_value.execute.return_value.data = rows
+        after = db.encode_keyset('2024-01-04T00:00:00+00:00', _uuid(4))
+        with patch('db.get_client', return_value=client):
+            page, cursor = db.get_recipes_page(limit=2, cursor=after, summary=True)
+        assert [r['id'] for r in page] == [_uuid(3), _uuid(2)]
+        assert db.decode_keyset(cursor) == ('2024-01-02T00:00:00+00:00', _uuid(2))
+        assert query.or_.call_args[0][0].startswith('created_at.lt."2024-01-04T00:00:00+00:00"')
+
+
+class TestUserChefs:
+    def test_grouped_in_one_rpc(self):
+        client = MagicMock()
+        chefs = [{'channel_id': 'c1', 'channel_name': 'Chef', 'recipe_count': 3, 'is_favorite': True}]
+        client.rpc.return_value.execute.return_value.data = chefs
+        with patch('db.get_client', return_value=client):
+            assert db.get_user_chefs('u1') == chefs
+        client.rpc.assert_called_once_with('get_user_chefs', {'p_user_id': 'u1'})
+        client.table.assert_not_called()
@@ -0,0 +1,130 @@
+import asyncio
+import socket
+
+import pytest
+from unittest.mock import patch
+
+import httpx
+
+import http_client
+
+
+@pytest.fixture(autouse=True)
+def _fresh_dns_cache():
+    http_client.clear_dns_cache()
+    yield
+    http_client.clear_dns_cache()
+
+
+def _addrinfo(*ips):
+    return [(2, 1, 6, '', (ip, 0)) for ip in ips]
+
+
+class TestHttpClient:
+    @pytest.mark.asyncio
+    async def test_one_pooled_client_per_loop_until_closed(self):
+        client = http_client.get_client()
+        assert http_client.get_client() is client
+        assert client.follow_redirects is False
+        await http_client.close()
+        assert client.is_closed
+        fresh = http_client.get_client()
+        assert fresh is not client
+        await http_client.close()
+
+    @pytest.mark.asyncio
+    async def test_host_limits_are_per_host_and_released(self):
+        release = asyncio.Event()
+        active = {'a.com': 0, 'b.com': 0}
+        peak = dict(active)
+
+        async def fetch(host):
+            async with http_client.host_limit(host):
+                active[host] += 1
+                peak[host] = max(peak[host], active[host])
+                await release.wait()
+                active[host] -= 1
+
+        with patch('http_client.FETCH_PER_HOST', 2):
+            tasks = [asyncio.create_task(fetch(h)) for h in ['a.com'] * 3 + ['b.com']]
+            await asyncio.sleep(0)
+            assert active == {'a.com': 2, 'b.com': 1}
+            release.set()
+            await asyncio.gather(*tasks)
+        assert peak == {'a.com': 2, 'b.com': 1}
+        assert http_client._host_limits[asyncio.get_running_loop()] == {}
+        await http_client.close()
+
+
+class TestPinnedTransport:
+    @pytest.mark.asyncio
+    async def test_requests_connect_through_the_pinned_backend(self, monkeypatch):
+        # A proxy from the environment would connect on our behalf instead.
+        monkeypatch.setenv('HTTP_PROXY', 'http://127.0.0.1:3128')
+        client = http_client.get_client()
+        assert client.trust_env is False
+        try:
+            with patch('http_client.socket.getaddrinfo', return_value=_addrinfo('127.0.0.1')):
+                with pytest.raises(ValueError, match='private/internal'):
+                    await client.get('http://a.com/')
+        finally:
+            await http_client.close()
+
+    def test_fails_loudly_if_httpx_moves_its_pool(self):
+        def init(self, *args, **kwargs):
+            pass
+
+        with patch('httpx.AsyncHTTPTransport.__init__', init):
+            with pytest.raises(RuntimeError, match='_pool'):
+                http_client._PinnedTransport(httpx.Limits())
+
+
+class _RecordingBackend:
+    def __init__(self):
+        self.hosts = []
+
+    async def connect_tcp(self, host, port, **kwargs):
+        self.hosts.append(host)
+        return object()
+
+
+class TestResolver:
+    @pytest.mark.asyncio
+    async def test_caches_answers(self):
+        with patch('http_client.socket.getaddrinfo', return_value=_addrinfo('93.184.216.34')) as gai:
+            assert await http_client.resolve_public('a.com') == ['93.184.216.34']
+            assert await http_client.resolve_public('a.com') == ['93.184.216.34']
+        assert gai.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_lookup_failure_is_not_a_value_error(self):
+        with patch('http_client.socket.getaddrinfo', side_effect=socket.gaierror(-3, 'Try again')):
+            with pytest.raises(http_client.HostResolutionError) as exc:
+                await http_client.resolve_public('a.com')
+        assert not isinstance(exc.value, ValueError)
+
+    @pytest.mark.asyncio
+    async def test_rejects_any_private_answer(self):
+        with patch('http_client.socket.getaddrinfo', return_value=_addrinfo('93.184.216.34', '10.0.0.1')):
+            with pytest.raises(ValueError, match='private/internal'):
+                await http_client.resolve_public('a.com')
+
+    @pytest.mark.asyncio
+    async def test_connects_to_the_checked_address(self):
+        backend = http_client._PinnedBackend()
+        backend._backend = _RecordingBackend()
+        with patch('http_client.socket.getaddrinfo', return_value=_addrinfo('93.184.216.34')):
+            await http_client.resolve_public('a.com')
+        # A later answer can't change where the connection goes while cached.
+        with patch('http_client.socket.getaddrinfo', return_value=_addrinfo('127.0.0.1')):
+            await backend.connect_tcp('a.com', 443)
+        assert backend._backend.hosts == ['93.184.216.34']
+
+    @pytest.mark.asyncio
+    async def test_refuses_to_connect_to_private_hosts(self):
+        backend = http_client._PinnedBackend()
+        backend._backend = _RecordingBackend()
+        with patch('http_client.socket.getaddrinfo', return_value=_addrinfo('169.254.169.254')):
+            with pytest.raises(ValueError, match='private/internal'):
+                await backend.connect_tcp('metadata.internal', 80)
+        assert backend._backend.hosts == []
@@ -1,7 +1,18 @@
 import pytest
-from unittest.mock import patch, AsyncMock, MagicMock
-from importer import safe_fetch, import_youtube_video, check_import_limit
+from unittest.mock import patch, call, AsyncMock, MagicMock
+from importer import (
+    safe_fetch, import_youtube_video, import_recipe_url, check_import_limit, run_playlist_import,
+    _import_videos, RecipeNotFoundError,
+)
 from claude_extract import sanitize_recipe, _parse_json_response, extract_og_image
+import http_client
+
+
+@pytest.fixture(autouse=True)
+def _fresh_dns_cache():
+    http_client.clear_dns_cache()
+    yield
+    http_client.clear_dns_cache()
 
 
 class TestSafeFetch:
@@ -43,6 +54,62 @@ class TestSafeFetch:
             await safe_fetch('ftp://example.com/file')
 
 
+def _addrinfo(ips):
+    def resolve(host, port, *args, **kwargs):
+        return [(2, 1, 6, '', (ips[host], 0))]
+    return resolve
+
+
+class TestSafeFetchRedirects:
+    def _client(self, handler):
+        import httpx
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler), follow_redirects=False)
+
+    @pytest.mark.asyncio
+    async def test_follows_public_redirects_on_shared_client(self):
+        import httpx
+
+        def handler(request):
+            if request.url.host == 'a.com':
+                return httpx.Response(301, headers={'location': 'https://b.com/recipe'})
+            return httpx.Response(200, text='ok')
+
+        ips = {'a.com': '93.184.216.34', 'b.com': '93.184.216.35'}
+        with patch('importer.socket.getaddrinfo', side_effect=_addrinfo(ips)), \
+             patch('importer.http_client.get_client', return_value=self._client(handler)):
+            resp = await safe_fetch('https://a.com/r')
+        assert resp.text == 'ok'
+        assert str(resp.url) == 'https://b.com/recipe'
+
+    @pytest.mark.asyncio
+    async def test_blocks_redirect_to_private_address(self):
+        import httpx
+        requested = []
+
+        def handler(request):
+            requested.append(request.url.host)
+            return httpx.Response(302, headers={'location': 'http://internal.example/admin'})
+
+        ips = {'a.com': '93.184.216.34', 'internal.example': '10.0.0.5'}
+        with patch('importer.socket.getaddrinfo', side_effect=_addrinfo(ips)), \
+             patch('importer.http_client.get_client', return_value=self._client(handler)):
+            with pytest.raises(ValueError, match='private/internal'):
+                await safe_fetch('https://a.com/r')
+        assert requested == ['a.com']
+
+    @pytest.mark.asyncio
+    async def test_caps_redirect_chain(self):
+        import httpx
+
+        def handler(request):
+            return httpx.Response(302, headers={'location': 'https://a.com/again'})
+
+        with patch('importer.socket.getaddrinfo', side_effect=_addrinfo({'a.com': '93.184.216.34'})), \
+             patch('importer.http_client.get_client', return_value=self._client(handler)):
+            with pytest.raises(ValueError, match='Too many redirects'):
+                await safe_fetch('https://a.com/r')
+
+
 class TestImportYoutubeVideo:
     @pytest.mark.asyncio
     async def test_rejects_shorts(self):
@@ -74,6 +141,135 @@ class TestImportYoutubeVideo:
                     assert result['cached'] is True
                     assert result['recipe_name'] == 'Test Recipe'
 
+    @pytest.mark.asyncio
+    async def test_count_import_false_leaves_count_alone(self):
+        cached_recipe = {'id': 'test-id', 'recipe_name': 'Test Recipe', 'ingredients': []}
+        with patch('importer.db.get_recipe_by_canonical_url', return_value=cached_recipe), \
+             patch('importer.db.save_user_recipe') as save, \
+             patch('importer.db.increment_import_count') as increment:
+            await import_youtube_video('https://www.youtube.com/watch?v=abc123', user_id='user1',
+                                       count_import=False)
+        save.assert_called_once_with('user1', 'test-id')
+        increment.assert_not_called()
+
+
+class TestSingleFlight:
+    @pytest.mark.asyncio
+    async def test_concurrent_imports_share_one_extraction(self):
+        import asyncio
+        recipe = {'id': 'r1', 'recipe_name': 'Soup', 'ingredients': [{'name': 'salt'}]}
+
+        async def slow_extract(canonical, url):
+            await asyncio.sleep(0.05)
+            return recipe, 'direct'
+
+        with patch('importer.db.get_recipe_by_canonical_url', return_value=None), \
+             patch('importer._extract_recipe_url', side_effect=slow_extract) as extract, \
+             patch('importer.db.save_user_recipe') as save, \
+             patch('importer.db.increment_import_count'):
+            results = await asyncio.gather(
+                import_recipe_url('https://example.com/soup', user_id='u1'),
+                import_recipe_url('https://example.com/soup?utm_source=x', user_id='u2'),
+                import_recipe_url('https://example.com/soup', user_id='u3'),
+            )
+        assert extract.call_count == 1
+        assert {r['recipe_id'] for r in results} == {'r1'}
+        assert sorted(c.args[0] for c in save.call_args_list) == ['u1', 'u2', 'u3']
+
+    @pytest.mark.asyncio
+    async def test_failure_is_shared_then_retried(self):
+        import asyncio
+        outcomes = [RecipeNotFoundError('no recipe'), ({'id': 'r1', 'recipe_name': 'Soup'}, 'direct')]
+
+        async def flaky_extract(canonical, url):
+            await asyncio.sleep(0.05)
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        extract = AsyncMock(side_effect=flaky_extract)
+        with patch('importer.db.get_recipe_by_canonical_url', return_value=None), \
+             patch('importer._extract_recipe_url', extract):
+            results = await asyncio.gather(
+                import_recipe_url('https://example.com/soup'),
+                import_recipe_url('https://example.com/soup'),
+                return_exceptions=True,
+            )
+            assert all(isinstance(r, RecipeNotFoundError) for r in results)
+            assert (await import_recipe_url('https://example.com/soup'))['recipe_id'] == 'r1'
+        assert extract.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_rechecks_cache_inside_the_flight(self):
+        cached = {'id': 'r1', 'recipe_name': 'Soup', 'ingredients': []}
+        # Saved by a flight that finished between the lookup and joining.
+        with patch('importer.db.get_recipe_by_canonical_url', side_effect=[None, cached]), \
+             patch('importer._extract_recipe_url', AsyncMock()) as extract:
+            result = await import_recipe_url('https://example.com/soup')
+        extract.assert_not_called()
+        assert result['recipe_id'] == 'r1' and result['cached'] is True
+
+    @pytest.mark.asyncio
+    async def test_waits_for_another_workers_claim(self):
+        cached = {'id': 'r1', 'recipe_name': 'Soup', 'ingredients': []}
+        with patch('importer.IMPORT_SHARED_CLAIMS', True), \
+             patch('importer.IMPORT_CLAIM_POLL', 0), \
+             patch('importer.db.claim_import', return_value=False), \
+             patch('importer.db.get_recipe_by_canonical_url', side_effect=[None, None, cached]), \
+             patch('importer._extract_recipe_url', AsyncMock()) as extract:
+            result = await import_recipe_url('https://example.com/soup')
+        extract.assert_not_called()
+        assert result['recipe_id'] == 'r1' and result['cached'] is True
+
+
+class TestRunPlaylistImport:
+    @pytest.mark.asyncio
+    async def test_one_atomic_update_per_video(self):
+        urls = ['https://www.youtube.com/watch?v=a', 'https://www.youtube.com/watch?v=b']
+        importer_mock = AsyncMock(side_effect=[{}, RecipeNotFoundError('no recipe')])
+        with patch('importer.db.update_import_job') as update, \
+             patch('importer.import_youtube_video', importer_mock):
+            await _import_videos('job1', urls, user_id='u1')
+        assert update.call_args_list == [
+            call('job1', total_videos=2),
+            call('job1', succeeded_increment=True, processed_increment=True),
+            call('job1', failed_increment=True, processed_increment=True,
+                 error={'url': urls[1], 'reason': 'no recipe'}),
+            call('job1', finish=True),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_runs_videos_concurrently_and_reports_in_order(self):
+        import asyncio
+        urls = [f'https://www.youtube.com/watch?v={i}' for i in range(6)]
+        active, peak = 0, 0
+
+        async def fake_import(url, user_id=None):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            # Later videos finish first.
+            await asyncio.sleep(0.01 * (len(urls) - int(url[-1])))
+            active -= 1
+            if url.endswith(('1', '4')):
+                raise RecipeNotFoundError('no recipe')
+            return {}
+
+        with patch('importer.IMPORT_JOB_CONCURRENCY', 3), \
+             patch('importer.db.update_import_job') as update, \
+             patch('importer.import_youtube_video', side_effect=fake_import):
+            await _import_videos('job1', urls)
+        assert peak == 3
+        errors = [c.kwargs['error']['url'] for c in update.call_args_list if 'error' in c.kwargs]
+        assert errors == [urls[1], urls[4]]
+
+    @pytest.mark.asyncio
+    async def test_marks_job_failed_on_error(self):
+        with patch('importer.db.update_import_job', side_effect=[RuntimeError('down'), {}]) as update:
+            await run_playlist_import('job1', 'PL1', 'u1')
+        assert update.call_args.kwargs['status'] == 'failed'
+
 
 class TestCheckImportLimit:
     def test_pro_unlimited(self):
@@ -133,6 +329,16 @@ class TestSanitizeRecipe:
         assert '\x00' not in result['recipe_name']
         assert '\x01' not in result['recipe_name']
 
+    def test_parses_quantities(self):
+        data = {
+            'recipe_name': 'Test',
+            'ingredients': [{'name': 'flour', 'quantity': '1 1/2', 'unit': 'Cups'},
+                            {'name': 'salt', 'quantity': 'to taste', 'unit': ''}],
+        }
+        flour, salt = sanitize_recipe(data)['ingredients']
+        assert (flour['amount'], flour['canonical_unit'], flour['parsed']) == (1.5, 'cup', True)
+        assert salt['amount'] is None and salt['parsed'] is False
+
 
 class TestParseJsonResponse:
     def test_plain_json(self):
@@ -157,3 +363,29 @@ class TestExtractOgImage:
     def test_returns_none_when_missing(self):
         html = '<html><head><title>Test</title></head></html>'
         assert extract_og_image(html) is None
+
+
+class TestWithVocabIds:
+    def test_attaches_ids(self):
+        from importer import with_vocab_ids
+        from vocab import Vocabulary
+        vocab = Vocabulary()
+        row = {'ingredients': [{'name': 'Salt', 'normalized_name': 'salt'},
+                               {'name': 'Eggs', 'normalized_name': 'eggs'}],
+               'equipment': [{'name': 'Whisk'}]}
+        with patch('importer.get_vocabulary', return_value=vocab), \
+             patch('vocab.db.intern_vocab_terms',
+                   return_value={'salt': 1, 'eggs': 2, 'whisk': 3}) as intern:
+            result = with_vocab_ids(row)
+            assert result['ingredient_ids'] == [1, 2]
+            assert result['equipment_ids'] == [3]
+            with_vocab_ids(row)
+            assert intern.call_count == 1
+
+    def test_leaves_row_untouched_on_failure(self):
+        from importer import with_vocab_ids
+        from vocab import Vocabulary
+        row = {'ingredients': [{'name': 'salt'}], 'equipment': []}
+        with patch('importer.get_vocabulary', return_value=Vocabulary()), \
+             patch('vocab.db.intern_vocab_terms', side_effect=RuntimeError('down')):
+            assert with_vocab_ids(row) is row
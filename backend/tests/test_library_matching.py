@@ -0,0 +1,111 @@
+import pytest
+from unittest.mock import patch
+
+from library_matching import rank_library
+from matching import PantryIndex, compute_matches
+
+TERMS = {1: 'spaghetti', 2: 'eggs', 3: 'guanciale', 4: 'large pot', 5: 'food processor'}
+
+
+def _library_row(uid, names, equipment, ids, eq_ids, rating=None):
+    return {
+        'user_recipe_id': uid, 'recipe_id': f'r-{uid}', 'recipe_name': uid.title(),
+        'rating': rating,
+        'ingredients': [{'name': n.title(), 'normalized_name': n} for n in names],
+        'equipment': [{'name': e.title(), 'is_special': False} for e in equipment],
+        'ingredient_ids': ids, 'equipment_ids': eq_ids,
+    }
+
+
+LIBRARY = [
+    _library_row('carbonara', ['spaghetti', 'eggs', 'guanciale'], ['large pot'], [1, 2, 3], [4]),
+    _library_row('pesto', ['spaghetti'], ['food processor'], [1], [5], rating=5),
+    _library_row('frittata', ['eggs'], [], [2], []),
+]
+
+
+def _counts(term_ids, rows=LIBRARY, indexed=True):
+    return [{
+        'user_recipe_id': r['user_recipe_id'], 'recipe_id': r['recipe_id'],
+        'recipe_name': r['recipe_name'], 'rating': r['rating'],
+        'matched': sum(1 for i in r['ingredient_ids'] if i in term_ids),
+        'total': len(r['ingredients']), 'equipment_ids': r['equipment_ids'],
+        'max_term_id': max(r['ingredient_ids'] + r['equipment_ids']),
+        'indexed': indexed,
+    } for r in rows]
+
+
+def _match_vocab_terms(items, tokens, after_id=0):
+    index = PantryIndex(items)
+    return [vid for vid, name in TERMS.items() if vid > after_id and index.matches(name)], max(TERMS)
+
+
+@pytest.fixture
+def vocab():
+    with patch('vocab.db.match_vocab_terms', side_effect=_match_vocab_terms) as rpc:
+        yield rpc
+
+
+def _by_id(ids):
+    return [r for r in LIBRARY if r['user_recipe_id'] in ids]
+
+
+class TestRankLibrary:
+    PANTRY = ['spaghetti', 'egg']
+    TOOLS = ['pot']
+
+    def _rank(self, **kwargs):
+        return rank_library('u1', PantryIndex(self.PANTRY), PantryIndex(self.TOOLS), **kwargs)
+
+    def test_db_counts_match_python_engine(self, vocab):
+        with patch('library_matching.db.match_library_counts',
+                   side_effect=lambda u, ids, c, require_match: _counts(set(ids))), \
+             patch('library_matching.db.get_user_recipes_by_ids', side_effect=_by_id):
+            page, total = self._rank(only_my_tools=True)
+        expected = compute_matches(self.PANTRY, self.TOOLS, LIBRARY, only_my_tools=True)
+        assert page == expected
+        assert total == 2
+
+    def test_fetches_only_page_rows(self, vocab):
+        with patch('library_matching.db.match_library_counts',
+                   side_effect=lambda u, ids, c, require_match: _counts(set(ids))), \
+             patch('library_matching.db.get_user_recipes_by_ids', side_effect=_by_id) as fetch:
+            page, total = self._rank(limit=1, sort='rating')
+        assert [m['recipe_name'] for m in page] == ['Pesto']
+        assert total == 3
+        assert fetch.call_args_list[-1].args[0] == ['pesto']
+
+    def test_unindexed_rows_scored_from_full_row(self, vocab):
+        with patch('library_matching.db.match_library_counts',
+                   return_value=_counts(set(), indexed=False)), \
+             patch('library_matching.db.get_user_recipes_by_ids', side_effect=_by_id):
+            page, _ = self._rank()
+        assert page == compute_matches(self.PANTRY, self.TOOLS, LIBRARY)
+
+    def test_falls_back_to_python_when_rpc_fails(self, vocab):
+        with patch('library_matching.db.match_library_counts', side_effect=RuntimeError('no rpc')), \
+             patch('library_matching.db.get_user_recipes', return_value=LIBRARY):
+            page, total = self._rank(channel_id=None)
+        assert page == compute_matches(self.PANTRY, self.TOOLS, LIBRARY)
+        assert total == 3
+
+    def test_sends_resolved_pantry_ids(self, vocab):
+        with patch('library_matching.db.match_library_counts', return_value=[]) as counts:
+            self._rank()
+        assert counts.call_args.args[1] == [1, 2]
+
+    def test_re_resolves_when_rows_reference_newer_terms(self, vocab):
+        rows = _counts({1, 2})
+        rows[0]['max_term_id'] = 9
+        with patch('library_matching.db.match_library_counts', return_value=rows), \
+             patch('library_matching.db.get_user_recipes_by_ids', side_effect=_by_id):
+            self._rank()
+        assert [c.kwargs['after_id'] for c in vocab.call_args_list] == [0, 0, 5, 5]
+
+    def test_refetches_counts_only_for_new_pantry_matches(self, vocab):
+        rows = _counts({1, 2})
+        rows[0]['max_term_id'] = 9
+        with patch('library_matching.db.match_library_counts', return_value=rows) as counts, \
+             patch('library_matching.db.get_user_recipes_by_ids', side_effect=_by_id):
+            self._rank()
+        assert counts.call_count == 1
@@ -0,0 +1,110 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi.testclient import TestClient
+
+import db
+import main
+
+RECIPE = {'id': 'r1', 'servings': '4', 'ingredients': [
+    {'name': 'Flour', 'quantity': '2', 'unit': 'cups', 'amount': 2.0, 'canonical_unit': 'cup'},
+]}
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+class TestGetRecipes:
+    def test_rejects_cursor_with_search(self, client):
+        page = AsyncMock()
+        with patch('main.adb.get_recipes_page', page):
+            r = client.get('/api/recipes', params={'search': 'soup', 'cursor': 'abc'})
+        assert r.status_code == 400
+        page.assert_not_called()
+
+    def test_invalid_cursor(self, client):
+        r = client.get('/api/recipes', params={'cursor': db.encode_keyset('2024-01-01', 'x')})
+        assert r.status_code == 400
+        assert r.json() == {'error': 'Invalid cursor'}
+
+    def test_summary_search_pages_by_offset(self, client):
+        search = AsyncMock(return_value=([], 0, False))
+        with patch('main.adb.search_recipes', search):
+            r = client.get('/api/recipes', params={'search': 'soup', 'summary': True, 'offset': 50})
+        assert r.json() == {'recipes': [], 'total': 0, 'total_estimated': False}
+        assert search.call_args.kwargs['offset'] == 50
+        assert search.call_args.kwargs['summary'] is True
+
+    def test_summary_offset_is_honoured(self, client):
+        search = AsyncMock(return_value=([], 0, False))
+        page = AsyncMock()
+        with patch('main.adb.search_recipes', search), patch('main.adb.get_recipes_page', page):
+            client.get('/api/recipes', params={'summary': True, 'offset': 50})
+        page.assert_not_called()
+        assert search.call_args.kwargs['offset'] == 50
+
+    @pytest.mark.parametrize('summary', [False, True])
+    def test_summary_keeps_the_envelope(self, client, summary):
+        search = AsyncMock(return_value=([], 0, False))
+        page = AsyncMock(return_value=([], None))
+        with patch('main.adb.search_recipes', search), patch('main.adb.get_recipes_page', page):
+            listing = client.get('/api/recipes', params={'summary': summary}).json()
+            keyset = client.get('/api/recipes', params={'summary': summary, 'cursor': ''}).json()
+        assert listing == {'recipes': [], 'total': 0, 'total_estimated': False}
+        assert keyset == {'recipes': [], 'next_cursor': None}
+        assert page.call_args.kwargs['summary'] is summary
+
+
+class TestGetRecipe:
+    @pytest.mark.parametrize('servings', ['-2', '0'])
+    def test_rejects_non_positive_servings(self, client, servings):
+        with patch('main.adb.get_recipe_by_id', AsyncMock(return_value=RECIPE)):
+            r = client.get(f'/api/recipes/r1?servings={servings}')
+        assert r.status_code == 422
+
+    def test_scales_to_servings(self, client):
+        with patch('main.adb.get_recipe_by_id', AsyncMock(return_value=RECIPE)):
+            r = client.get('/api/recipes/r1?servings=2')
+        assert r.json()['servings'] == '2'
+        assert r.json()['ingredients'][0]['quantity'] == '1'
+
+
+def _user_recipe(i):
+    return {'id': f'00000000-0000-0000-0000-00000000000{i}', 'recipe_id': f'r{i}',
+            'added_at': f'2024-01-0{i}T00:00:00+00:00', 'recipes': {'id': f'r{i}', 'recipe_name': f'R{i}'}}
+
+
+class TestCollectionPage:
+    def _client(self, first, second):
+        client = MagicMock()
+        query = client.table.return_value.select.return_value.eq.return_value \
+            .order.return_value.order.return_value
+        query.limit.return_value.execute.return_value.data = first
+        query.or_.return_value.limit.return_value.execute.return_value.data = second
+        return client, query
+
+    def test_cursor_round_trip(self, client):
+        db_client, query = self._client([_user_recipe(i) for i in (5, 4, 3)],
+                                        [_user_recipe(i) for i in (3, 2)])
+        with patch('db.get_client', return_value=db_client):
+            first = client.get('/api/user/u1/collections/all_recipes/recipes?limit=2').json()
+            second = client.get('/api/user/u1/collections/all_recipes/recipes',
+                                params={'limit': 2, 'cursor': first['next_cursor']}).json()
+        assert [r['recipe_name'] for r in first['recipes']] == ['R5', 'R4']
+        assert db.decode_keyset(first['next_cursor']) == (
+            '2024-01-04T00:00:00+00:00', '00000000-0000-0000-0000-000000000004')
+        assert 'id.lt.00000000-0000-0000-0000-000000000004' in query.or_.call_args[0][0]
+        assert [r['recipe_name'] for r in second['recipes']] == ['R3', 'R2']
+        assert second['next_cursor'] is None
+
+    def test_limit_is_clamped(self, client):
+        page = AsyncMock(return_value=([], None))
+        with patch('main.adb.get_collection_recipes_page', page):
+            client.get('/api/user/u1/collections/c1/recipes?limit=1000')
+        assert page.call_args.kwargs['limit'] == 200
+
+    def test_invalid_cursor(self, client):
+        r = client.get('/api/user/u1/collections/c1/recipes?cursor=garbage')
+        assert r.status_code == 400
+        assert r.json() == {'error': 'Invalid cursor'}
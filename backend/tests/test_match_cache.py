@@ -0,0 +1,75 @@
+import pytest
+from unittest.mock import patch, MagicMock
+import match_cache
+
+V1 = {'pantry_version': 1, 'library_version': 1, 'catalog_version': '2025-01-01T00:00:00+00:00'}
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    match_cache.clear()
+    yield
+    match_cache.clear()
+
+
+class TestResultCache:
+    def test_hit_after_put(self):
+        key = match_cache.result_key('u1', V1, False, None)
+        assert match_cache.get_result(key) is None
+        match_cache.put_result(key, [{'recipe_id': 'r1'}])
+        assert match_cache.get_result(key) == [{'recipe_id': 'r1'}]
+        stats = match_cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+
+    @pytest.mark.parametrize('field, value', [
+        ('pantry_version', 2), ('library_version', 2),
+        ('catalog_version', '2025-01-02T00:00:00+00:00'),
+    ])
+    def test_any_version_change_misses(self, field, value):
+        match_cache.put_result(match_cache.result_key('u1', V1, False, None), [])
+        key = match_cache.result_key('u1', {**V1, field: value}, False, None)
+        assert match_cache.get_result(key) is None
+
+    def test_key_includes_user_and_filters(self):
+        key = match_cache.result_key('u1', V1, False, None)
+        assert key != match_cache.result_key('u2', V1, False, None)
+        assert key != match_cache.result_key('u1', V1, True, None)
+        assert key != match_cache.result_key('u1', V1, False, 'UC1')
+
+
+class TestPantryIndexes:
+    def test_built_once_per_pantry_version(self):
+        calls = []
+
+        def load():
+            calls.append(1)
+            return ['salt'], ['whisk']
+
+        pantry_index, tools_index = match_cache.get_pantry_indexes('u1', 1, load)
+        match_cache.get_pantry_indexes('u1', 1, load)
+        assert len(calls) == 1
+        assert pantry_index.matches('sea salt')
+        assert tools_index.matches('whisk')
+
+        match_cache.get_pantry_indexes('u1', 2, load)
+        assert len(calls) == 2
+
+
+class TestDbVersions:
+    def test_reads_versions_rpc(self):
+        client = MagicMock()
+        client.rpc.return_value.execute.return_value.data = [V1]
+        with patch('db.get_client', return_value=client):
+            import db
+            assert db.get_match_versions('u1') == V1
+        client.rpc.assert_called_once_with('get_match_versions', {'p_user_id': 'u1'})
+
+    def test_pantry_delete_is_scoped_to_owner(self):
+        client = MagicMock()
+        with patch('db.get_client', return_value=client):
+            import db
+            db.remove_pantry_item('u1', 'item-1')
+        delete = client.table.return_value.delete.return_value
+        delete.eq.assert_called_once_with('user_id', 'u1')
+        delete.eq.return_value.eq.assert_called_once_with('id', 'item-1')
@@ -1,5 +1,8 @@
 import pytest
-from matching import compute_match, compute_matches, generate_shopping_list
+from matching import (
+    compute_match, compute_matches, generate_shopping_list, rank_matches,
+    encode_cursor, decode_cursor, PantryIndex, _ingredient_matches,
+)
 
 
 RECIPE = {
@@ -36,6 +39,16 @@ class TestComputeMatch:
         assert result['total'] == 5
         assert result['missing_ingredients'] == []
 
+    def test_reuses_the_index_for_the_same_pantry(self):
+        from unittest.mock import patch
+        import matching
+        pantry = ['spaghetti', 'eggs']
+        matching._cached_index.cache_clear()
+        with patch('matching.PantryIndex', wraps=matching.PantryIndex) as build:
+            first = compute_match(pantry, [], RECIPE)
+            assert compute_match(list(pantry), [], RECIPE) == first
+        assert build.call_count == 2  # pantry and tools, once each
+
     def test_partial_match(self):
         pantry = ['spaghetti', 'eggs', 'black pepper']
         result = compute_match(pantry, [], RECIPE)
@@ -83,6 +96,36 @@ class TestComputeMatch:
         assert result is not None
 
 
+class TestPantryIndex:
+    PANTRY = ['Chicken', 'parmesan cheese', ' olive oil ', 'egg', 'red pepper flakes', 'salt']
+    NAMES = [
+        'chicken thighs', 'parmesan', 'oil', 'eggs', 'pepper', 'sea salt',
+        'flakes', 'olive', 'garlic', 'egg yolk', 'cheese', 'red', 'ginger', '',
+        'extra virgin olive oil', 'hen', 'parm',
+    ]
+
+    def test_parity_with_pairwise_matching(self):
+        index = PantryIndex(self.PANTRY)
+        for name in self.NAMES:
+            expected = any(_ingredient_matches(p, name) for p in self.PANTRY)
+            assert index.matches(name) == expected, name
+
+    def test_empty_pantry_matches_nothing(self):
+        index = PantryIndex([])
+        assert not index.matches('')
+        assert not index.matches('salt')
+
+    def test_blank_pantry_item_matches_everything(self):
+        index = PantryIndex(['  '])
+        assert index.matches('truffle')
+
+    def test_repeated_lookups_are_stable(self):
+        index = PantryIndex(['butter'])
+        assert index.matches('Unsalted Butter')
+        assert index.matches('unsalted butter')
+        assert not index.matches('margarine')
+
+
 class TestComputeMatches:
     def test_sorted_by_coverage(self):
         r1 = {**RECIPE, 'id': 'r1', 'recipe_name': 'Full Match',
@@ -120,3 +163,172 @@ class TestGenerateShoppingList:
         dairy = [c for c in result if c['category'] == 'dairy'][0]
         assert len(dairy['ingredients']) == 1
         assert len(dairy['ingredients'][0]['recipe_names']) == 2
+
+    def test_sums_same_unit(self):
+        r1 = {'recipe_name': 'A', 'ingredients': [
+            {'name': 'Butter', 'normalized_name': 'butter', 'quantity': '1 1/2', 'unit': 'tbsp', 'category': 'dairy'},
+        ]}
+        r2 = {'recipe_name': 'B', 'ingredients': [
+            {'name': 'Butter', 'normalized_name': 'butter', 'quantity': '2', 'unit': 'Tbsp.', 'category': 'dairy'},
+        ]}
+        item = generate_shopping_list([], [r1, r2])[0]['ingredients'][0]
+        assert (item['quantity'], item['unit']) == ('3.5', 'tbsp')
+
+    def test_keeps_incompatible_amounts(self):
+        recipes = [{'recipe_name': n, 'ingredients': [
+            {'name': 'Flour', 'normalized_name': 'flour', 'quantity': q, 'unit': u, 'category': 'pantry'},
+        ]} for n, q, u in [('A', '2', 'cups'), ('B', '100', 'g'), ('C', 'a handful', ''), ('D', '', '')]]
+        item = generate_shopping_list([], recipes)[0]['ingredients'][0]
+        assert item['amounts'] == [
+            {'quantity': '2', 'unit': 'cup'},
+            {'quantity': '100', 'unit': 'g'},
+            {'quantity': 'a handful', 'unit': ''},
+        ]
+        assert item['quantity'] == '2 cup + 100 g + a handful'
+        assert len(item['recipe_names']) == 4
+
+    def test_does_not_sum_partly_parsed_quantities(self):
+        recipes = [{'recipe_name': n, 'ingredients': [
+            {'name': 'Tomatoes', 'normalized_name': 'tomatoes', 'quantity': q, 'unit': 'can',
+             'category': 'pantry'},
+        ]} for n, q in [('A', '1 (14 oz)'), ('B', '1 (28 oz)')]]
+        item = generate_shopping_list([], recipes)[0]['ingredients'][0]
+        assert item['amounts'] == [
+            {'quantity': '1 (14 oz) can', 'unit': ''},
+            {'quantity': '1 (28 oz) can', 'unit': ''},
+        ]
+
+    def test_uses_precomputed_amounts_and_ranges(self):
+        recipes = [{'recipe_name': n, 'ingredients': [
+            {'name': 'Garlic', 'normalized_name': 'garlic', 'quantity': q, 'unit': 'cloves',
+             'amount': low, 'amount_max': high, 'canonical_unit': 'clove', 'parsed': True,
+             'category': 'produce'},
+        ]} for n, q, low, high in [('A', '2-3', 2.0, 3.0), ('B', '2', 2.0, None)]]
+        item = generate_shopping_list([], recipes)[0]['ingredients'][0]
+        assert (item['quantity'], item['unit']) == ('4-5', 'clove')
+
+
+class TestVocabularyIds:
+    def test_id_path_matches_string_path(self):
+        recipe = {**RECIPE,
+                  'ingredient_ids': [1, 2, 3, 4, 5],
+                  'equipment_ids': [6, 7]}
+        pantry = ['spaghetti', 'eggs', 'pepper']
+        assert compute_match(pantry, ['pot'], recipe) == compute_match(pantry, ['pot'], RECIPE)
+
+    def test_misaligned_ids_fall_back_to_names(self):
+        recipe = {**RECIPE, 'ingredient_ids': [1, 2]}
+        result = compute_match(['spaghetti'], [], recipe)
+        assert result['matched'] == 1
+
+    def test_ids_shared_across_recipes(self):
+        r1 = {**RECIPE, 'id': 'r1', 'ingredients': [{'name': 'Salt', 'normalized_name': 'salt'}],
+              'ingredient_ids': [10]}
+        r2 = {**RECIPE, 'id': 'r2', 'ingredients': [{'name': 'salt', 'normalized_name': 'salt'}],
+              'ingredient_ids': [10]}
+        matches = compute_matches(['sea salt'], [], [r1, r2])
+        assert [m['matched'] for m in matches] == [1, 1]
+
+
+    def test_resolved_ids_answer_by_membership(self):
+        index = PantryIndex(['sea salt'])
+        index.add_resolved_ids({10}, through=20)
+        assert index.matches_id(10, 'anything')
+        assert not index.matches_id(11, 'salt')
+        # Past the resolved range the name decides.
+        assert index.matches_id(21, 'salt')
+        assert not index.matches_id(21)
+
+    def test_ids_past_the_settled_watermark(self):
+        # Seen but not yet settled: matched now, and scanned again next time.
+        index = PantryIndex(['salt'])
+        assert index.add_resolved_ids({10, 25}, through=20)
+        assert index.matches_id(25)
+        assert not index.add_resolved_ids({25}, through=30)
+
+    def test_resolve_ids_picks_up_after_last_term_seen(self):
+        from unittest.mock import patch
+        from vocab import resolve_ids
+        index = PantryIndex(['sea salt'])
+        with patch('vocab.db.match_vocab_terms', side_effect=[([1], 5), ([7], 9)]) as rpc:
+            resolve_ids(index)
+            resolve_ids(index)
+        assert rpc.call_args_list[0].args == (['sea salt'], ['salt', 'sea'])
+        assert rpc.call_args_list[1].kwargs == {'after_id': 5}
+        assert (index.matched_ids, index.ids_through) == ({1, 7}, 9)
+
+    def test_empty_pantry_resolves_without_a_query(self):
+        from unittest.mock import patch
+        from vocab import resolve_ids
+        index = PantryIndex([])
+        with patch('vocab.db.match_vocab_terms') as rpc:
+            resolve_ids(index)
+        assert not rpc.called
+        assert not index.matches_id(123456)
+
+
+def _synthetic_library(n, seed=7):
+    import random
+    rng = random.Random(seed)
+    words = ['chicken', 'thighs', 'olive', 'oil', 'salt', 'egg', 'eggs', 'garlic',
+             'pepper', 'red', 'flakes', 'butter', 'flour', 'sugar', 'milk', 'parmesan']
+    tools = ['large pot', 'food processor', 'whisk', 'stand mixer', 'skillet']
+    recipes = []
+    for i in range(n):
+        ings = [' '.join(rng.sample(words, rng.randint(1, 2))) for _ in range(rng.randint(0, 8))]
+        recipes.append({
+            **RECIPE, 'id': f'r{i}', 'recipe_name': f'Recipe {i}',
+            'ingredients': [{'name': s.title(), 'normalized_name': s} for s in ings],
+            'equipment': [{'name': t.title(), 'is_special': False}
+                          for t in rng.sample(tools, rng.randint(0, 3))],
+        })
+    return recipes
+
+
+class TestRankMatches:
+    PANTRY = ['chicken', 'egg', 'olive oil', 'salt']
+
+    def _rank(self, recipes, **kwargs):
+        return rank_matches(PantryIndex(self.PANTRY), PantryIndex(['skillet']), recipes, **kwargs)
+
+    def test_pages_concatenate_to_full_ranking(self):
+        recipes = _synthetic_library(60)
+        full = compute_matches(self.PANTRY, ['skillet'], recipes)
+        pages = []
+        for offset in range(0, 60, 7):
+            page, total = self._rank(recipes, limit=7, offset=offset)
+            assert total == 60
+            pages.extend(page)
+        assert pages == full
+
+    def test_min_coverage_and_max_missing(self):
+        recipes = _synthetic_library(60)
+        page, total = self._rank(recipes, min_coverage=0.5, max_missing=2)
+        assert total == len(page)
+        assert all(m['coverage'] >= 0.5 for m in page)
+        assert all(m['total'] - m['matched'] <= 2 for m in page)
+
+    def test_sort_by_missing(self):
+        page, _ = self._rank(_synthetic_library(40), sort='missing')
+        missing = [len(m['missing_ingredients']) for m in page]
+        assert missing == sorted(missing)
+
+    def test_sort_by_rating(self):
+        recipes = [{**RECIPE, 'id': f'r{i}', 'rating': rating}
+                   for i, rating in enumerate([None, 5, 2])]
+        page, _ = self._rank(recipes, sort='rating')
+        assert [m['rating'] for m in page] == [5, 2, None]
+
+    def test_rejects_unknown_sort(self):
+        with pytest.raises(ValueError):
+            self._rank([], sort='spiciness')
+
+
+class TestCursor:
+    def test_round_trip(self):
+        assert decode_cursor(encode_cursor(40)) == 40
+        assert decode_cursor(None) == 0
+
+    def test_rejects_garbage(self):
+        with pytest.raises(ValueError, match='Invalid cursor'):
+            decode_cursor('not-a-cursor')
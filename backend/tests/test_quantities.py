@@ -0,0 +1,46 @@
+import pytest
+from quantities import parse_quantity, canonical_unit, scale_ingredients
+
+
+class TestParseQuantity:
+    @pytest.mark.parametrize('quantity,unit,expected', [
+        ('1 1/2', 'cups', (1.5, None, 'cup', True)),
+        ('2-3', 'tbsp.', (2.0, 3.0, 'tbsp', True)),
+        ('1 to 2', 'Teaspoons', (1.0, 2.0, 'tsp', True)),
+        ('½', 'cup', (0.5, None, 'cup', True)),
+        ('1½', '', (1.5, None, '', True)),
+        ('12 oz', '', (12.0, None, 'oz', True)),
+        (2, 'lb', (2.0, None, 'lb', True)),
+        ('a', 'pinch', (1.0, None, 'pinch', True)),
+        ('a handful', '', (1.0, None, 'handful', False)),
+        ('to taste', '', (None, None, '', False)),
+        ('1/0', 'cup', (None, None, 'cup', False)),
+        ('', '', (None, None, '', False)),
+    ])
+    def test_parses(self, quantity, unit, expected):
+        result = parse_quantity(quantity, unit)
+        assert (result['amount'], result['amount_max'],
+                result['canonical_unit'], result['parsed']) == expected
+
+    def test_case_sensitive_single_letters(self):
+        assert canonical_unit('t') == ('tsp', True)
+        assert canonical_unit('T') == ('tbsp', True)
+
+
+class TestScaleIngredients:
+    def test_scales_parsed_and_keeps_unparsed(self):
+        scaled = scale_ingredients([
+            {'name': 'flour', 'quantity': '1 1/2', 'unit': 'cups'},
+            {'name': 'eggs', 'quantity': '2-3', 'unit': ''},
+            {'name': 'salt', 'quantity': 'to taste', 'unit': ''},
+        ], 2)
+        assert [i['quantity'] for i in scaled] == ['3', '4-6', 'to taste']
+        assert scaled[0]['unit'] == 'cups'
+
+    def test_keeps_partly_parsed_quantities_as_written(self):
+        ingredients = [
+            {'name': 'tomatoes', 'quantity': '1 (14 oz)', 'unit': 'can'},
+            {'name': 'eggs', 'quantity': '2 large', 'unit': 'eggs'},
+        ]
+        scaled = scale_ingredients(ingredients, 2)
+        assert [(i['quantity'], i['unit']) for i in scaled] == [('1 (14 oz)', 'can'), ('2 large', 'eggs')]
@@ -0,0 +1,69 @@
+import json
+import pytest
+from unittest.mock import patch, MagicMock
+
+import db
+import recipe_cache
+
+RECIPE = {'id': 'r1', 'canonical_url': 'https://example.com/carbonara', 'recipe_name': 'Carbonara'}
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    recipe_cache.clear()
+    yield
+    recipe_cache.clear()
+
+
+def _client(rows):
+    client = MagicMock()
+    client.table.return_value.select.return_value.eq.return_value.execute.return_value.data = rows
+    client.table.return_value.select.return_value.in_.return_value.execute.return_value.data = rows
+    return client
+
+
+class TestRecipeCache:
+    def test_read_through_by_id_and_url(self):
+        client = _client([RECIPE])
+        with patch('db.get_client', return_value=client):
+            assert db.get_recipe_by_id('r1') == RECIPE
+            assert db.get_recipe_by_id('r1') == RECIPE
+            assert db.get_recipe_by_canonical_url(RECIPE['canonical_url']) == RECIPE
+        assert client.table.call_count == 1
+        stats = recipe_cache.stats()
+        assert (stats['hits'], stats['misses'], stats['size']) == (2, 1, 1)
+
+    def test_missing_rows_are_not_cached(self):
+        with patch('db.get_client', return_value=_client([])) as get_client:
+            assert db.get_recipe_by_canonical_url('https://example.com/new') is None
+            assert db.get_recipe_by_canonical_url('https://example.com/new') is None
+        assert get_client.call_count == 2
+
+    def test_batch_fetches_only_misses(self):
+        recipe_cache.put(RECIPE)
+        other = {'id': 'r2', 'recipe_name': 'Cacio e Pepe'}
+        client = _client([other])
+        with patch('db.get_client', return_value=client):
+            assert db.get_recipes_by_ids(['r2', 'r1']) == [other, RECIPE]
+        client.table.return_value.select.return_value.in_.assert_called_once_with('id', ['r2'])
+
+    def test_returns_copies(self):
+        recipe_cache.put(RECIPE)
+        recipe_cache.get('r1')['recipe_name'] = 'changed'
+        assert recipe_cache.get('r1')['recipe_name'] == 'Carbonara'
+
+    def test_shared_tier_hit_fills_local(self):
+        shared = MagicMock()
+        shared.get.return_value = json.dumps(RECIPE)
+        with patch('recipe_cache._get_shared', return_value=shared):
+            assert recipe_cache.get_by_url(RECIPE['canonical_url']) == RECIPE
+        shared.get.assert_called_once_with('recipe:url:' + RECIPE['canonical_url'])
+        assert recipe_cache.get('r1') == RECIPE
+        assert recipe_cache.stats()['shared_hits'] == 1
+
+    def test_shared_tier_errors_fall_back(self):
+        shared = MagicMock()
+        shared.get.side_effect = ConnectionError('down')
+        with patch('recipe_cache._get_shared', return_value=shared):
+            assert recipe_cache.get('r1') is None
+        assert recipe_cache.stats()['shared_errors'] == 1
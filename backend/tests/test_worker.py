@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+from unittest.mock import patch, AsyncMock
+
+import http_client
+import importer
+import worker
+from worker import Worker, retry_delay
+
+
+def _item(kind='video', attempts=1, **kwargs):
+    return {'id': 1, 'job_id': 'j1', 'kind': kind, 'url': 'https://www.youtube.com/watch?v=a',
+            'attempts': attempts, 'user_id': 'u1', 'source_type': 'playlist', 'source_id': 'PL1',
+            **kwargs}
+
+
+class TestRetryDelay:
+    def test_backs_off_exponentially_with_cap(self):
+        with patch('worker.random.uniform', return_value=1.0):
+            assert [retry_delay(n) for n in (1, 2, 3)] == [30, 60, 120]
+            assert retry_delay(20) == worker.RETRY_MAX
+
+
+class TestProcess:
+    @pytest.mark.asyncio
+    async def test_success_completes_item(self):
+        with patch('worker.importer.import_youtube_video', AsyncMock()) as imp, \
+             patch('worker.adb.complete_import_item', AsyncMock(return_value={'id': 'j1'})) as done:
+            await Worker('w1')._process(_item())
+        imp.assert_awaited_once_with('https://www.youtube.com/watch?v=a', user_id='u1',
+                                     count_import=False)
+        done.assert_awaited_once_with(1, 'w1', 'succeeded', error=None, retry_in=None,
+                                      count_user='u1')
+
+    @pytest.mark.asyncio
+    async def test_channel_videos_are_not_saved_to_a_library(self):
+        with patch('worker.importer.import_youtube_video', AsyncMock()) as imp, \
+             patch('worker.adb.complete_import_item', AsyncMock(return_value={'id': 'j1'})):
+            await Worker('w1')._process(_item(source_type='channel'))
+        assert imp.call_args.kwargs['user_id'] is None
+
+    @pytest.mark.asyncio
+    async def test_transient_error_is_retried_with_backoff(self):
+        with patch('worker.importer.import_youtube_video', AsyncMock(side_effect=RuntimeError('timeout'))), \
+             patch('worker.retry_delay', return_value=60), \
+             patch('worker.adb.complete_import_item', AsyncMock(return_value={'id': 'j1'})) as done:
+            await Worker('w1')._process(_item(attempts=2))
+        assert done.call_args.kwargs['retry_in'] == 60
+        assert done.call_args.kwargs['error']['reason'] == 'timeout'
+        assert done.call_args.kwargs['count_user'] is None
+
+    @pytest.mark.asyncio
+    async def test_permanent_error_fails_immediately(self):
+        with patch('worker.importer.import_youtube_video', AsyncMock(side_effect=importer.RecipeNotFoundError('no recipe'))), \
+             patch('worker.adb.complete_import_item', AsyncMock(return_value={'id': 'j1'})) as done:
+            await Worker('w1')._process(_item())
+        assert done.call_args.args[2] == 'failed'
+        assert done.call_args.kwargs['retry_in'] is None
+
+    @pytest.mark.asyncio
+    async def test_dns_failure_is_retried(self):
+        error = http_client.HostResolutionError('Could not resolve hostname: www.youtube.com')
+        with patch('worker.importer.import_youtube_video', AsyncMock(side_effect=error)), \
+             patch('worker.retry_delay', return_value=30), \
+             patch('worker.adb.complete_import_item', AsyncMock(return_value={'id': 'j1'})) as done:
+            await Worker('w1')._process(_item())
+        assert done.call_args.kwargs['retry_in'] == 30
+
+    @pytest.mark.asyncio
+    async def test_stops_retrying_after_max_attempts(self):
+        with patch('worker.importer.import_youtube_video', AsyncMock(side_effect=RuntimeError('timeout'))), \
+             patch('worker.adb.complete_import_item', AsyncMock(return_value={'id': 'j1'})) as done:
+            await Worker('w1')._process(_item(attempts=worker.MAX_ATTEMPTS))
+        assert done.call_args.kwargs['retry_in'] is None
+
+    @pytest.mark.asyncio
+    async def test_expand_enqueues_job_videos(self):
+        urls = ['https://www.youtube.com/watch?v=a', 'https://www.youtube.com/watch?v=b']
+        with patch('worker.importer.list_job_videos', AsyncMock(return_value=urls)), \
+             patch('worker.adb.enqueue_import_videos', AsyncMock()) as enqueue, \
+             patch('worker.adb.complete_import_item', AsyncMock(return_value={'id': 'j1'})) as done:
+            await Worker('w1')._process(_item(kind='expand', url=None))
+        enqueue.assert_awaited_once_with('j1', urls)
+        assert done.call_args.args[2] == 'succeeded'
+
+
+class TestRun:
+    @pytest.mark.asyncio
+    async def test_leases_only_free_slots_and_drains_on_stop(self):
+        release = asyncio.Event()
+
+        async def slow_import(url, user_id=None, count_import=True):
+            await release.wait()
+
+        w = Worker('w1', slots=2)
+        lease = AsyncMock(return_value=[_item(), {**_item(), 'id': 2}])
+        with patch('worker.adb.lease_import_items', lease), \
+             patch('worker.importer.import_youtube_video', side_effect=slow_import), \
+             patch('worker.adb.complete_import_item', AsyncMock(return_value={'id': 'j1'})) as done:
+            assert await w.run_once() == 2
+            assert await w.run_once() == 0
+            lease.assert_awaited_once_with('w1', 2, worker.LEASE_SECONDS)
+            w.stop()
+            release.set()
+            await w.run()
+        assert done.await_count == 2
@@ -0,0 +1,62 @@
+import sys
+import threading
+
+from cachetools import LRUCache
+
+import db
+from matching import PantryIndex
+
+VOCAB_CACHE_SIZE = 50000
+
+
+class Vocabulary:
+    """Interns normalized ingredient/equipment names as ingredient_vocab ids.
+
+    Ids of recently seen names are kept in a bounded LRU; the rest are
+    interned in the database in one round trip per call.
+    """
+
+    def __init__(self, cache_size: int = VOCAB_CACHE_SIZE):
+        self._ids = LRUCache(maxsize=cache_size)
+        self._lock = threading.Lock()
+
+    def id_for(self, name: str) -> int | None:
+        with self._lock:
+            return self._ids.get(name)
+
+    def intern(self, names: list[str]) -> list[int]:
+        with self._lock:
+            known = {n: self._ids.get(n) for n in set(names)}
+        unknown = [n for n, vid in known.items() if vid is None]
+        if unknown:
+            interned = db.intern_vocab_terms(unknown)
+            known.update(interned)
+            with self._lock:
+                self._ids.update(interned)
+        return [known[n] for n in names]
+
+
+def resolve_ids(index: PantryIndex) -> bool:
+    """Add the vocabulary terms index matches, among those it hasn't seen yet.
+
+    Matching runs in the database (match_vocab_terms) against its token and
+    trigram indexes, so the cost follows the pantry, not the vocabulary.
+    Returns whether any new term matched.
+    """
+    if not index.items:
+        # Nothing to match, now or after any number of new terms.
+        index.add_resolved_ids(set(), sys.maxsize)
+        return False
+    term_ids, through = db.match_vocab_terms(index.items, sorted(index.tokens),
+                                             after_id=index.ids_through)
+    return index.add_resolved_ids(set(term_ids), through)
+
+
+_vocabulary: Vocabulary | None = None
+
+
+def get_vocabulary() -> Vocabulary:
+    global _vocabulary
+    if _vocabulary is None:
+        _vocabulary = Vocabulary()
+    return _vocabulary
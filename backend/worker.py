@@ -0,0 +1,157 @@
+"""
+Import queue worker. Leases items from import_job_items (one 'expand' item per
+channel/playlist job, then one item per video), runs them and reports back.
+Leases are kept alive by heartbeats; an item whose worker dies is picked up
+again once its lease expires. Run as many workers as you need.
+Run: python worker.py
+"""
+import asyncio
+import logging
+import os
+import random
+import signal
+import socket
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import adb
+import http_client
+import importer
+
+logger = logging.getLogger(__name__)
+
+WORKER_ID = os.environ.get('WORKER_ID') or f'{socket.gethostname()}:{os.getpid()}'
+WORKER_CONCURRENCY = int(os.environ.get('WORKER_CONCURRENCY', str(importer.IMPORT_CONCURRENCY)))
+LEASE_SECONDS = int(os.environ.get('WORKER_LEASE_SECONDS', '120'))
+HEARTBEAT_INTERVAL = float(os.environ.get('WORKER_HEARTBEAT_INTERVAL', '30'))
+POLL_INTERVAL = float(os.environ.get('WORKER_POLL_INTERVAL', '2'))
+DRAIN_SECONDS = float(os.environ.get('WORKER_DRAIN_SECONDS', '25'))
+MAX_ATTEMPTS = int(os.environ.get('IMPORT_MAX_ATTEMPTS', '5'))
+RETRY_BASE = 30
+RETRY_MAX = 3600
+
+# Bad links and videos without a recipe fail the same way on every attempt.
+# A host that doesn't resolve raises http_client.HostResolutionError, which is
+# retried like any other network error.
+PERMANENT_ERRORS = (ValueError, importer.RecipeNotFoundError)
+
+
+def retry_delay(attempts: int) -> int:
+    """Exponential backoff with jitter, in seconds, after the given attempt."""
+    delay = min(RETRY_MAX, RETRY_BASE * 2 ** (attempts - 1))
+    return int(delay * random.uniform(0.5, 1.0))
+
+
+class Worker:
+    def __init__(self, worker_id: str = WORKER_ID, slots: int = WORKER_CONCURRENCY):
+        self.worker_id = worker_id
+        self.slots = slots
+        self._running: dict[int, asyncio.Task] = {}
+        self._stopping = asyncio.Event()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def run(self) -> None:
+        heartbeat = asyncio.create_task(self._heartbeat())
+        try:
+            while not self._stopping.is_set():
+                try:
+                    leased = await self.run_once()
+                except Exception as e:
+                    logger.warning(f'Failed to lease import items: {e}')
+                    leased = 0
+                if not leased:
+                    try:
+                        await asyncio.wait_for(self._stopping.wait(), POLL_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+            await self._drain()
+        finally:
+            heartbeat.cancel()
+
+    async def run_once(self) -> int:
+        """Lease items for the free slots and start them; returns how many."""
+        free = self.slots - len(self._running)
+        if free <= 0:
+            return 0
+        items = await adb.lease_import_items(self.worker_id, free, LEASE_SECONDS)
+        for item in items:
+            task = asyncio.create_task(self._process(item))
+            self._running[item['id']] = task
+            task.add_done_callback(lambda _, item_id=item['id']: self._running.pop(item_id, None))
+        return len(items)
+
+    async def _drain(self) -> None:
+        if not self._running:
+            return
+        logger.info(f'Draining {len(self._running)} import items')
+        _, pending = await asyncio.wait(list(self._running.values()), timeout=DRAIN_SECONDS)
+        # Unfinished items are retried by another worker when their lease expires.
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            try:
+                await adb.heartbeat_import_items(self.worker_id, list(self._running), LEASE_SECONDS)
+            except Exception as e:
+                logger.warning(f'Import lease heartbeat failed: {e}')
+
+    async def _process(self, item: dict) -> None:
+        if item['attempts'] > MAX_ATTEMPTS:
+            # Leased again after its worker died mid-run too many times.
+            await self._complete(item, 'failed', self._error(item, 'Gave up after repeated attempts'))
+            return
+        user_id = None
+        try:
+            if item['kind'] == 'expand':
+                video_urls = await importer.list_job_videos(item['source_type'], item['source_id'])
+                await adb.enqueue_import_videos(item['job_id'], video_urls)
+            else:
+                user_id = importer.job_import_user(item['source_type'], item['user_id'])
+                # Counted by complete_import_item, once per item however often it runs.
+                await importer.import_youtube_video(item['url'], user_id=user_id, count_import=False)
+        except Exception as e:
+            retry = not isinstance(e, PERMANENT_ERRORS) and item['attempts'] < MAX_ATTEMPTS
+            await self._complete(item, 'failed', self._error(item, str(e)),
+                                 retry_in=retry_delay(item['attempts']) if retry else None)
+        else:
+            await self._complete(item, 'succeeded', count_user=user_id)
+
+    @staticmethod
+    def _error(item: dict, reason: str) -> dict:
+        return {'url': item['url'] if item['kind'] == 'video' else 'job_level', 'reason': reason}
+
+    async def _complete(self, item: dict, status: str, error: dict = None, retry_in: int = None,
+                        count_user: str = None) -> None:
+        try:
+            job = await adb.complete_import_item(item['id'], self.worker_id, status,
+                                                 error=error, retry_in=retry_in,
+                                                 count_user=count_user)
+        except Exception as e:
+            # The lease runs out and the item is retried.
+            logger.warning(f"Failed to record import item {item['id']}: {e}")
+            return
+        if job is None:
+            logger.warning(f"Lost the lease on import item {item['id']}")
+
+
+async def main():
+    logging.basicConfig(level=logging.INFO)
+    worker = Worker()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.stop)
+    logger.info(f'Import worker {worker.worker_id} started with {worker.slots} slots')
+    try:
+        await worker.run()
+    finally:
+        await http_client.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
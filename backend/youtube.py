@@ -1,7 +1,7 @@
 import json
 import re
-import httpx
 from youtube_transcript_api import YouTubeTranscriptApi
+import http_client
 from url_utils import extract_video_id
 
 
@@ -10,8 +10,7 @@ async def fetch_video_page(video_id: str, safe_fetch_fn=None) -> str:
     if safe_fetch_fn:
         resp = await safe_fetch_fn(url)
     else:
-        async with httpx.AsyncClient(timeout=15) as client:
-            resp = await client.get(url, follow_redirects=True)
+        resp = await http_client.get_client().get(url, follow_redirects=True)
     resp.raise_for_status()
     return resp.text
 